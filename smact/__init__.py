@@ -5,20 +5,94 @@ A collection of fast screening tools from elemental data
 """
 
 import itertools
+import json
 import warnings
+from functools import partial, reduce
 from math import gcd
 from operator import mul as multiply
 from os import path
 from typing import Iterable, List, Optional, Sequence, Tuple, Union
 
-import pandas as pd
-
 module_directory = path.abspath(path.dirname(__file__))
 data_directory = path.join(module_directory, "data")
 # get correct path for datafiles when called from another directory
 from smact import data_loader
 
 
+def _load_coord_envs(symbol: str) -> dict:
+    # Set coordination-environment data from the Shannon-radius data.
+    # It is safe to use copy = False with this Get* function.
+    shannon_data = data_loader.lookup_element_shannon_radius_data(
+        symbol, copy=False
+    )
+
+    if shannon_data != None:
+        coord_envs = tuple(row["coordination"] for row in shannon_data)
+    else:
+        coord_envs = None
+    return {"_coord_envs": coord_envs}
+
+
+def _load_hhis(symbol: str) -> dict:
+    HHI_scores = data_loader.lookup_element_hhis(symbol)
+    if HHI_scores == None:
+        HHI_scores = (None, None)
+    return {"HHI_p": HHI_scores[0], "HHI_r": HHI_scores[1]}
+
+
+def _load_sse(symbol: str) -> dict:
+    sse_data = data_loader.lookup_element_sse_data(symbol)
+    return {"SSE": sse_data["SolidStateEnergy"] if sse_data else None}
+
+
+def _load_sse_pauling(symbol: str) -> dict:
+    sse_Pauling_data = data_loader.lookup_element_sse_pauling_data(symbol)
+    return {
+        "SSEPauling": sse_Pauling_data["SolidStateEnergyPauling"]
+        if sse_Pauling_data
+        else None
+    }
+
+
+# The list attributes of Element are stored as tuples, as Elements are
+# shared, and copied to lists when accessed
+def _as_tuple(values: Optional[Iterable]) -> Optional[tuple]:
+    return None if values is None else tuple(values)
+
+
+def _as_list(values: Optional[tuple]) -> Optional[list]:
+    return None if values is None else list(values)
+
+
+# Element attributes that are only looked up when first used
+_lazy_element_attributes = {
+    "_coord_envs": _load_coord_envs,
+    "HHI_p": _load_hhis,
+    "HHI_r": _load_hhis,
+    "SSE": _load_sse,
+    "SSEPauling": _load_sse_pauling,
+    "_oxidation_states_icsd": lambda symbol: {
+        "_oxidation_states_icsd": _as_tuple(
+            data_loader.lookup_element_oxidation_states_icsd(symbol)
+        )
+    },
+    "_oxidation_states_sp": lambda symbol: {
+        "_oxidation_states_sp": _as_tuple(
+            data_loader.lookup_element_oxidation_states_sp(symbol)
+        )
+    },
+    "_oxidation_states_wiki": lambda symbol: {
+        "_oxidation_states_wiki": _as_tuple(
+            data_loader.lookup_element_oxidation_states_wiki(symbol)
+        )
+    },
+}
+
+# Process-wide registries of Element and Species instances
+_element_registry = {}
+_species_registry = {}
+
+
 class Element:
     """Collection of standard elemental properties for given element.
 
@@ -28,6 +102,13 @@ class Element:
     Atoms with a defined oxidation state draw properties from the
     "Species" class.
 
+    Element objects are immutable and are shared within a process, so
+    Element('Fe') always returns the same object. The less commonly used
+    attributes (coord_envs, HHI_p, HHI_r, SSE, SSEPauling and the
+    alternative oxidation-state lists) are looked up on first access.
+    The list attributes return a new list each time, so changing one
+    does not change the shared Element.
+
     Attributes:
         Element.symbol (string) : Elemental symbol used to retrieve data
 
@@ -77,84 +158,117 @@ class Element:
 
     """
 
-    def __init__(self, symbol: str):
-        """Initialise Element class
+    __slots__ = (
+        "_coord_envs",
+        "covalent_radius",
+        "crustal_abundance",
+        "dipol",
+        "e_affinity",
+        "eig",
+        "eig_s",
+        "HHI_p",
+        "HHI_r",
+        "ionpot",
+        "mass",
+        "name",
+        "number",
+        "_oxidation_states",
+        "_oxidation_states_icsd",
+        "_oxidation_states_sp",
+        "_oxidation_states_wiki",
+        "pauling_eneg",
+        "SSE",
+        "SSEPauling",
+        "symbol",
+    )
+
+    def __new__(cls, symbol: str):
+        """Return the Element for a symbol
+
+        Elements are immutable and shared: the data for each symbol is
+        only looked up once per process.
 
         Args:
             symbol (str): Chemical element symbol (e.g. 'Fe')
 
         """
-
+        key = (cls, symbol)
+        element = _element_registry.get(key)
+        if element is None:
+            element = object.__new__(cls)
+            element._load_element_data(symbol)
+            _element_registry[key] = element
+        return element
+
+    def _load_element_data(self, symbol: str):
+        """Set the commonly used attributes of a new Element."""
         dataset = data_loader.lookup_element_data(symbol, copy=False)
 
         if dataset == None:
             raise NameError(f"Elemental data for {symbol} not found.")
 
-        # Set coordination-environment data from the Shannon-radius data.
-        # As above, it is safe to use copy = False with this Get* function.
-
-        shannon_data = data_loader.lookup_element_shannon_radius_data(
-            symbol, copy=False
-        )
-
-        if shannon_data != None:
-            coord_envs = [row["coordination"] for row in shannon_data]
-        else:
-            coord_envs = None
-
-        HHI_scores = data_loader.lookup_element_hhis(symbol)
-        if HHI_scores == None:
-            HHI_scores = (None, None)
-
-        sse_data = data_loader.lookup_element_sse_data(symbol)
-        if sse_data:
-            sse = sse_data["SolidStateEnergy"]
-        else:
-            sse = None
-
-        sse_Pauling_data = data_loader.lookup_element_sse_pauling_data(symbol)
-        if sse_Pauling_data:
-            sse_Pauling = sse_Pauling_data["SolidStateEnergyPauling"]
-        else:
-            sse_Pauling = None
-
         for attribute, value in (
-            ("coord_envs", coord_envs),
             ("covalent_radius", dataset["r_cov"]),
             ("crustal_abundance", dataset["Abundance"]),
             ("e_affinity", dataset["e_affinity"]),
             ("eig", dataset["p_eig"]),
             ("eig_s", dataset["s_eig"]),
-            ("HHI_p", HHI_scores[0]),
-            ("HHI_r", HHI_scores[1]),
             ("ionpot", dataset["ion_pot"]),
             ("mass", dataset["Mass"]),
             ("name", dataset["Name"]),
             ("number", dataset["Z"]),
             (
-                "oxidation_states",
-                data_loader.lookup_element_oxidation_states(symbol),
-            ),
-            (
-                "oxidation_states_icsd",
-                data_loader.lookup_element_oxidation_states_icsd(symbol),
-            ),
-            (
-                "oxidation_states_sp",
-                data_loader.lookup_element_oxidation_states_sp(symbol),
-            ),
-            (
-                "oxidation_states_wiki",
-                data_loader.lookup_element_oxidation_states_wiki(symbol),
+                "_oxidation_states",
+                _as_tuple(data_loader.lookup_element_oxidation_states(symbol)),
             ),
             ("dipol", dataset["dipol"]),
             ("pauling_eneg", dataset["el_neg"]),
-            ("SSE", sse),
-            ("SSEPauling", sse_Pauling),
             ("symbol", symbol),
             # ('vdw_radius', dataset['RVdW']),
         ):
-            setattr(self, attribute, value)
+            object.__setattr__(self, attribute, value)
+
+    @property
+    def oxidation_states(self) -> Optional[List[int]]:
+        return _as_list(self._oxidation_states)
+
+    @property
+    def oxidation_states_icsd(self) -> Optional[List[int]]:
+        return _as_list(self._oxidation_states_icsd)
+
+    @property
+    def oxidation_states_sp(self) -> Optional[List[int]]:
+        return _as_list(self._oxidation_states_sp)
+
+    @property
+    def oxidation_states_wiki(self) -> Optional[List[int]]:
+        return _as_list(self._oxidation_states_wiki)
+
+    @property
+    def coord_envs(self) -> Optional[List[str]]:
+        return _as_list(self._coord_envs)
+
+    def __getattr__(self, name: str):
+        """Load rarely used attributes on first access."""
+        if name not in _lazy_element_attributes:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        for attribute, value in _lazy_element_attributes[name](
+            self.symbol
+        ).items():
+            object.__setattr__(self, attribute, value)
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError(f"{type(self).__name__} objects are immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{type(self).__name__} objects are immutable")
+
+    def __reduce__(self):
+        # Unpickling and copying go through the registry
+        return type(self), (self.symbol,)
 
 
 class Species(Element):
@@ -168,6 +282,8 @@ class Species(Element):
     The Species object can be created with either a default set of shannon radii (radii_source='shannon') or with a set of machine-learnt shannon radii (radii_source='extended').
     The source of the machine-learnt shannon radii set is
     Baloch, A.A., Alqahtani, S.M., Mumtaz, F., Muqaibel, A.H., Rashkeev, S.N. and Alharbi, F.H., 2021. Extending Shannon's ionic radii database using machine learning. Physical Review Materials, 5(4), p.043804.
+    Like Element objects, Species objects are immutable and are shared
+    between calls with the same arguments.
 
     Attributes:
         Species.symbol: Elemental symbol used to retrieve data
@@ -201,31 +317,62 @@ class Species(Element):
 
     """
 
-    def __init__(
-        self,
+    __slots__ = (
+        "average_ionic_radius",
+        "average_shannon_radius",
+        "coordination",
+        "ionic_radius",
+        "oxidation",
+        "shannon_radius",
+        "SSE_2015",
+        "_radii_source",
+    )
+
+    def __new__(
+        cls,
         symbol: str,
         oxidation: int,
         coordination: int = 4,
         radii_source: str = "shannon",
     ):
-        Element.__init__(self, symbol)
+        key = (cls, symbol, oxidation, coordination, radii_source)
+        species = _species_registry.get(key)
+        if species is None:
+            species = object.__new__(cls)
+            species._load_element_data(symbol)
+            species._load_species_data(
+                symbol, oxidation, coordination, radii_source
+            )
+            _species_registry[key] = species
+        return species
 
-        self.oxidation = oxidation
-        self.coordination = coordination
+    def _load_species_data(
+        self,
+        symbol: str,
+        oxidation: int,
+        coordination: int,
+        radii_source: str,
+    ):
+        """Set the attributes that depend on the chemical environment."""
+        _set = partial(object.__setattr__, self)
+
+        _set("oxidation", oxidation)
+        _set("coordination", coordination)
+        _set("_radii_source", radii_source)
 
         # Get shannon radius for the oxidation state and coordination.
 
-        self.shannon_radius = None
+        _set("shannon_radius", None)
 
         if radii_source == "shannon":
             shannon_data = data_loader.lookup_element_shannon_radius_data(
-                symbol
+                symbol, copy=False
             )
 
         elif radii_source == "extended":
             shannon_data = (
                 data_loader.lookup_element_shannon_radius_data_extendedML(
-                    symbol
+                    symbol, copy=False
                 )
             )
 
@@ -241,10 +388,10 @@ class Species(Element):
                     and str(coordination)
                     == dataset["coordination"].split("_")[0]
                 ):
-                    self.shannon_radius = dataset["crystal_radius"]
+                    _set("shannon_radius", dataset["crystal_radius"])
 
         # Get ionic radius
-        self.ionic_radius = None
+        _set("ionic_radius", None)
 
         if shannon_data:
             for dataset in shannon_data:
@@ -253,36 +400,41 @@ class Species(Element):
                     and str(coordination)
                     == dataset["coordination"].split("_")[0]
                 ):
-                    self.ionic_radius = dataset["ionic_radius"]
+                    _set("ionic_radius", dataset["ionic_radius"])
 
         # Get the average shannon and ionic radii
-        self.average_shannon_radius = None
-        self.average_ionic_radius = None
+        _set("average_shannon_radius", None)
+        _set("average_ionic_radius", None)
 
         if shannon_data:
-            # Get the rows of the shannon radius table for the element
-            shannon_data_df = pd.DataFrame(shannon_data)
-
-            # Get the rows corresponding to the oxidation state of the species
-            charge_rows = shannon_data_df.loc[
-                shannon_data_df["charge"] == oxidation
-            ]
-
-            # Get the mean
-            self.average_shannon_radius = charge_rows["crystal_radius"].mean()
-            self.average_ionic_radius = charge_rows["ionic_radius"].mean()
+            # The means over all the rows for the oxidation state are
+            # worked out once, when the radii are loaded
+            (
+                average_shannon_radius,
+                average_ionic_radius,
+            ) = data_loader.lookup_element_shannon_radius_averages(
+                symbol, oxidation, radii_source
+            )
+            _set("average_shannon_radius", average_shannon_radius)
+            _set("average_ionic_radius", average_ionic_radius)
 
         # Get SSE_2015 (revised) for the oxidation state.
 
-        self.SSE_2015 = None
+        _set("SSE_2015", None)
 
         sse_2015_data = data_loader.lookup_element_sse2015_data(symbol)
         if sse_2015_data:
             for dataset in sse_2015_data:
                 if dataset["OxidationState"] == oxidation:
-                    self.SSE_2015 = dataset["SolidStateEnergy2015"]
-        else:
-            self.SSE_2015 = None
+                    _set("SSE_2015", dataset["SolidStateEnergy2015"])
+
+    def __reduce__(self):
+        return type(self), (
+            self.symbol,
+            self.oxidation,
+            self.coordination,
+            self._radii_source,
+        )
 
 
 def ordered_elements(x: int, y: int) -> List[str]:
@@ -389,6 +541,47 @@ def _isneutral(oxidations: Tuple[int, ...], stoichs: Tuple[int, ...]):
     return 0 == sum(map(multiply, oxidations, stoichs))
 
 
+def _neutral_stoichs(oxidations: Sequence[int], stoichs: List[List[int]]):
+    """
+    Generate charge-neutral stoichiometries site by site
+
+    Solves sum(oxidation * stoich) == 0 as a dynamic program over the
+    partial charge: the charges which the remaining sites can still
+    contribute are tabulated first, so that a partial stoichiometry is only
+    extended when it can be completed to a neutral one.
+
+    Args:
+        oxidations : list of integers
+        stoichs : stoichiometric ratios for each site
+
+    Yields:
+        tuple: ratio that gives neutrality, in the same order as
+        itertools.product(*stoichs)
+    """
+    n_sites = len(oxidations)
+
+    # reachable[i]: total charges which can be formed by sites i onwards
+    reachable = [set() for _ in range(n_sites)] + [{0}]
+    for i in reversed(range(n_sites)):
+        reachable[i] = {
+            oxidations[i] * stoich + charge
+            for stoich in stoichs[i]
+            for charge in reachable[i + 1]
+        }
+
+    def extend(site, charge, ratio):
+        if site == n_sites:
+            if reduce(gcd, ratio, 0) == 1:
+                yield ratio
+            return
+        for stoich in stoichs[site]:
+            new_charge = charge + oxidations[site] * stoich
+            if -new_charge in reachable[site + 1]:
+                yield from extend(site + 1, new_charge, ratio + (stoich,))
+
+    return extend(0, 0, ())
+
+
 def neutral_ratios_iter(
     oxidations: List[int],
     stoichs: Union[bool, List[List[int]]] = False,
@@ -402,6 +595,36 @@ def neutral_ratios_iter(
     set of legal stoichiometries per site (e.g. a known family of compounds);
     otherwise all unique ratios are tried up to a threshold coefficient.
 
+    Only neutral ratios in their simplest form are generated, rather than
+    testing every combination of stoichiometries; the results are the same
+    as :func:`neutral_ratios_iter_old`.
+
+    Args:
+        oxidations : list of integers
+        stoichs : stoichiometric ratios for each site (if provided)
+        threshold : single threshold to go up to if stoichs are not provided
+
+    Yields:
+        tuple: ratio that gives neutrality
+    """
+    if not stoichs:
+        stoichs = [list(range(1, threshold + 1))] * len(oxidations)
+
+    return _neutral_stoichs(oxidations, stoichs)
+
+
+def neutral_ratios_iter_old(
+    oxidations: List[int],
+    stoichs: Union[bool, List[List[int]]] = False,
+    threshold: Optional[int] = 5,
+):
+    """
+    Iterator for charge-neutral stoichiometries
+
+    This function should give the same results as neutral_ratios_iter but
+    enumerates every combination of stoichiometries, so is not optimised
+    for speed.
+
     Args:
         oxidations : list of integers
         stoichs : stoichiometric ratios for each site (if provided)
@@ -423,6 +646,42 @@ def neutral_ratios_iter(
     )
 
 
+# Lookup table of charge-neutral stoichiometries used by neutral_ratios.
+# Keys are (sorted oxidation states, threshold, stoichs) with the per-site
+# stoichs reordered to match the sorted oxidation states; values are the
+# neutral ratios for that ordering.
+_neutral_ratios_lookup = {}
+
+
+def _neutral_ratios_key(
+    oxidations: Sequence[int],
+    stoichs: Union[bool, List[List[int]]] = False,
+    threshold: Optional[int] = 5,
+):
+    """Get the lookup-table key for a neutral_ratios query.
+
+    Args:
+        oxidations (list of ints): Oxidation state of each site
+        stoichs (list of positive ints): A selection of valid
+            stoichiometric ratios for each site
+        threshold (int): Maximum stoichiometry coefficient
+
+    Returns:
+        (key, order) (tuple): The key and the ordering of the sites which
+        sorts the oxidation states
+    """
+    order = sorted(range(len(oxidations)), key=oxidations.__getitem__)
+    # Plain ints, so that numpy integers can't get into the lookup table,
+    # which must be saved as JSON
+    charges = tuple(int(oxidations[i]) for i in order)
+    if stoichs:
+        stoichs = tuple(tuple(int(x) for x in stoichs[i]) for i in order)
+        return (charges, None, stoichs), order
+    if threshold is not None:
+        threshold = int(threshold)
+    return (charges, threshold, None), order
+
+
 def neutral_ratios(
     oxidations: List[int],
     stoichs: Union[bool, List[List[int]]] = False,
@@ -457,16 +716,97 @@ def neutral_ratios(
         allowed_ratios *list of tuples*:
             Ratios of atoms in given oxidation
             states which yield a charge-neutral structure
+
+    The ratios only depend on the sorted oxidation states and the
+    stoichiometries tried, so results are cached in a lookup table which
+    can be saved with :func:`save_neutral_ratios_lookup`.
     """
-    allowed_ratios = [
-        x
-        for x in neutral_ratios_iter(
-            oxidations, stoichs=stoichs, threshold=threshold
+    key, order = _neutral_ratios_key(oxidations, stoichs, threshold)
+    charges, threshold, sorted_stoichs = key
+
+    if key not in _neutral_ratios_lookup:
+        _neutral_ratios_lookup[key] = tuple(
+            neutral_ratios_iter(
+                charges,
+                stoichs=sorted_stoichs and [list(x) for x in sorted_stoichs],
+                threshold=threshold,
+            )
         )
-    ]
+    allowed_ratios = list(_neutral_ratios_lookup[key])
+
+    if order != sorted(order):
+        # Map ratios back onto the original site order, and restore the
+        # order in which neutral_ratios_iter would have generated them
+        unsorted_ratios = []
+        for ratio in allowed_ratios:
+            unsorted = [0] * len(order)
+            for site, stoich in zip(order, ratio):
+                unsorted[site] = stoich
+            unsorted_ratios.append(tuple(unsorted))
+
+        if stoichs:
+            allowed_ratios = sorted(
+                unsorted_ratios,
+                key=lambda x: [list(s).index(y) for s, y in zip(stoichs, x)],
+            )
+        else:
+            allowed_ratios = sorted(unsorted_ratios)
+
     return (len(allowed_ratios) > 0, allowed_ratios)
 
 
+def save_neutral_ratios_lookup(filename: str):
+    """
+    Save the neutral_ratios lookup table to a JSON file
+
+    Building the lookup table for every combination of oxidation states
+    can take a while for large screening runs, so it may be saved once and
+    read back with :func:`load_neutral_ratios_lookup`.
+
+    Args:
+        filename (str): Path of the file to write
+    """
+    entries = [
+        {
+            "oxidation_states": list(charges),
+            "threshold": threshold,
+            "stoichs": stoichs and [list(x) for x in stoichs],
+            "ratios": [list(x) for x in ratios],
+        }
+        for (charges, threshold, stoichs), ratios in sorted(
+            _neutral_ratios_lookup.items(), key=lambda x: repr(x[0])
+        )
+    ]
+    with open(filename, "w") as f:
+        json.dump(entries, f)
+
+
+def load_neutral_ratios_lookup(filename: str):
+    """
+    Load entries into the neutral_ratios lookup table from a JSON file
+
+    Args:
+        filename (str): Path of a file written by
+            :func:`save_neutral_ratios_lookup`
+    """
+    with open(filename) as f:
+        entries = json.load(f)
+
+    for entry in entries:
+        stoichs = entry["stoichs"]
+        key = (
+            tuple(entry["oxidation_states"]),
+            entry["threshold"],
+            stoichs and tuple(tuple(x) for x in stoichs),
+        )
+        _neutral_ratios_lookup[key] = tuple(tuple(x) for x in entry["ratios"])
+
+
+def clear_neutral_ratios_lookup():
+    """Empty the neutral_ratios lookup table."""
+    _neutral_ratios_lookup.clear()
+
+
 # List of metals
 metals = [
     "Li",
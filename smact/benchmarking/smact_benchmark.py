@@ -1,6 +1,31 @@
 """SMACT benchmarking."""
 
+import itertools
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+import numpy as np
+import pandas as pd
+
+from .. import (
+    Element,
+    Species,
+    _element_registry,
+    _species_registry,
+    data_loader,
+    neutral_ratios_iter,
+    neutral_ratios_iter_old,
+    ordered_elements,
+)
+from ..dopant_prediction.doper import iter_dopants
+from ..screening import pauling_test, pauling_test_many, smact_filter
+from ..structure_prediction import utilities
+from ..structure_prediction.database import StructureDB
 from ..structure_prediction.mutation import CationMutator
+from ..structure_prediction.structure import SmactStructure
 from .utilities import timeit
 
 
@@ -10,13 +35,32 @@ class MutatorBenchmarker:
     @timeit
     def run_tests(self):
         """Initialize Mutator and perform tests."""
+        self.__cm_setup_uncached()
         self.__cm_setup()
         self.__pair_corr()
+        self.__cm_setup_large()
+
+    @timeit
+    def __cm_setup_uncached(self):
+        """Create a CationMutator without the lambda table cache."""
+        CationMutator.from_json(use_cache=False)
 
     @timeit
     def __cm_setup(self) -> CationMutator:
-        """Create a CationMutator."""
-        self.cm = CationMutator.from_json()
+        """Create a CationMutator, from the cache after the first run."""
+        self.cm = CationMutator.from_json(use_cache=True)
+
+    @timeit
+    def __cm_setup_large(self):
+        """Create a CationMutator from a sparse table of 2000 species."""
+        rng = np.random.default_rng(0)
+        specs = [f"X{i}+" for i in range(2000)]
+        lambdas = rng.normal(size=(len(specs), len(specs)))
+        lambdas[rng.random(lambdas.shape) > 0.05] = np.nan
+        CationMutator(
+            pd.DataFrame(lambdas, index=specs, columns=specs),
+            vector_alpha=lambda s1, s2: np.full(len(s1), -5.0),
+        )
 
     @timeit
     def __pair_corr(self):
@@ -24,6 +68,455 @@ class MutatorBenchmarker:
         self.cm.complete_pair_corrs()
 
 
+class FilterBenchmarker:
+    """Benchmarking tests for smact_filter."""
+
+    @timeit
+    def run_tests(self):
+        """Set up a quaternary system and compare filter engines."""
+        self.__filter_setup()
+        self.__filter()
+        self.__filter_vectorised()
+
+    @timeit
+    def __filter_setup(self):
+        """Create the Elements of a quaternary system."""
+        self.els = [Element(x) for x in ("Ba", "Ti", "Mn", "O")]
+
+    @timeit
+    def __filter(self):
+        """Apply smact_filter one oxidation-state combination at a time."""
+        smact_filter(self.els, threshold=8)
+
+    @timeit
+    def __filter_vectorised(self):
+        """Apply smact_filter to all oxidation-state combinations at once."""
+        smact_filter(self.els, threshold=8, vectorise=True)
+
+
+class NeutralRatiosBenchmarker:
+    """Benchmarking tests for neutral_ratios_iter."""
+
+    oxidations = [2, 3, 1, -2, -1, -3]
+
+    @timeit
+    def run_tests(self):
+        """Compare charge-neutral stoichiometry solvers."""
+        for n in range(2, len(self.oxidations) + 1):
+            for threshold in (4, 8):
+                logging.info(f"n = {n}, threshold = {threshold}")
+                self.__neutral_ratios(self.oxidations[:n], threshold)
+                self.__neutral_ratios_old(self.oxidations[:n], threshold)
+
+    @timeit
+    def __neutral_ratios(self, oxidations, threshold):
+        """Solve for the neutral stoichiometries."""
+        list(neutral_ratios_iter(oxidations, threshold=threshold))
+
+    @timeit
+    def __neutral_ratios_old(self, oxidations, threshold):
+        """Enumerate every stoichiometry and keep the neutral ones."""
+        list(neutral_ratios_iter_old(oxidations, threshold=threshold))
+
+
+class PaulingBenchmarker:
+    """Benchmarking tests for pauling_test_many."""
+
+    @timeit
+    def run_tests(self):
+        """Compare one-at-a-time and batched electronegativity tests."""
+        self.__pauling_setup()
+        self.__pauling()
+        self.__pauling_many()
+
+    @timeit
+    def __pauling_setup(self):
+        """Build every oxidation-state combination of a 5-element system."""
+        els = [Element(x) for x in ("Fe", "Mn", "Co", "O", "S")]
+        self.ox_combos = list(
+            itertools.product(*(el.oxidation_states for el in els))
+        )
+        self.ox_array = np.array(self.ox_combos)
+        self.enegs = [el.pauling_eneg for el in els]
+
+    @timeit
+    def __pauling(self):
+        """Apply pauling_test to one combination at a time."""
+        [pauling_test(ox, self.enegs) for ox in self.ox_combos]
+
+    @timeit
+    def __pauling_many(self):
+        """Apply pauling_test_many to all the combinations."""
+        pauling_test_many(self.ox_array, self.enegs)
+
+
+class SpeciesBenchmarker:
+    """Benchmarking tests for Species construction."""
+
+    @timeit
+    def run_tests(self):
+        """Create a Species for every known oxidation state."""
+        self.__species_setup()
+        self.__species()
+
+    @timeit
+    def __species_setup(self):
+        """List the oxidation states of the first 83 elements."""
+        self.species = [
+            (el.symbol, ox)
+            for el in map(Element, ordered_elements(1, 83))
+            for ox in el.oxidation_states
+        ]
+        _species_registry.clear()
+
+    @timeit
+    def __species(self):
+        """Create each Species in two radii sources."""
+        for symbol, ox in self.species:
+            Species(symbol, ox, 6)
+            Species(symbol, ox, 6, radii_source="extended")
+
+
+class DataLoaderBenchmarker:
+    """Benchmarking tests for the first Element created in a process."""
+
+    @timeit
+    def run_tests(self):
+        """Compare reading the data from text files and the data cache."""
+        default_use_cache = data_loader.use_data_cache
+        default_directory = data_loader.data_cache_directory
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                data_loader.data_cache_directory = tmp
+                data_loader.use_data_cache = False
+                self.__first_element_text()
+                data_loader.use_data_cache = True
+                # Fill the cache
+                self.__reset()
+                Element("Fe")
+                self.__first_element_cached()
+        finally:
+            data_loader.use_data_cache = default_use_cache
+            data_loader.data_cache_directory = default_directory
+            self.__reset()
+
+    @timeit
+    def __first_element_text(self):
+        """Create an Element with the data read from the text files."""
+        self.__reset()
+        Element("Fe")
+
+    @timeit
+    def __first_element_cached(self):
+        """Create an Element with the data read from the data cache."""
+        self.__reset()
+        Element("Fe")
+
+    def __reset(self):
+        data_loader.clear_cache()
+        _element_registry.clear()
+
+
+class SpecParsingBenchmarker:
+    """Benchmarking tests for parsing species strings."""
+
+    @timeit
+    def run_tests(self):
+        """Parse and unparse every known species, with and without caching."""
+        self.__spec_setup()
+        self.__parse_spec()
+        self.__parse_spec_uncached()
+        self.__unparse_spec()
+        self.__unparse_spec_uncached()
+
+    @timeit
+    def __spec_setup(self):
+        """List the species of all the elements, 100 times over."""
+        self.species = [
+            (el.symbol, ox)
+            for el in map(Element, ordered_elements(1, 103))
+            for ox in el.oxidation_states
+        ] * 100
+        self.spec_strs = [
+            utilities.unparse_spec(spec) for spec in self.species
+        ]
+
+    @timeit
+    def __parse_spec(self):
+        for spec_str in self.spec_strs:
+            utilities.parse_spec(spec_str)
+
+    @timeit
+    def __parse_spec_uncached(self):
+        for spec_str in self.spec_strs:
+            utilities.parse_spec.__wrapped__(spec_str)
+
+    @timeit
+    def __unparse_spec(self):
+        for spec in self.species:
+            utilities.unparse_spec(spec)
+
+    @timeit
+    def __unparse_spec_uncached(self):
+        for spec in self.species:
+            utilities._format_spec.__wrapped__(*spec)
+
+
+class DopantBenchmarker:
+    """Benchmarking tests for batch dopant prediction."""
+
+    @timeit
+    def run_tests(self):
+        """Find dopants for binary hosts, serially and in parallel."""
+        self.__dopant_setup()
+        self.__dopants(1)
+        self.__dopants(4)
+
+    @timeit
+    def __dopant_setup(self):
+        """List cation-anion hosts, with one oxidation state per element."""
+        cations = [
+            f"{el.symbol}{max(el.oxidation_states)}+"
+            for el in map(Element, ordered_elements(1, 83))
+            if el.oxidation_states and max(el.oxidation_states) > 0
+        ]
+        anions = ["O2-", "S2-", "Se2-", "N3-", "F1-", "Cl1-"]
+        self.hosts = list(itertools.product(cations, anions))
+
+    def __dopants(self, processes):
+        """Find dopants for all the hosts and log the throughput."""
+        t0 = time()
+        for _ in iter_dopants(self.hosts, processes=processes):
+            pass
+        logging.info(
+            f"__dopants -- {processes} processes: "
+            f"{len(self.hosts) / (time() - t0):.0f} hosts/s"
+        )
+
+
+class DatabaseBenchmarker:
+    """Benchmarking tests for StructureDB species searches."""
+
+    @timeit
+    def run_tests(self):
+        """Search a large table before and after adding its species table."""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.db = StructureDB(os.path.join(tmp, "bench.db"))
+            self.__db_setup()
+            self.__get_with_species_glob()
+            self.__add_species_table()
+            self.__get_with_species_indexed()
+            self.__get_with_species_lazy()
+            self.__species_index()
+            self.__lookups()
+
+    @timeit
+    def __db_setup(self):
+        """Fill a table without a species table with 100000 structures."""
+        rng = np.random.default_rng(0)
+        cations = [(el, q) for el in ordered_elements(3, 83) for q in (2, 3)]
+        anions = [("O", -2), ("S", -2), ("N", -3), ("F", -1), ("Cl", -1)]
+        species = cations + anions
+        poscar = SmactStructure.from_file(
+            os.path.join(
+                os.path.dirname(__file__), "..", "tests", "files", "CaTiO3.txt"
+            )
+        ).as_poscar()
+        rows = []
+        for n in rng.integers(2, 5, size=100000):
+            chosen = sorted(
+                species[i]
+                for i in rng.choice(len(species), size=n, replace=False)
+            )
+            comp = "".join(
+                f"{el}_1_{abs(q)}{'-' if q < 0 else '+'}" for el, q in chosen
+            )
+            rows.append((comp, poscar))
+        with self.db as c:
+            c.execute(
+                """CREATE TABLE structures
+                (composition TEXT NOT NULL, structure TEXT NOT NULL)"""
+            )
+            c.executemany("INSERT INTO structures VALUES (?, ?)", rows)
+        self.queries = [
+            [species[i], anions[j % len(anions)]]
+            for j, i in enumerate(rng.choice(len(cations), 20, replace=False))
+        ]
+
+    @timeit
+    def __get_with_species_glob(self):
+        """Search by scanning the compositions."""
+        for query in self.queries:
+            self.db.get_with_species(query, "structures")
+
+    @timeit
+    def __add_species_table(self):
+        """Migrate the table to have a species table."""
+        self.db.add_species_table("structures")
+
+    @timeit
+    def __get_with_species_indexed(self):
+        """Search using the species table."""
+        for query in self.queries:
+            self.db.get_with_species(query, "structures")
+
+    @timeit
+    def __get_with_species_lazy(self):
+        """Search using the species table, without parsing structures."""
+        for query in self.queries:
+            self.db.get_with_species(query, "structures", lazy=True)
+
+    @timeit
+    def __species_index(self):
+        """Build the in-memory species index."""
+        self.index = self.db.species_index("structures")
+
+    def __lookups(self):
+        """Search the in-memory species index and log the throughput."""
+        t0 = time()
+        for _ in range(100):
+            for query in self.queries:
+                self.index.lookup(query)
+        logging.info(
+            "__lookups -- "
+            f"{100 * len(self.queries) / (time() - t0):.0f} queries/s"
+        )
+
+
+class ConnectionBenchmarker:
+    """Benchmarking tests for StructureDB connection modes."""
+
+    @timeit
+    def run_tests(self):
+        """Compare query throughput with and without persistent connections."""
+        self.__connection_setup()
+        self.__queries(StructureDB(self.db_file, read_only=True))
+        db = StructureDB(self.db_file, persistent=True, read_only=True)
+        self.__queries(db)
+        self.__queries(db, threads=4)
+        db.close()
+
+    @timeit
+    def __connection_setup(self):
+        """List pairs of species to search the test predictor database for."""
+        self.db_file = os.path.join(
+            os.path.dirname(__file__),
+            "..",
+            "tests",
+            "files",
+            "test_predictor.db",
+        )
+        cations = [("Ca", 2), ("Sr", 2), ("Ba", 2), ("Ti", 4), ("Fe", 2)]
+        anions = [("O", -2), ("S", -2), ("F", -1)]
+        self.queries = [
+            list(q) for q in itertools.product(cations, anions)
+        ] * 20
+
+    def __queries(self, db, threads=1):
+        """Search the database and log the throughput."""
+        t0 = time()
+        with ThreadPoolExecutor(threads) as pool:
+            for _ in pool.map(
+                lambda query: db.get_with_species(query, "TEST", lazy=True),
+                self.queries,
+            ):
+                pass
+        logging.info(
+            f"__queries -- persistent={db.persistent}, {threads} threads: "
+            f"{len(self.queries) / (time() - t0):.0f} queries/s"
+        )
+
+
+class IngestBenchmarker:
+    """Benchmarking tests for adding structures to a StructureDB."""
+
+    @timeit
+    def run_tests(self):
+        """Add structures one at a time and in batches."""
+        self.__ingest_setup()
+        with tempfile.TemporaryDirectory() as tmp:
+            self.db = StructureDB(os.path.join(tmp, "bench.db"))
+            self.__add_structs_per_row()
+            self.__add_structs_bulk()
+
+    @timeit
+    def __ingest_setup(self):
+        """Read 2000 structures."""
+        files_dir = os.path.join(
+            os.path.dirname(__file__), "..", "tests", "files"
+        )
+        self.structs = [
+            SmactStructure.from_file(os.path.join(files_dir, f"{x}.txt"))
+            for x in ["CaTiO3", "NaCl", "Fe", "BaTiO3"]
+        ] * 500
+
+    @timeit
+    def __add_structs_per_row(self):
+        """Commit after each structure."""
+        self.db.add_table("per_row")
+        self.db.add_structs(
+            self.structs, "per_row", commit_after_each=True, batch_size=1
+        )
+
+    @timeit
+    def __add_structs_bulk(self):
+        """Commit after each batch, as add_mp_icsd does."""
+        self.db.add_table("bulk")
+        self.db.add_structs(
+            self.structs, "bulk", commit_after_each=True, bulk=True
+        )
+
+
 @timeit(delim=True, n=100)
 def mutator_test_run():
     MutatorBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def filter_test_run():
+    FilterBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def neutral_ratios_test_run():
+    NeutralRatiosBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def pauling_test_run():
+    PaulingBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def species_test_run():
+    SpeciesBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def spec_parsing_test_run():
+    SpecParsingBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def dopant_test_run():
+    DopantBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def database_test_run():
+    DatabaseBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def connection_test_run():
+    ConnectionBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=10)
+def ingest_test_run():
+    IngestBenchmarker().run_tests()
+
+
+@timeit(delim=True, n=100)
+def data_loader_test_run():
+    DataLoaderBenchmarker().run_tests()
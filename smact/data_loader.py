@@ -8,10 +8,19 @@ naively constructing several of these objects.  It also implements a
 switchable system to print verbose warning messages about possible
 missing data (mainly for debugging purposes). In general these fuctions
 are used in the background and it is not necessary to use them directly.
+
+Optionally, the parsed tables are also cached on disk, in
+data_cache_directory, so that later processes can load them without
+parsing the text files. This is enabled by setting $SMACT_CACHE_DIR.
 """
 
 import csv
+import importlib.metadata
 import os
+import pickle
+import tempfile
+
+import numpy as np
 
 from smact import data_directory
 
@@ -52,6 +61,107 @@ def float_or_None(x):
         return None
 
 
+# Where the parsed data tables are cached on disk, and whether they are.
+# The cache is only used by default if SMACT_CACHE_DIR is set.
+data_cache_directory = os.path.join(
+    os.environ.get("SMACT_CACHE_DIR")
+    or os.path.join(os.path.expanduser("~"), ".cache", "smact"),
+    "data",
+)
+use_data_cache = bool(os.environ.get("SMACT_CACHE_DIR"))
+
+# Increment when the way the tables are parsed changes
+_DATA_CACHE_VERSION = 1
+
+try:
+    _package_version = importlib.metadata.version("SMACT")
+except importlib.metadata.PackageNotFoundError:
+    _package_version = None
+
+
+def _data_file_stamp(filename):
+    """Identify the version of a data file, to check cached tables."""
+    stat = os.stat(os.path.join(data_directory, filename))
+    return (
+        _DATA_CACHE_VERSION,
+        _package_version,
+        stat.st_mtime_ns,
+        stat.st_size,
+    )
+
+
+def _load_cached_table(filename):
+    """
+    Load the table parsed from a data file from the on-disk cache.
+
+    Args:
+        filename (str) : the name of the data file.
+
+    Returns:
+        The table, or None if the cache is not used or the table is not
+            cached from the current version of the data file.
+    """
+
+    if not use_data_cache:
+        return None
+    try:
+        with open(
+            os.path.join(data_cache_directory, f"{filename}.pickle"), "rb"
+        ) as file:
+            # The stamp comes first, so stale tables are never unpickled
+            if pickle.load(file) != _data_file_stamp(filename):
+                return None
+            return pickle.load(file)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+
+
+def _save_cached_table(filename, table):
+    """
+    Save the table parsed from a data file to the on-disk cache.
+
+    Failures are ignored, as the cache is only an optimisation.
+
+    Args:
+        filename (str) : the name of the data file.
+        table : the parsed table.
+    """
+
+    if not use_data_cache:
+        return
+    try:
+        os.makedirs(data_cache_directory, exist_ok=True)
+        # Write to a temporary file and move it into place, so that other
+        # processes never see a partial file
+        fd, tmp_filename = tempfile.mkstemp(dir=data_cache_directory)
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(
+                _data_file_stamp(filename), file, pickle.HIGHEST_PROTOCOL
+            )
+            pickle.dump(table, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(
+            tmp_filename,
+            os.path.join(data_cache_directory, f"{filename}.pickle"),
+        )
+    except OSError as e:
+        if _print_warnings:
+            print(f"WARNING: Could not cache {filename}: {e}")
+
+
+def clear_cache():
+    """
+    Clear all of the data tables cached in memory.
+
+    The tables are loaded again the next time they are used. This does
+    not affect Element or Species objects that have already been created,
+    or the tables cached on disk.
+    """
+
+    for name in _cached_tables:
+        globals()[name] = None
+    _element_shannon_radii_averages.clear()
+
+
 # Loader and cache for the element oxidation-state data.
 _el_ox_states = None
 
@@ -78,6 +188,9 @@ def lookup_element_oxidation_states(symbol, copy=True):
 
     global _el_ox_states
 
+    if _el_ox_states is None:
+        _el_ox_states = _load_cached_table("oxidation_states.txt")
+
     if _el_ox_states is None:
         _el_ox_states = {}
 
@@ -87,6 +200,7 @@ def lookup_element_oxidation_states(symbol, copy=True):
             _el_ox_states[items[0]] = [
                 int(oxidationState) for oxidationState in items[1:]
             ]
+        _save_cached_table("oxidation_states.txt", _el_ox_states)
 
     if symbol in _el_ox_states:
         if copy:
@@ -131,6 +245,9 @@ def lookup_element_oxidation_states_icsd(symbol, copy=True):
 
     global _el_ox_states_icsd
 
+    if _el_ox_states_icsd is None:
+        _el_ox_states_icsd = _load_cached_table("oxidation_states_icsd.txt")
+
     if _el_ox_states_icsd is None:
         _el_ox_states_icsd = {}
 
@@ -140,6 +257,7 @@ def lookup_element_oxidation_states_icsd(symbol, copy=True):
             _el_ox_states_icsd[items[0]] = [
                 int(oxidationState) for oxidationState in items[1:]
             ]
+        _save_cached_table("oxidation_states_icsd.txt", _el_ox_states_icsd)
     if symbol in _el_ox_states_icsd:
         if copy:
             # _el_ox_states_icsd stores lists -> if copy is set, make an implicit
@@ -184,6 +302,9 @@ def lookup_element_oxidation_states_sp(symbol, copy=True):
 
     global _el_ox_states_sp
 
+    if _el_ox_states_sp is None:
+        _el_ox_states_sp = _load_cached_table("oxidation_states_SP.txt")
+
     if _el_ox_states_sp is None:
         _el_ox_states_sp = {}
 
@@ -193,6 +314,7 @@ def lookup_element_oxidation_states_sp(symbol, copy=True):
             _el_ox_states_sp[items[0]] = [
                 int(oxidationState) for oxidationState in items[1:]
             ]
+        _save_cached_table("oxidation_states_SP.txt", _el_ox_states_sp)
 
     if symbol in _el_ox_states_sp:
         if copy:
@@ -239,6 +361,9 @@ def lookup_element_oxidation_states_wiki(symbol, copy=True):
 
     global _el_ox_states_wiki
 
+    if _el_ox_states_wiki is None:
+        _el_ox_states_wiki = _load_cached_table("oxidation_states_wiki.txt")
+
     if _el_ox_states_wiki is None:
         _el_ox_states_wiki = {}
 
@@ -248,6 +373,7 @@ def lookup_element_oxidation_states_wiki(symbol, copy=True):
             _el_ox_states_wiki[items[0]] = [
                 int(oxidationState) for oxidationState in items[1:]
             ]
+        _save_cached_table("oxidation_states_wiki.txt", _el_ox_states_wiki)
 
     if symbol in _el_ox_states_wiki:
         if copy:
@@ -290,6 +416,9 @@ def lookup_element_hhis(symbol):
 
     global _element_hhis
 
+    if _element_hhis is None:
+        _element_hhis = _load_cached_table("HHIs.txt")
+
     if _element_hhis is None:
         _element_hhis = {}
 
@@ -304,6 +433,7 @@ def lookup_element_hhis(symbol):
                         float(items[1]),
                         float(items[2]),
                     )
+        _save_cached_table("HHIs.txt", _element_hhis)
 
     if symbol in _element_hhis:
         return _element_hhis[symbol]
@@ -343,6 +473,9 @@ def lookup_element_data(symbol, copy=True):
         column headings from data/element_data.txt.
     """
     global _element_data
+    if _element_data is None:
+        _element_data = _load_cached_table("element_data.txt")
+
     if _element_data is None:
         _element_data = {}
         keys = (
@@ -370,6 +503,7 @@ def lookup_element_data(symbol, copy=True):
             _element_data.update(
                 {items[0]: dict(list(zip(keys, clean_items)))}
             )
+        _save_cached_table("element_data.txt", _element_data)
 
     if symbol in _element_data:
         if copy:
@@ -434,6 +568,9 @@ def lookup_element_shannon_radius_data(symbol, copy=True):
 
     global _element_shannon_radii_data
 
+    if _element_shannon_radii_data is None:
+        _element_shannon_radii_data = _load_cached_table("shannon_radii.csv")
+
     if _element_shannon_radii_data is None:
         _element_shannon_radii_data = {}
 
@@ -463,6 +600,7 @@ def lookup_element_shannon_radius_data(symbol, copy=True):
                     _element_shannon_radii_data[key].append(dataset)
                 else:
                     _element_shannon_radii_data[key] = [dataset]
+        _save_cached_table("shannon_radii.csv", _element_shannon_radii_data)
 
     if symbol in _element_shannon_radii_data:
         if copy:
@@ -535,6 +673,11 @@ def lookup_element_shannon_radius_data_extendedML(symbol, copy=True):
 
     global _element_shannon_radii_data_extendedML
 
+    if _element_shannon_radii_data_extendedML is None:
+        _element_shannon_radii_data_extendedML = _load_cached_table(
+            "shannon_radii_ML_extended.csv"
+        )
+
     if _element_shannon_radii_data_extendedML is None:
         _element_shannon_radii_data_extendedML = {}
 
@@ -566,6 +709,10 @@ def lookup_element_shannon_radius_data_extendedML(symbol, copy=True):
                     _element_shannon_radii_data_extendedML[key].append(dataset)
                 else:
                     _element_shannon_radii_data_extendedML[key] = [dataset]
+        _save_cached_table(
+            "shannon_radii_ML_extended.csv",
+            _element_shannon_radii_data_extendedML,
+        )
 
     if symbol in _element_shannon_radii_data_extendedML:
         if copy:
@@ -590,6 +737,79 @@ def lookup_element_shannon_radius_data_extendedML(symbol, copy=True):
         return None
 
 
+# Cache of the mean Shannon radii of each element and charge, computed
+# once for each set of radii.
+
+_element_shannon_radii_averages = {}
+
+
+def _shannon_radius_averages(shannon_radii_data):
+    """Mean crystal and ionic radii for each element and charge."""
+    averages = {}
+    for symbol, datasets in shannon_radii_data.items():
+        charges = {}
+        for dataset in datasets:
+            charges.setdefault(dataset["charge"], []).append(dataset)
+        averages[symbol] = {
+            charge: (
+                np.mean([dataset["crystal_radius"] for dataset in rows]),
+                np.mean([dataset["ionic_radius"] for dataset in rows]),
+            )
+            for charge, rows in charges.items()
+        }
+    return averages
+
+
+def lookup_element_shannon_radius_averages(symbol, charge, source="shannon"):
+    """
+    Retrieve the mean Shannon radii of an element in a charge state.
+
+    The means are taken over all the coordination environments of the
+    charge state. They are calculated for every element the first time
+    a set of radii is used.
+
+    Args:
+        symbol (str) : the atomic symbol of the element to look up.
+        charge (int) : the charge (oxidation state) of the element.
+        source (str) : the set of radii to use, either 'shannon' or
+            'extended' for the machine-learned extended radii.
+
+    Returns:
+        tuple:
+            (mean crystal radius, mean ionic radius). Both are NaN if
+            there are no radii for the charge.
+
+        Returns None if the element was not found among the external
+        data.
+    """
+
+    if source == "shannon":
+        shannon_data = lookup_element_shannon_radius_data(symbol, copy=False)
+        shannon_radii_data = _element_shannon_radii_data
+    elif source == "extended":
+        shannon_data = lookup_element_shannon_radius_data_extendedML(
+            symbol, copy=False
+        )
+        shannon_radii_data = _element_shannon_radii_data_extendedML
+    else:
+        raise ValueError(
+            f"Unknown source of Shannon radii {source}, "
+            "please select 'shannon' or 'extended'."
+        )
+
+    if not shannon_data:
+        return None
+
+    if source not in _element_shannon_radii_averages:
+        _element_shannon_radii_averages[source] = _shannon_radius_averages(
+            shannon_radii_data
+        )
+
+    return _element_shannon_radii_averages[source][symbol].get(
+        charge, (float("nan"), float("nan"))
+    )
+
+
 # Loader and cache for the element solid-state energy (SSE) datasets.
 
 _element_ssedata = None
@@ -627,6 +847,9 @@ def lookup_element_sse_data(symbol):
 
     global _element_ssedata
 
+    if _element_ssedata is None:
+        _element_ssedata = _load_cached_table("SSE.csv")
+
     if _element_ssedata is None:
         _element_ssedata = {}
 
@@ -644,6 +867,7 @@ def lookup_element_sse_data(symbol):
                 }
 
                 _element_ssedata[row[0]] = dataset
+        _save_cached_table("SSE.csv", _element_ssedata)
 
     if symbol in _element_ssedata:
         return _element_ssedata[symbol]
@@ -692,6 +916,9 @@ def lookup_element_sse2015_data(symbol, copy=True):
 
     global _element_sse2015_data
 
+    if _element_sse2015_data is None:
+        _element_sse2015_data = _load_cached_table("SSE_2015.csv")
+
     if _element_sse2015_data is None:
         _element_sse2015_data = {}
 
@@ -713,6 +940,7 @@ def lookup_element_sse2015_data(symbol, copy=True):
                     _element_sse2015_data[key].append(dataset)
                 else:
                     _element_sse2015_data[key] = [dataset]
+        _save_cached_table("SSE_2015.csv", _element_sse2015_data)
 
     if symbol in _element_sse2015_data:
         if copy:
@@ -753,6 +981,9 @@ def lookup_element_sse_pauling_data(symbol):
 
     global _element_ssepauling_data
 
+    if _element_ssepauling_data is None:
+        _element_ssepauling_data = _load_cached_table("SSE_Pauling.csv")
+
     if _element_ssepauling_data is None:
         _element_ssepauling_data = {}
 
@@ -763,6 +994,7 @@ def lookup_element_sse_pauling_data(symbol):
                 dataset = {"SolidStateEnergyPauling": float(row[1])}
 
                 _element_ssepauling_data[row[0]] = dataset
+        _save_cached_table("SSE_Pauling.csv", _element_ssepauling_data)
 
     if symbol in _element_ssepauling_data:
         return _element_ssepauling_data[symbol]
@@ -775,3 +1007,19 @@ def lookup_element_sse_pauling_data(symbol):
             )
 
         return None
+
+
+# The module-level caches of the data tables
+_cached_tables = (
+    "_el_ox_states",
+    "_el_ox_states_icsd",
+    "_el_ox_states_sp",
+    "_el_ox_states_wiki",
+    "_element_hhis",
+    "_element_data",
+    "_element_shannon_radii_data",
+    "_element_shannon_radii_data_extendedML",
+    "_element_ssedata",
+    "_element_sse2015_data",
+    "_element_ssepauling_data",
+)
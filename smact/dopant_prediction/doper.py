@@ -1,10 +1,140 @@
-from typing import List, Tuple
+import heapq
+import multiprocessing
+import os
+from functools import lru_cache
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
+import pandas as pd
 from pymatgen.util import plotting
 
 import smact
 from smact.structure_prediction import mutation, utilities
 
+# The candidate dopant species, built on first use
+_candidates = None
+
+# The number of lambda tables, and of the substitution probabilities of
+# host species, to keep loaded
+MUTATOR_CACHE_SIZE = 4
+SUB_PROBS_CACHE_SIZE = 1024
+
+# Exclusive bounds on the charges of each type of dopant, given the
+# charge of the host species
+_dopant_charges = {
+    "n-type cation substitutions": lambda charge: (charge, np.inf),
+    "p-type cation substitutions": lambda charge: (0, charge),
+    "n-type anion substitutions": lambda charge: (charge, 0),
+    "p-type anion substitutions": lambda charge: (-np.inf, charge),
+}
+
+
+def _table_key(filepath: str = None) -> Tuple:
+    """Identify a lambda table file and its version on disk.
+
+    Cached mutators and probabilities are keyed on this, so that they
+    are reloaded if the file changes.
+
+    """
+    if filepath is None:
+        return (None,)
+    stat = os.stat(filepath)
+    return os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size
+
+
+@lru_cache(maxsize=MUTATOR_CACHE_SIZE)
+def _load_mutator(table_key: Tuple) -> mutation.CationMutator:
+    return mutation.CationMutator.from_json(table_key[0])
+
+
+def _get_mutator(filepath: str = None) -> mutation.CationMutator:
+    """Get the CationMutator for a lambda table, loading it once."""
+    return _load_mutator(_table_key(filepath))
+
+
+def _get_candidates() -> Tuple[np.ndarray, np.ndarray]:
+    """Get the candidate dopant species and their charges.
+
+    These are the species of every element in its known oxidation states.
+
+    """
+    global _candidates
+    if _candidates is None:
+        species = {
+            (element.symbol, state): None
+            for element in smact.element_dictionary().values()
+            for state in element.oxidation_states
+        }
+        _candidates = (
+            np.array(
+                [utilities.unparse_spec(spec) for spec in species],
+                dtype=object,
+            ),
+            np.array([charge for _, charge in species]),
+        )
+    return _candidates
+
+
+@lru_cache(maxsize=SUB_PROBS_CACHE_SIZE)
+def _load_sub_probs(host: str, table_key: Tuple) -> np.ndarray:
+    spec_strs, _ = _get_candidates()
+    probs = _load_mutator(table_key).sub_prob_many(
+        [(host, spec) for spec in spec_strs]
+    )
+    # The array is shared by every caller
+    probs.flags.writeable = False
+    return probs
+
+
+def _get_sub_probs(host: str, filepath: str = None) -> np.ndarray:
+    """Get the substitution probabilities of a host species by each candidate."""
+    return _load_sub_probs(host, _table_key(filepath))
+
+
+def _get_dopants(
+    original_species: Tuple[str, ...], num_dopants: int, filepath: str
+) -> dict:
+    """Find the most likely dopants of a host material.
+
+    See :meth:`Doper.get_dopants`.
+
+    """
+    cations = []
+    anions = []
+    try:
+        for ion in original_species:
+            _, charge = utilities.parse_spec(ion)
+            if charge > 0:
+                cations.append((ion, charge))
+            elif charge < 0:
+                anions.append((ion, charge))
+    except Exception as e:
+        print(f"{e}: charge is not defined for {ion}!")
+
+    spec_strs, charges = _get_candidates()
+    table_key = _table_key(filepath)
+
+    results = {}
+    for dopant_type, dopant_charges in _dopant_charges.items():
+        # Anions are never their own dopants, as the charges differ
+        hosts = cations if "cation" in dopant_type else anions
+        subs = []
+        for host, charge in hosts:
+            probs = _load_sub_probs(host, table_key)
+            low, high = dopant_charges(charge)
+            candidates = np.flatnonzero((charges > low) & (charges < high))
+            best = candidates[
+                np.argsort(-probs[candidates], kind="stable")[:num_dopants]
+            ]
+            subs += [(spec_strs[j], host, probs[j]) for j in best]
+        # Keep the best of each host's suggestions, in the order found
+        # for equal probabilities
+        results[dopant_type] = heapq.nlargest(
+            num_dopants, subs, key=itemgetter(2)
+        )
+    return results
+
 
 class Doper:
     """
@@ -50,46 +180,6 @@ class Doper:
     def filepath(self, filepath):
         self._filepath = filepath
 
-    def _get_cation_dopants(
-        self, element_objects: List[smact.Element], cations: List[str]
-    ):
-        poss_n_type_cat = set()
-        poss_p_type_cat = set()
-
-        for element in element_objects:
-            # [-2, -1, 0, +1, +2]
-            oxi_state = element.oxidation_states
-            el_symbol = element.symbol
-            for state in oxi_state:
-                for cation in cations:
-                    ele = utilities.unparse_spec((el_symbol, state))
-                    _, charge = utilities.parse_spec(cation)
-                    if state > charge:
-                        poss_n_type_cat.add(ele)
-                    elif state < charge and state > 0:
-                        poss_p_type_cat.add(ele)
-
-        return list(poss_n_type_cat), list(poss_p_type_cat)
-
-    def _get_anion_dopants(
-        self, element_objects: List[smact.Element], anions: List[str]
-    ):
-        poss_n_type_an = set()
-        poss_p_type_an = set()
-
-        for element in element_objects:
-            oxi_state = element.oxidation_states
-            el_symbol = element.symbol
-            for state in oxi_state:
-                for anion in anions:
-                    ele = utilities.unparse_spec((el_symbol, state))
-                    _, charge = utilities.parse_spec(anion)
-                    if state > charge and state < 0:
-                        poss_n_type_an.add(ele)
-                    elif state < charge:
-                        poss_p_type_an.add(ele)
-        return list(poss_n_type_an), list(poss_p_type_an)
-
     def get_dopants(
         self,
         num_dopants: int = 5,
@@ -113,81 +203,34 @@ class Doper:
                 'p-type anion substitutions': [('N3-', 0.0014663800608945628),
                 ('C4-', 9.31310255126729e-08)]}
         """
-
-        cations = []
-        anions = []
-        try:
-            for ion in self._original_species:
-                _, charge = utilities.parse_spec(ion)
-                if charge > 0:
-                    cations.append(ion)
-                elif charge < 0:
-                    anions.append(ion)
-        except Exception as e:
-            print(f"{e}: charge is not defined for {ion}!")
-
-        CM = mutation.CationMutator.from_json(self._filepath)
-
-        # call all elements
-        element_objects = list(smact.element_dictionary().values())
-
-        poss_n_type_cat, poss_p_type_cat = self._get_cation_dopants(
-            element_objects, cations
-        )
-        poss_n_type_an, poss_p_type_an = self._get_anion_dopants(
-            element_objects, anions
+        self.results = _get_dopants(
+            self._original_species, num_dopants, self._filepath
         )
+        # return the top (num_dopants) results for each case
+        return self.results
 
-        n_type_cat, p_type_cat, n_type_an, p_type_an = [], [], [], []
-        for cation in cations:
-            cation_charge = utilities.parse_spec(cation)[1]
-            for n_specie in poss_n_type_cat:
-                n_specie_charge = utilities.parse_spec(n_specie)[1]
-                if cation_charge >= n_specie_charge:
-                    continue
-                n_type_cat.append(
-                    (n_specie, cation, CM.sub_prob(cation, n_specie))
-                )
-            for p_specie in poss_p_type_cat:
-                p_specie_charge = utilities.parse_spec(p_specie)[1]
-                if cation_charge <= p_specie_charge:
-                    continue
-                p_type_cat.append(
-                    (p_specie, cation, CM.sub_prob(cation, p_specie))
-                )
+    @staticmethod
+    def get_dopants_many(
+        hosts: Iterable[Tuple[str, ...]],
+        num_dopants: int = 5,
+        filepath: str = None,
+    ) -> List[dict]:
+        """
+        Get the dopant suggestions for several host materials at once.
 
-        for anion in anions:
-            anion_charge = utilities.parse_spec(anion)[1]
-            for n_specie in poss_n_type_an:
-                n_specie_charge = utilities.parse_spec(n_specie)[1]
-                if anion == n_specie or anion_charge >= n_specie_charge:
-                    continue
-                n_type_an.append(
-                    (n_specie, anion, CM.sub_prob(anion, n_specie))
-                )
-            for p_specie in poss_p_type_an:
-                p_specie_charge = utilities.parse_spec(p_specie)[1]
-                if anion == p_specie or anion_charge <= p_specie_charge:
-                    continue
-                p_type_an.append(
-                    (p_specie, anion, CM.sub_prob(anion, p_specie))
-                )
+        The lambda table and the substitution probabilities of each host
+        species are only computed once, however many hosts share them.
 
-        # [('B3+', 0.003), ('C4+', 0.001), (), (), ...] : list(tuple(str, float))
-        # sort by probability
-        n_type_cat.sort(key=lambda x: x[-1], reverse=True)
-        p_type_cat.sort(key=lambda x: x[-1], reverse=True)
-        n_type_an.sort(key=lambda x: x[-1], reverse=True)
-        p_type_an.sort(key=lambda x: x[-1], reverse=True)
-
-        self.results = {
-            "n-type cation substitutions": n_type_cat[:num_dopants],
-            "p-type cation substitutions": p_type_cat[:num_dopants],
-            "n-type anion substitutions": n_type_an[:num_dopants],
-            "p-type anion substitutions": p_type_an[:num_dopants],
-        }
-        # return the top (num_dopants) results for each case
-        return self.results
+        Args:
+            hosts (iterable): Tuples of the species of each host material,
+                as passed to :class:`~.Doper`.
+            num_dopants (int): The number of suggestions to return for n- and p-type dopants.
+            filepath (str): lambda table json file
+        Returns:
+            (list): The dopant suggestions for each host, as returned
+            by :meth:`get_dopants`.
+        """
+        return [_get_dopants(host, num_dopants, filepath) for host in hosts]
 
     def plot_dopants(self) -> None:
         """
@@ -210,3 +253,94 @@ class Doper:
                 )
         except AttributeError as e:
             print(f"Dopants are not calculated. Run get_dopants first.")
+
+
+def _init_worker(filepath: str = None):
+    """Load the lambda table and candidates in a worker process."""
+    _get_mutator(filepath)
+    _get_candidates()
+
+
+def _get_host_dopants(
+    args: Tuple[Tuple[str, ...], int, str]
+) -> Tuple[Tuple[str, ...], dict]:
+    host, num_dopants, filepath = args
+    return host, _get_dopants(host, num_dopants, filepath)
+
+
+def iter_dopants(
+    hosts: Iterable[Tuple[str, ...]],
+    num_dopants: int = 5,
+    filepath: str = None,
+    processes: Optional[int] = None,
+    chunksize: int = 16,
+    output: Optional[str] = None,
+) -> Iterator[Tuple[Tuple[str, ...], dict]]:
+    """
+    Get the dopant suggestions for many host materials in parallel.
+
+    The lambda table is loaded before the worker processes are started,
+    so that they share it: forked workers inherit it, and others
+    memory-map the copy cached by :meth:`.CationMutator.from_json`,
+    if the cache is enabled.
+
+    Args:
+        hosts (iterable): Tuples of the species of each host material,
+            as passed to :class:`~.Doper`.
+        num_dopants (int): The number of suggestions to return for n- and p-type dopants.
+        filepath (str): lambda table json file
+        processes (int): The number of worker processes. Defaults to the
+            number of CPUs. With 1, the hosts are processed in this process,
+            which is often fastest for a few thousand hosts, as each host
+            takes well under a millisecond once its species have been seen.
+        chunksize (int): The number of hosts sent to a worker at a time.
+        output (str): Optionally, the path of a Parquet file to write the
+            suggestions to once all the hosts are processed, with one row
+            per suggestion and columns "host", "dopant_type", "rank",
+            "dopant", "host_species" and "probability". This requires
+            pyarrow or fastparquet to be installed.
+    Yields:
+        (tuple): Tuples of (host, dopant suggestions), in the order the
+        hosts are finished, with the suggestions as returned by
+        :meth:`Doper.get_dopants`.
+    """
+    _init_worker(filepath)
+    tasks = ((host, num_dopants, filepath) for host in hosts)
+
+    rows = [] if output is not None else None
+    if processes == 1:
+        results = map(_get_host_dopants, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(
+            processes, initializer=_init_worker, initargs=(filepath,)
+        )
+        results = pool.imap_unordered(_get_host_dopants, tasks, chunksize)
+
+    try:
+        for host, result in results:
+            if rows is not None:
+                rows.extend(
+                    (" ".join(host), dopant_type, rank, *sub)
+                    for dopant_type, subs in result.items()
+                    for rank, sub in enumerate(subs)
+                )
+            yield host, result
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    if rows is not None:
+        df = pd.DataFrame(
+            rows,
+            columns=[
+                "host",
+                "dopant_type",
+                "rank",
+                "dopant",
+                "host_species",
+                "probability",
+            ],
+        )
+        df["dopant_type"] = df["dopant_type"].astype("category")
+        df.to_parquet(output)
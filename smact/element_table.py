@@ -0,0 +1,270 @@
+"""
+Dense array of numeric element properties that can be shared between
+processes.
+
+:class:`ElementTable` holds the numeric properties of the elements as a
+single float64 array, with one row per atomic number and one column per
+property. Missing values are stored as NaN. The table can be published
+once through :mod:`multiprocessing.shared_memory`, so that worker
+processes attach to the same array rather than each parsing the data
+files and building their own :class:`smact.Element` objects.
+
+The table is pickled by name once it is published, so it can be passed
+directly to the functions run by a :class:`multiprocessing.pool.Pool`.
+
+Example:
+    >>> from smact.element_table import ElementTable
+    >>> with ElementTable.from_elements() as table:
+    ...     name = table.publish()
+    ...     shared = ElementTable.attach(name)  # e.g. in a worker process
+    ...     shared.values(["Na", "Cl"], "pauling_eneg")
+    ...     shared.close()
+    array([0.93, 3.16])
+
+"""
+
+from multiprocessing import shared_memory
+from typing import Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+import smact
+
+# Largest atomic number with data in smact
+MAX_NUMBER = 103
+
+# Numeric Element attributes stored in the table, in column order
+PROPERTIES = (
+    "number",
+    "mass",
+    "pauling_eneg",
+    "ionpot",
+    "e_affinity",
+    "eig",
+    "eig_s",
+    "covalent_radius",
+    "dipol",
+    "crustal_abundance",
+    "HHI_p",
+    "HHI_r",
+    "SSE",
+    "SSEPauling",
+)
+
+_SHAPE = (MAX_NUMBER + 1, len(PROPERTIES))
+
+# Atomic number of each element symbol, built on first use
+_numbers = {}
+
+
+class ElementTable:
+    """Numeric element properties as a dense array indexed by atomic number.
+
+    Row 0 is unused, so that ``table.data[Z]`` is the row for the element
+    with atomic number Z.
+
+    Attributes:
+        data (numpy.ndarray): Array of shape (MAX_NUMBER + 1,
+            len(PROPERTIES)) holding the properties.
+        name (str): Name of the shared memory block holding the data, or
+            None if the table has not been published.
+
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        shm: Optional[shared_memory.SharedMemory] = None,
+        owner: bool = False,
+    ):
+        """Wrap an existing array of properties.
+
+        Use :meth:`from_elements` to build a new table, and :meth:`attach`
+        to use a table published by another process.
+
+        Args:
+            data (numpy.ndarray): Array of shape (MAX_NUMBER + 1,
+                len(PROPERTIES))
+            shm (SharedMemory): Shared memory block holding data, if any
+            owner (bool): Whether this table created the shared memory
+                block and is responsible for unlinking it
+
+        """
+        if data.shape != _SHAPE:
+            raise ValueError(
+                f"ElementTable data must have shape {_SHAPE}, not {data.shape}."
+            )
+        self.data = data
+        self._shm = shm
+        self._owner = owner
+
+    @classmethod
+    def from_elements(cls) -> "ElementTable":
+        """Build the table from :class:`smact.Element` data.
+
+        Returns:
+            ElementTable: A table that is not yet shared.
+
+        """
+        data = np.full(_SHAPE, np.nan)
+        for number, symbol in enumerate(
+            smact.ordered_elements(1, MAX_NUMBER), 1
+        ):
+            element = smact.Element(symbol)
+            data[number] = [
+                np.nan if value is None else value
+                for value in (
+                    getattr(element, attribute) for attribute in PROPERTIES
+                )
+            ]
+        return cls(data)
+
+    @property
+    def name(self) -> Optional[str]:
+        return None if self._shm is None else self._shm.name
+
+    def publish(self, name: Optional[str] = None) -> str:
+        """Copy the table into a new shared memory block.
+
+        After this, :attr:`data` is a view of the shared memory. The
+        publishing process should call :meth:`close` and :meth:`unlink`
+        once all workers have finished with the table.
+
+        Args:
+            name (str): Name for the shared memory block. By default a
+                unique name is chosen.
+
+        Returns:
+            str: Name of the shared memory block, to pass to
+            :meth:`attach` in the worker processes.
+
+        """
+        if self._shm is not None:
+            return self._shm.name
+
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=self.data.nbytes
+        )
+        data = np.ndarray(_SHAPE, dtype=np.float64, buffer=shm.buf)
+        data[:] = self.data
+        self.data, self._shm, self._owner = data, shm, True
+        return shm.name
+
+    @classmethod
+    def attach(cls, name: str) -> "ElementTable":
+        """Use a table published by another process, without copying it.
+
+        The table should be published by this process or one of its
+        parents: on Python < 3.13 the shared memory is registered with
+        the resource tracker of the attaching process, which removes it
+        when an unrelated process exits.
+
+        Args:
+            name (str): Name returned by :meth:`publish`
+
+        Returns:
+            ElementTable: A read-only view of the shared table.
+
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # The track argument was added in Python 3.13
+            shm = shared_memory.SharedMemory(name=name)
+        data = np.ndarray(_SHAPE, dtype=np.float64, buffer=shm.buf)
+        data.flags.writeable = False
+        return cls(data, shm)
+
+    def close(self):
+        """Detach from the shared memory block, if any.
+
+        The table can't be used after this.
+
+        """
+        if self._shm is not None:
+            self.data = None
+            self._shm.close()
+
+    def unlink(self):
+        """Free the shared memory block.
+
+        Only the process that published the table should call this, after
+        all the processes using it have closed it.
+
+        """
+        if self._shm is not None and self._owner:
+            self._shm.unlink()
+            self._owner = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        self.unlink()
+
+    def __reduce__(self):
+        # Shared tables are sent to other processes by name
+        if self._shm is not None:
+            return ElementTable.attach, (self._shm.name,)
+        return ElementTable, (self.data,)
+
+    @staticmethod
+    def numbers(symbols: Iterable[str]) -> np.ndarray:
+        """Atomic numbers of a sequence of element symbols.
+
+        Args:
+            symbols (iterable): Element symbols
+
+        Returns:
+            numpy.ndarray: Atomic numbers, as indices into the table
+
+        """
+        if not _numbers:
+            _numbers.update(
+                (symbol, number)
+                for number, symbol in enumerate(
+                    smact.ordered_elements(1, MAX_NUMBER), 1
+                )
+            )
+        try:
+            return np.array([_numbers[symbol] for symbol in symbols])
+        except KeyError as e:
+            raise NameError(f"Elemental data for {e.args[0]} not found.")
+
+    def column(self, prop: str) -> np.ndarray:
+        """All the values of one property, indexed by atomic number.
+
+        Args:
+            prop (str): One of PROPERTIES
+
+        Returns:
+            numpy.ndarray: View of the column of the table
+
+        """
+        return self.data[:, PROPERTIES.index(prop)]
+
+    def values(
+        self,
+        symbols: Sequence[str],
+        props: Union[str, Sequence[str], None] = None,
+    ) -> np.ndarray:
+        """Look up properties of several elements at once.
+
+        Args:
+            symbols (sequence): Element symbols
+            props (str or sequence): A property, or a list of properties.
+                By default, all of PROPERTIES.
+
+        Returns:
+            numpy.ndarray: One value per symbol if props is a single
+            property, otherwise one row per symbol and one column per
+            property.
+
+        """
+        rows = self.numbers(symbols)
+        if props is None:
+            return self.data[rows]
+        if isinstance(props, str):
+            return self.data[rows, PROPERTIES.index(props)]
+        return self.data[np.ix_(rows, [PROPERTIES.index(p) for p in props])]
@@ -1,10 +1,19 @@
 import itertools
+import operator
+import os
 import warnings
+from array import array
 from collections import namedtuple
+from functools import partial, reduce
 from itertools import combinations
-from typing import Iterable, List, Optional, Tuple, Union
+from multiprocessing import Pool
+from typing import Callable, Generator, Iterable, List, Optional, Tuple, Union
 
-from smact import Element, neutral_ratios
+import numpy as np
+
+import smact
+from smact import Element, neutral_ratios, ordered_elements
+from smact.element_table import ElementTable
 
 # Use named tuple to improve readability of smact_filter outputs
 _allowed_compositions = namedtuple(
@@ -14,6 +23,10 @@ _allowed_compositions_nonunique = namedtuple(
     "Composition", ["element_symbols", "stoichiometries"]
 )
 
+# Upper bound on the number of (oxidation state, stoichiometry) pairs
+# tested at once by the vectorised smact_filter engine
+_VECTORISED_BLOCK_SIZE = 2**22
+
 
 def pauling_test(
     oxidation_states: List[int],
@@ -105,6 +118,118 @@ def _no_repeats(
             return True
 
 
+def pauling_test_many(
+    ox_array: np.ndarray,
+    eneg_array: np.ndarray,
+    symbols: Optional[Union[List[str], np.ndarray]] = None,
+    repeat_anions: bool = True,
+    repeat_cations: bool = True,
+    threshold: float = 0.0,
+) -> np.ndarray:
+    """Apply :func:`pauling_test` to many combinations of oxidation states
+    at once.
+
+    Each row of ox_array is one combination of oxidation states and gives
+    the same result as pauling_test, including for the repeat_anions and
+    repeat_cations options and for missing electronegativities. Rows with
+    all electronegativities known are tested with a single comparison of
+    the most electronegative cation and least electronegative anion; the
+    others fall back to the pairwise tests, applied to all of the rows
+    together.
+
+    Args:
+        ox_array (np.ndarray): Oxidation states, one combination per row
+        eneg_array (np.ndarray): Pauling electronegativities, either one
+            per column or with the same shape as ox_array. None or NaN
+            is treated as a missing value.
+        symbols (list): Chemical symbols, either one per column or with
+            the same shape as ox_array. Only needed if repeat_anions or
+            repeat_cations is False.
+        repeat_anions (bool): allow an anion to repeat in different
+            oxidation states in the same compound
+        repeat_cations (bool): as above, but for cations
+        threshold (float): a tolerance for the allowed deviation from
+            the Pauling criterion
+
+    Returns:
+        np.ndarray: Boolean array with one entry per row of ox_array
+
+    Raises:
+        TypeError: for a missing electronegativity where pauling_test
+            would also raise one
+
+    """
+    ox_array = np.atleast_2d(np.asarray(ox_array))
+    enegs = np.broadcast_to(
+        np.asarray(eneg_array, dtype=float), ox_array.shape
+    )
+    n_rows, n_sites = ox_array.shape
+    passed = np.ones(n_rows, dtype=bool)
+    pairs = list(combinations(range(n_sites), 2))
+
+    if (
+        not (repeat_anions and repeat_cations)
+        and symbols is not None
+        and len(symbols)
+    ):
+        _, codes = np.unique(np.asarray(symbols), return_inverse=True)
+        codes = np.broadcast_to(
+            codes.reshape(np.shape(symbols)), ox_array.shape
+        )
+        # Same classification of cations and anions as _no_repeats
+        cations = ox_array > 0
+        for i, j in pairs:
+            repeat = codes[:, i] == codes[:, j]
+            if repeat_anions:
+                repeat &= cations[:, i] & cations[:, j]
+            elif repeat_cations:
+                repeat &= ~cations[:, i] & ~cations[:, j]
+            passed &= ~repeat
+
+    # Fast path for rows without missing electronegativities
+    missing = np.isnan(enegs).any(axis=1)
+    fast = passed & ~missing
+    max_cation = np.where(ox_array > 0, enegs, -np.inf).max(axis=1)
+    min_anion = np.where(ox_array < 0, enegs, np.inf).min(axis=1)
+    if threshold == 0.0:
+        passed[fast] = (max_cation < min_anion)[fast]
+    else:
+        passed[fast] = (max_cation - min_anion <= threshold)[fast]
+
+    # Pairwise tests for the rest, in the same order as
+    # eneg_states_test and eneg_states_test_threshold
+    undecided = passed & missing
+    for i, j in pairs:
+        if not undecided.any():
+            break
+        ox1, ox2 = ox_array[:, i], ox_array[:, j]
+        eneg1, eneg2 = enegs[:, i], enegs[:, j]
+        cation_anion = (ox1 > 0) & (ox2 < 0)
+        anion_cation = (ox1 < 0) & (ox2 > 0)
+        unknown = np.isnan(eneg1) | np.isnan(eneg2)
+        if (undecided & (cation_anion | anion_cation) & unknown).any():
+            raise TypeError(
+                "Cannot compare the electronegativities of species with "
+                "a missing Pauling electronegativity"
+            )
+        with np.errstate(invalid="ignore"):
+            if threshold == 0.0:
+                failed = (
+                    (cation_anion & (eneg1 >= eneg2))
+                    | (anion_cation & (eneg1 <= eneg2))
+                    | unknown
+                )
+            else:
+                failed = (cation_anion & (eneg1 - eneg2 > threshold)) | (
+                    anion_cation & (eneg2 - eneg1 > threshold)
+                )
+        failed &= undecided
+        passed &= ~failed
+        undecided &= ~failed
+
+    return passed
+
+
 def pauling_test_old(
     ox: List[int],
     paul: List[float],
@@ -307,6 +432,481 @@ def ml_rep_generator(
     return norm
 
 
+def _product_array(values: List[List[int]]) -> np.ndarray:
+    """Build the cartesian product of several lists as an integer array.
+
+    Rows are ordered as they would be by :func:`itertools.product`.
+
+    Args:
+        values (list): One list of integers per site
+
+    Returns:
+        np.ndarray: Array of shape (n_combinations, n_sites)
+
+    """
+    axes = [np.asarray(v, dtype=np.int64) for v in values]
+    idx = np.indices([len(a) for a in axes]).reshape(len(axes), -1)
+    return np.stack([a[i] for a, i in zip(axes, idx)], axis=1)
+
+
+def _stoichiometry_grid(
+    n_sites: int,
+    stoichs: Optional[List[List[int]]] = None,
+    threshold: Optional[int] = 8,
+) -> np.ndarray:
+    """Enumerate the stoichiometries tried by :func:`smact.neutral_ratios`.
+
+    Only ratios in their simplest form (greatest common divisor of 1)
+    are kept, in the same order as :func:`smact.neutral_ratios_iter`.
+
+    Args:
+        n_sites (int): Number of sites in the composition
+        stoichs (list[list[int]]): A selection of valid stoichiometric
+            ratios for each site
+        threshold (int): Maximum stoichiometry coefficient, used if
+            stoichs is not given
+
+    Returns:
+        np.ndarray: Array of shape (n_ratios, n_sites)
+
+    """
+    if not stoichs:
+        stoichs = [list(range(1, threshold + 1))] * n_sites
+    grid = _product_array(stoichs)
+    return grid[np.gcd.reduce(grid, axis=1) == 1]
+
+
+def _smact_filter_vectorised(
+    symbols: Tuple[str, ...],
+    ox_combos: List[List[int]],
+    electronegs: List[float],
+    stoichs: Optional[List[List[int]]] = None,
+    threshold: Optional[int] = 8,
+) -> Generator[
+    Tuple[Tuple[str, ...], Tuple[int, ...], Tuple[int, ...]], None, None
+]:
+    """NumPy implementation of the charge neutrality and electronegativity
+    tests applied by :func:`smact_filter`.
+
+    The oxidation-state product is built as an integer array and tested
+    against the whole stoichiometry grid with a single matrix product,
+    in blocks of at most _VECTORISED_BLOCK_SIZE pairs.
+
+    Args:
+        symbols (tuple): Element symbols of each site
+        ox_combos (list[list[int]]): Allowed oxidation states of each site
+        electronegs (list): Pauling electronegativity of each site
+        stoichs (list[list[int]]): A selection of valid stoichiometric
+            ratios for each site
+        threshold (int): Threshold for stoichiometry limit
+
+    Yields:
+        tuple: Compositions as (symbols, oxidation states, ratios) tuples,
+        in the same order as the default smact_filter engine. Each block
+        is yielded as soon as it has been tested.
+
+    """
+    ox_array = _product_array(ox_combos)
+    grid = _stoichiometry_grid(len(symbols), stoichs, threshold)
+    # Small integers are exact in floating point, which allows BLAS to be
+    # used for the matrix product
+    grid_t = grid.T.astype(float)
+    ratios = [tuple(ratio) for ratio in grid.tolist()]
+
+    block = max(1, _VECTORISED_BLOCK_SIZE // max(1, len(ratios)))
+    for start in range(0, len(ox_array), block):
+        ox_block = ox_array[start : start + block]
+        neutral = ox_block.astype(float) @ grid_t == 0
+
+        # Electronegativity test, only for states with a neutral ratio
+        rows = np.flatnonzero(neutral.any(axis=1))
+        rows = rows[pauling_test_many(ox_block[rows], electronegs)]
+
+        ox_states = [tuple(ox) for ox in ox_block[rows].tolist()]
+        for i, j in zip(*np.nonzero(neutral[rows])):
+            yield symbols, ox_states[i], ratios[j]
+
+
+def _smact_filter_python(
+    symbols: Tuple[str, ...],
+    ox_combos: List[List[int]],
+    electronegs: List[float],
+    stoichs: Optional[List[List[int]]] = None,
+    threshold: Optional[int] = 8,
+) -> Generator[
+    Tuple[Tuple[str, ...], Tuple[int, ...], Tuple[int, ...]], None, None
+]:
+    """Apply the tests of :func:`smact_filter` to one combination of
+    oxidation states at a time.
+
+    Args:
+        symbols (tuple): Element symbols of each site
+        ox_combos (list[list[int]]): Allowed oxidation states of each site
+        electronegs (list): Pauling electronegativity of each site
+        stoichs (list[list[int]]): A selection of valid stoichiometric
+            ratios for each site
+        threshold (int): Threshold for stoichiometry limit
+
+    Yields:
+        tuple: Compositions as (symbols, oxidation states, ratios) tuples
+
+    """
+    for ox_states in itertools.product(*ox_combos):
+        # Test for charge balance
+        cn_e, cn_r = neutral_ratios(
+            ox_states, stoichs=stoichs, threshold=threshold
+        )
+        # Electronegativity test
+        if cn_e and pauling_test(ox_states, electronegs):
+            for ratio in cn_r:
+                yield symbols, ox_states, ratio
+
+
+def _ratio_indexer(
+    n_sites: int,
+    stoichs: Optional[List[List[int]]] = None,
+    threshold: Optional[int] = 8,
+) -> Tuple[int, Callable[[Tuple[int, ...]], int]]:
+    """Number every ratio of the stoichiometry grid with a unique integer.
+
+    Args:
+        n_sites (int): Number of sites
+        stoichs (list[list[int]]): A selection of valid stoichiometric
+            ratios for each site
+        threshold (int): Threshold for stoichiometry limit
+
+    Returns:
+        size (int): Number of ratios in the grid
+        index (callable): Maps a ratio tuple to an integer in range(size)
+
+    """
+    if not stoichs:
+        stoichs = [range(1, threshold + 1)] * n_sites
+    positions = [{s: i for i, s in enumerate(site)} for site in stoichs]
+    radices = [len(site) for site in stoichs]
+
+    def index(ratio):
+        i = 0
+        for position, radix, stoich in zip(positions, radices, ratio):
+            i = i * radix + position[stoich]
+        return i
+
+    return reduce(operator.mul, radices, 1), index
+
+
+class CompositionArray:
+    """Compact columnar store for the output of :func:`smact_filter`.
+
+    Each composition is one row of three 2D arrays: the atomic numbers of
+    the elements (uint8), their oxidation states (int8) and their
+    stoichiometries (uint8). This takes a few bytes per composition, and
+    the arrays pickle and save without any per-composition overhead.
+
+    Iterating over (or indexing) a CompositionArray gives the same
+    Composition namedtuples that smact_filter returns with comp_tuple=True.
+
+    Attributes:
+        numbers (numpy.ndarray): Atomic numbers of the elements, shape
+            (n_compositions, n_sites)
+        oxidation_states (numpy.ndarray or None): Oxidation states, with
+            the same shape as numbers, or None if species are not unique
+        stoichiometries (numpy.ndarray): Stoichiometric ratios, with the
+            same shape as numbers
+
+    """
+
+    _symbols = (None,) + tuple(ordered_elements(1, 103))
+    _numbers = {symbol: z for z, symbol in enumerate(_symbols) if z}
+
+    def __init__(
+        self,
+        numbers: np.ndarray,
+        oxidation_states: Optional[np.ndarray],
+        stoichiometries: np.ndarray,
+    ):
+        self.numbers = np.asarray(numbers, dtype=np.uint8)
+        self.oxidation_states = (
+            None
+            if oxidation_states is None
+            else np.asarray(oxidation_states, dtype=np.int8)
+        )
+        self.stoichiometries = np.asarray(stoichiometries, dtype=np.uint8)
+
+    @classmethod
+    def from_compositions(
+        cls,
+        compositions: Iterable[tuple],
+        n_sites: Optional[int] = None,
+        species_unique: Optional[bool] = None,
+    ) -> "CompositionArray":
+        """Build a CompositionArray from smact_filter style tuples.
+
+        The tuples are packed as they are read, so compositions can be
+        streamed from :func:`iter_smact_filter` without building a list.
+
+        Args:
+            compositions (iterable): Compositions as (symbols, oxidation
+                states, ratios) or (symbols, ratios) tuples
+            n_sites (int): Number of sites per composition, only needed
+                to shape the arrays when there are no compositions
+            species_unique (bool): Whether the compositions include
+                oxidation states. By default this is taken from the
+                first composition.
+
+        Returns:
+            CompositionArray
+
+        """
+        numbers, ox_states, stoichs = array("B"), array("b"), array("B")
+        for comp in compositions:
+            if not numbers:
+                n_sites = len(comp[0])
+                if species_unique is None:
+                    species_unique = len(comp) == 3
+            try:
+                numbers.extend(cls._numbers[symbol] for symbol in comp[0])
+                if species_unique:
+                    ox_states.extend(comp[1])
+                stoichs.extend(comp[-1])
+            except OverflowError:
+                raise ValueError(
+                    f"Cannot store {comp} in a CompositionArray: "
+                    "oxidation states must fit in an int8 and "
+                    "stoichiometries in a uint8."
+                )
+
+        shape = (-1, n_sites or 0)
+        return cls(
+            np.frombuffer(numbers, dtype=np.uint8).reshape(shape),
+            np.frombuffer(ox_states, dtype=np.int8).reshape(shape)
+            if species_unique is not False
+            else None,
+            np.frombuffer(stoichs, dtype=np.uint8).reshape(shape),
+        )
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __getitem__(self, index):
+        if not isinstance(index, (int, np.integer)):
+            return CompositionArray(
+                self.numbers[index],
+                None
+                if self.oxidation_states is None
+                else self.oxidation_states[index],
+                self.stoichiometries[index],
+            )
+        symbols = tuple(self._symbols[z] for z in self.numbers[index])
+        stoichs = tuple(self.stoichiometries[index].tolist())
+        if self.oxidation_states is None:
+            return _allowed_compositions_nonunique(symbols, stoichs)
+        return _allowed_compositions(
+            symbols, tuple(self.oxidation_states[index].tolist()), stoichs
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f"<CompositionArray: {len(self)} compositions>"
+
+    def to_records(self) -> np.ndarray:
+        """Return the compositions as a NumPy structured array.
+
+        Returns:
+            numpy.ndarray: Structured array with numbers, oxidation_states
+            (if species are unique) and stoichiometries fields
+
+        """
+        columns = [("numbers", self.numbers)]
+        if self.oxidation_states is not None:
+            columns.append(("oxidation_states", self.oxidation_states))
+        columns.append(("stoichiometries", self.stoichiometries))
+
+        n_sites = self.numbers.shape[1]
+        records = np.empty(
+            len(self),
+            dtype=[(name, col.dtype, (n_sites,)) for name, col in columns],
+        )
+        for name, col in columns:
+            records[name] = col
+        return records
+
+    def save(self, filename: str):
+        """Save the compositions to a .npy file.
+
+        Args:
+            filename (str): Path of the file to write
+
+        """
+        np.save(filename, self.to_records())
+
+    @classmethod
+    def load(cls, filename: str) -> "CompositionArray":
+        """Load compositions saved with :meth:`save`.
+
+        Args:
+            filename (str): Path of the .npy file
+
+        Returns:
+            CompositionArray
+
+        """
+        records = np.load(filename)
+        return cls(
+            records["numbers"],
+            records["oxidation_states"]
+            if "oxidation_states" in records.dtype.names
+            else None,
+            records["stoichiometries"],
+        )
+
+    def to_pandas(self):
+        """Return the compositions as a pandas DataFrame.
+
+        There is one column per site for each of the element, oxidation
+        state and stoichiometry. Elements are stored as a categorical
+        column, so no strings are created per composition.
+
+        Returns:
+            pandas.DataFrame
+
+        """
+        import pandas as pd
+
+        data = {}
+        for site in range(self.numbers.shape[1]):
+            data[f"element_{site}"] = pd.Categorical.from_codes(
+                self.numbers[:, site].astype(np.int16) - 1,
+                categories=self._symbols[1:],
+            )
+            if self.oxidation_states is not None:
+                data[f"oxidation_state_{site}"] = self.oxidation_states[
+                    :, site
+                ]
+            data[f"stoichiometry_{site}"] = self.stoichiometries[:, site]
+        return pd.DataFrame(data)
+
+    def to_parquet(self, filename: str, **kwargs):
+        """Save the compositions to a Parquet file.
+
+        This requires pyarrow or fastparquet to be installed.
+
+        Args:
+            filename (str): Path of the file to write
+            **kwargs: Passed to pandas.DataFrame.to_parquet
+
+        """
+        self.to_pandas().to_parquet(filename, **kwargs)
+
+
+def iter_smact_filter(
+    els: Union[Tuple[Element], List[Element]],
+    threshold: Optional[int] = 8,
+    stoichs: Optional[List[List[int]]] = None,
+    species_unique: bool = True,
+    oxidation_states_set: str = "default",
+    comp_tuple: bool = False,
+    vectorise: bool = False,
+) -> Generator[Union[Tuple[str, int, int], Tuple[str, int]], None, None]:
+    """Generator version of :func:`smact_filter`.
+
+    Compositions are yielded as soon as they pass the charge neutrality and
+    electronegativity tests, so that large result sets can be written out
+    without being held in memory. With species_unique=False each ratio is
+    only yielded the first time it is found; repeats are tracked with one
+    byte per ratio of the stoichiometry grid rather than by storing the
+    results.
+
+    Args:
+        els (tuple/list): A list of smact.Element objects
+        threshold (int): Threshold for stoichiometry limit, default = 8
+        stoichs (list[int]): A selection of valid stoichiometric ratios for each site.
+        species_unique (bool): Whether or not to consider elements in different oxidation states as unique in the results.
+        oxidation_states_set (string): A string to choose which set of oxidation states should be chosen. Options are 'default', 'icsd', 'pymatgen' and 'wiki'.
+        comp_tuple (bool): Whether or not to yield the results as named tuples.
+        vectorise (bool): Whether to test the oxidation-state combinations in blocks with NumPy array operations.
+
+    Yields:
+        Allowed compositions for that chemical system, in the same form as
+        the items of the list returned by :func:`smact_filter`.
+
+    Example usage:
+        >>> from smact.screening import iter_smact_filter
+        >>> from smact import Element
+        >>> els = (Element('Cs'), Element('Pb'), Element('I'))
+        >>> for comp in iter_smact_filter(els, threshold=5, species_unique=False):
+        >>>     print(comp)
+        (('Cs', 'Pb', 'I'), (5, 1, 1))
+        (('Cs', 'Pb', 'I'), (1, 1, 3))
+        (('Cs', 'Pb', 'I'), (1, 2, 5))
+        (('Cs', 'Pb', 'I'), (2, 1, 4))
+        (('Cs', 'Pb', 'I'), (3, 1, 5))
+        (('Cs', 'Pb', 'I'), (1, 1, 5))
+
+    """
+    # Get symbols and electronegativities
+    symbols = tuple(e.symbol for e in els)
+    electronegs = [e.pauling_eneg for e in els]
+
+    # Select the specified oxidation states set:
+    oxi_set = {
+        "default": [e.oxidation_states for e in els],
+        "icsd": [e.oxidation_states_icsd for e in els],
+        "pymatgen": [e.oxidation_states_sp for e in els],
+        "wiki": [e.oxidation_states_wiki for e in els],
+    }
+    if oxidation_states_set in oxi_set:
+        ox_combos = oxi_set[oxidation_states_set]
+    else:
+        raise (
+            Exception(
+                f'{oxidation_states_set} is not valid. Enter either "default", "icsd", "pymatgen" or "wiki" for oxidation_states_set.'
+            )
+        )
+    if oxidation_states_set == "wiki":
+        warnings.warn(
+            "This set of oxidation states is sourced from Wikipedia. The results from using this set could be questionable and should not be used unless you know what you are doing and have inspected the oxidation states.",
+            stacklevel=2,
+        )
+
+    if vectorise:
+        compositions = _smact_filter_vectorised(
+            symbols,
+            ox_combos,
+            electronegs,
+            stoichs=stoichs,
+            threshold=threshold,
+        )
+    else:
+        compositions = _smact_filter_python(
+            symbols,
+            ox_combos,
+            electronegs,
+            stoichs=stoichs,
+            threshold=threshold,
+        )
+
+    # Yield depending on whether we are interested in unique species
+    # combinations or just unique element combinations.
+    if species_unique:
+        for comp in compositions:
+            yield _allowed_compositions(*comp) if comp_tuple else comp
+    else:
+        size, index = _ratio_indexer(len(symbols), stoichs, threshold)
+        seen = bytearray(size)
+        for _, _, ratio in compositions:
+            i = index(ratio)
+            if not seen[i]:
+                seen[i] = 1
+                yield (
+                    _allowed_compositions_nonunique(symbols, ratio)
+                    if comp_tuple
+                    else (symbols, ratio)
+                )
+
+
 def smact_filter(
     els: Union[Tuple[Element], List[Element]],
     threshold: Optional[int] = 8,
@@ -314,7 +914,11 @@ def smact_filter(
     species_unique: bool = True,
     oxidation_states_set: str = "default",
     comp_tuple: bool = False,
-) -> Union[List[Tuple[str, int, int]], List[Tuple[str, int]]]:
+    vectorise: bool = False,
+    columnar: bool = False,
+) -> Union[
+    List[Tuple[str, int, int]], List[Tuple[str, int]], CompositionArray
+]:
     """Function that applies the charge neutrality and electronegativity
     tests in one go for simple application in external scripts that
     wish to apply the general 'smact test'.
@@ -326,6 +930,8 @@ def smact_filter(
         species_unique (bool): Whether or not to consider elements in different oxidation states as unique in the results.
         oxidation_states_set (string): A string to choose which set of oxidation states should be chosen. Options are 'default', 'icsd', 'pymatgen' and 'wiki' for the default, icsd, pymatgen structure predictor and Wikipedia (https://en.wikipedia.org/wiki/Template:List_of_oxidation_states_of_the_elements) oxidation states respectively.
         comp_tuple (bool): Whether or not to return the results as a named tuple of elements and stoichiometries (True) or as a normal tuple of elements and stoichiometries (False).
+        vectorise (bool): Whether to test all the oxidation-state combinations at once with NumPy array operations rather than one at a time. The results are identical, but this is much faster for systems with many oxidation-state combinations.
+        columnar (bool): Whether to return the results as a CompositionArray, which stores them compactly in NumPy arrays, rather than a list. Iterating over a CompositionArray gives the named tuples used with comp_tuple=True.
     Returns:
         allowed_comps (list): Allowed compositions for that chemical system
         in the form [(elements), (oxidation states), (ratios)] if species_unique=True
@@ -355,61 +961,239 @@ def smact_filter(
 
 
     """
+    compositions = iter_smact_filter(
+        els,
+        threshold=threshold,
+        stoichs=stoichs,
+        species_unique=species_unique,
+        oxidation_states_set=oxidation_states_set,
+        comp_tuple=comp_tuple and not columnar,
+        vectorise=vectorise,
+    )
+    if columnar:
+        return CompositionArray.from_compositions(
+            compositions, len(els), species_unique
+        )
+    return list(compositions)
 
-    compositions = []
 
-    # Get symbols and electronegativities
-    symbols = tuple(e.symbol for e in els)
-    electronegs = [e.pauling_eneg for e in els]
+# Per-process state for the screen_systems worker pool
+_worker_elements = {}
+_worker_filter_kwargs = {}
+_worker_table = None
+_worker_oxidation_states = {}
 
-    # Select the specified oxidation states set:
-    oxi_set = {
-        "default": [e.oxidation_states for e in els],
-        "icsd": [e.oxidation_states_icsd for e in els],
-        "pymatgen": [e.oxidation_states_sp for e in els],
-        "wiki": [e.oxidation_states_wiki for e in els],
-    }
-    if oxidation_states_set in oxi_set:
-        ox_combos = oxi_set[oxidation_states_set]
-    else:
-        raise (
-            Exception(
-                f'{oxidation_states_set} is not valid. Enter either "default", "icsd", "pymatgen" or "wiki" for oxidation_states_set.'
-            )
-        )
-    if oxidation_states_set == "wiki":
-        warnings.warn(
-            "This set of oxidation states is sourced from Wikipedia. The results from using this set could be questionable and should not be used unless you know what you are doing and have inspected the oxidation states.",
-            stacklevel=2,
-        )
+# Element attributes holding each set of oxidation states
+_OXIDATION_STATE_ATTRIBUTES = (
+    "oxidation_states",
+    "oxidation_states_icsd",
+    "oxidation_states_sp",
+    "oxidation_states_wiki",
+)
 
-    for ox_states in itertools.product(*ox_combos):
-        # Test for charge balance
-        cn_e, cn_r = neutral_ratios(
-            ox_states, stoichs=stoichs, threshold=threshold
+# The Element data used by smact_filter, for elements in worker processes
+_WorkerElement = namedtuple(
+    "_WorkerElement", ("symbol", "pauling_eneg") + _OXIDATION_STATE_ATTRIBUTES
+)
+
+
+def _init_screening_worker(
+    filter_kwargs: dict,
+    lookup: dict,
+    table: Optional[ElementTable] = None,
+    oxidation_states: Optional[dict] = None,
+):
+    """Set up a screen_systems worker process.
+
+    The smact_filter options, the neutral_ratios lookup table and the
+    oxidation states of the elements are sent once per worker rather than
+    with every task. The shared ElementTable is attached to by name.
+
+    Args:
+        filter_kwargs (dict): Keyword arguments for smact_filter
+        lookup (dict): Entries for the neutral_ratios lookup table
+        table (ElementTable): Element properties published by the parent
+        oxidation_states (dict): Sets of oxidation states of each element,
+            in the order of _OXIDATION_STATE_ATTRIBUTES
+
+    """
+    global _worker_filter_kwargs, _worker_table
+    _worker_filter_kwargs = filter_kwargs
+    smact._neutral_ratios_lookup.update(lookup)
+    _worker_table = table
+    # Elements inherited from a forked parent are rebuilt from the table
+    _worker_elements.clear()
+    _worker_oxidation_states.update(oxidation_states or {})
+
+
+def _worker_element(symbol: str) -> Union[Element, _WorkerElement]:
+    """Get the data for an element needed by smact_filter.
+
+    In a worker process, this is read from the shared ElementTable and the
+    oxidation states sent to the worker, rather than from the data files.
+
+    Args:
+        symbol (str): Element symbol
+
+    Returns:
+        The element, as an Element or a _WorkerElement
+
+    """
+    if _worker_table is None or symbol not in _worker_oxidation_states:
+        return Element(symbol)
+    eneg = _worker_table.values([symbol], "pauling_eneg")[0]
+    return _WorkerElement(
+        symbol,
+        None if np.isnan(eneg) else float(eneg),
+        *_worker_oxidation_states[symbol],
+    )
+
+
+def _screen_system(
+    symbols: Tuple[str, ...], filter_kwargs: Optional[dict] = None
+) -> Tuple[Tuple[str, ...], List[tuple]]:
+    """Apply smact_filter to one chemical system.
+
+    Args:
+        symbols (tuple): Element symbols of the system
+        filter_kwargs (dict): Keyword arguments for smact_filter. By
+            default, those sent to the worker process when it started.
+
+    Returns:
+        (symbols, compositions) (tuple): The element symbols and the
+        allowed compositions, as returned by smact_filter
+
+    """
+    for symbol in symbols:
+        if symbol not in _worker_elements:
+            _worker_elements[symbol] = _worker_element(symbol)
+    if filter_kwargs is None:
+        filter_kwargs = _worker_filter_kwargs
+    compositions = smact_filter(
+        [_worker_elements[symbol] for symbol in symbols],
+        **filter_kwargs,
+    )
+    return symbols, compositions
+
+
+def screen_systems(
+    element_sets: Iterable[Iterable[Union[str, Element]]],
+    processes: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    **kwargs,
+) -> Generator[Tuple[Tuple[str, ...], list], None, None]:
+    """Apply smact_filter to many chemical systems in parallel.
+
+    Chemical systems are spread across a pool of worker processes. The
+    element properties are published once as a shared ElementTable,
+    which the workers attach to rather than each parsing the data files.
+    Each worker also receives the smact_filter options, the oxidation
+    states and the current neutral_ratios lookup table once, when it
+    starts, so only element symbols and results are passed between
+    processes.
+
+    Args:
+        element_sets (iterable): Chemical systems to screen, each given
+            as an iterable of element symbols or smact.Element objects.
+            May be a generator, e.g. from itertools.combinations.
+        processes (int): Number of worker processes. Defaults to the
+            number of CPUs. If 1, systems are screened in this process.
+        chunksize (int): Number of systems sent to a worker at a time.
+            By default, systems are split into about four chunks per
+            worker if the number of systems is known, or chunks of 32
+            otherwise.
+        progress (callable): Called as progress(done, total) after each
+            system is screened, where total is None if element_sets has
+            no length.
+        **kwargs: Keyword arguments passed on to smact_filter. With
+            columnar=True, results are returned from the workers as
+            CompositionArray objects, which are much cheaper to pass
+            between processes than lists of tuples.
+
+    Yields:
+        tuple: (element_symbols, compositions) for each chemical system,
+        in the same order as element_sets.
+
+    Example usage:
+        >>> from itertools import combinations
+        >>> from smact.screening import screen_systems
+        >>> systems = combinations(["Li", "Na", "O", "S"], 3)
+        >>> for symbols, comps in screen_systems(systems, threshold=4):
+        >>>     print(symbols, len(comps))
+        ('Li', 'Na', 'O') 10
+        ('Li', 'Na', 'S') 10
+        ('Li', 'O', 'S') 34
+        ('Na', 'O', 'S') 34
+
+    """
+    try:
+        total = len(element_sets)
+    except TypeError:
+        total = None
+
+    # Composition namedtuples cannot be pickled, so workers return plain
+    # tuples which are converted here
+    comp_tuple = kwargs.pop("comp_tuple", False)
+    species_unique = kwargs.get("species_unique", True)
+    composition = (
+        _allowed_compositions
+        if species_unique
+        else _allowed_compositions_nonunique
+    )
+
+    symbol_sets = (
+        tuple(el.symbol if isinstance(el, Element) else el for el in els)
+        for els in element_sets
+    )
+
+    if processes == 1:
+        # Options are bound to this call, so that generators from several
+        # calls can be consumed together
+        results = map(
+            partial(_screen_system, filter_kwargs=kwargs), symbol_sets
         )
-        # Electronegativity test
-        if cn_e:
-            electroneg_OK = pauling_test(ox_states, electronegs)
-            if electroneg_OK:
-                for ratio in cn_r:
-                    compositions.append(
-                        _allowed_compositions(symbols, ox_states, ratio)
-                        if comp_tuple
-                        else (symbols, ox_states, ratio)
-                    )
-
-    # Return list depending on whether we are interested in unique species combinations
-    # or just unique element combinations.
-    if species_unique:
-        return compositions
+        pool = table = None
     else:
-        if comp_tuple:
-            compositions = [
-                _allowed_compositions_nonunique(i[0], i[2])
-                for i in compositions
-            ]
-        else:
-            compositions = [(i[0], i[2]) for i in compositions]
-        compositions = list(set(compositions))
-        return compositions
+        processes = processes or os.cpu_count() or 1
+        table = ElementTable.from_elements()
+        table.publish()
+        oxidation_states = {
+            symbol: tuple(
+                getattr(element, attribute)
+                for attribute in _OXIDATION_STATE_ATTRIBUTES
+            )
+            for symbol, element in smact.element_dictionary().items()
+        }
+        try:
+            pool = Pool(
+                processes=processes,
+                initializer=_init_screening_worker,
+                initargs=(
+                    kwargs,
+                    dict(smact._neutral_ratios_lookup),
+                    table,
+                    oxidation_states,
+                ),
+            )
+        except BaseException:
+            table.close()
+            table.unlink()
+            raise
+        if chunksize is None:
+            chunksize = max(1, total // (4 * processes)) if total else 32
+        results = pool.imap(_screen_system, symbol_sets, chunksize)
+
+    try:
+        for done, (symbols, comps) in enumerate(results, 1):
+            if comp_tuple and not kwargs.get("columnar"):
+                comps = [composition(*comp) for comp in comps]
+            if progress is not None:
+                progress(done, total)
+            yield symbols, comps
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+            table.close()
+            table.unlink()
@@ -1,6 +1,12 @@
 """Tools for database interfacing for high throughput IO."""
 
+import hashlib
 import itertools
+import os
+import pathlib
+import tempfile
+import threading
+from functools import reduce
 from multiprocessing import Pool
 from operator import itemgetter
 
@@ -12,14 +18,187 @@ except ImportError:
     pathos_available = False
 
 import sqlite3
-from typing import Dict, Generator, List, Optional, Sequence, Tuple, Union
+from typing import Dict, Generator, List, Optional, Sequence, Set, Tuple, Union
 
+import numpy as np
 import pymatgen
 from pymatgen.ext.matproj import MPRester
 
 from . import logger
-from .structure import SmactStructure
-from .utilities import convert_next_gen_mprest_data, get_sign
+from .structure import COMPOSITION_SPECIES, LazySmactStructure, SmactStructure
+from .utilities import (
+    convert_next_gen_mprest_data,
+    get_sign,
+    spec_str_from_id,
+    species_id,
+)
+
+
+def parse_composition(composition: str) -> List[Tuple[str, int]]:
+    """Get the species in a composition key.
+
+    Args:
+        composition: A composition key, see
+            :meth:`SmactStructure.composition`.
+
+    Returns:
+        A list of species as tuples, in (element, charge) format.
+
+    Examples:
+        >>> parse_composition("Ca_1_2+O_3_2-Ti_1_4+")
+        [('Ca', 2), ('O', -2), ('Ti', 4)]
+
+    """
+    return [
+        (ele, -int(charge) if sign == "-" else int(charge))
+        for ele, _, charge, sign in COMPOSITION_SPECIES.findall(composition)
+    ]
+
+
+class SpeciesIndex:
+    """Inverted index from species to the structures that contain them.
+
+    Each species has a bitset over the indexed structures, so finding the
+    structures that contain several species is a bitwise AND of their
+    bitsets, without querying the database.
+
+    Attributes:
+        rowids (numpy.ndarray): The sorted rowids of the indexed
+            structures.
+        bits (dict): The bitset of each species, keyed by
+            :func:`~.utilities.species_id`. Bit i is set if the structure
+            with rowid ``rowids[i]`` contains the species. Bitsets are
+            packed into uint8 arrays with :func:`numpy.packbits`.
+        fingerprint (str): Identifies the contents of the table the index
+            was built from, to check a saved index is current. None if
+            not known.
+
+    """
+
+    def __init__(
+        self,
+        rowids: np.ndarray,
+        bits: Dict[int, np.ndarray],
+        fingerprint: Optional[str] = None,
+    ):
+        """Wrap existing bitsets.
+
+        Use :meth:`from_species` to build a new index, or :meth:`load`
+        to read one saved with :meth:`save`.
+
+        """
+        self.rowids = rowids
+        self.bits = bits
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_species(
+        cls,
+        rowids: Sequence[int],
+        species: Dict[Tuple[str, int], Sequence[int]],
+        fingerprint: Optional[str] = None,
+    ) -> "SpeciesIndex":
+        """Build an index from the structures containing each species.
+
+        Args:
+            rowids: The rowids of all the structures to index.
+            species: The rowids of the structures containing each
+                species, keyed by (element, charge).
+            fingerprint: See :attr:`fingerprint`.
+
+        Returns:
+            The index.
+
+        """
+        rowids = np.unique(np.asarray(rowids, dtype=np.int64))
+        bits = {}
+        for spec, struct_ids in species.items():
+            mask = np.zeros(len(rowids), dtype=bool)
+            mask[np.searchsorted(rowids, struct_ids)] = True
+            bits[species_id(spec)] = np.packbits(mask)
+        return cls(rowids, bits, fingerprint)
+
+    def lookup(self, species: Sequence[Tuple[str, int]]) -> np.ndarray:
+        """Find the structures that contain all of the given species.
+
+        Args:
+            species: A list of species as tuples, in (element, charge)
+                format.
+
+        Returns:
+            The sorted rowids of the structures containing every species.
+
+        """
+        if not species:
+            return self.rowids.copy()
+        try:
+            bitsets = [self.bits[species_id(spec)] for spec in species]
+        except KeyError:
+            return self.rowids[:0]
+        mask = reduce(np.bitwise_and, bitsets)
+
+        # Only unpack the bytes with bits set, as results are usually sparse
+        nonzero = np.flatnonzero(mask)
+        unpacked = np.unpackbits(mask[nonzero]).reshape(-1, 8).view(bool)
+        positions = (nonzero[:, np.newaxis] * 8 + np.arange(8))[unpacked]
+        return self.rowids[positions]
+
+    def save(self, path: str):
+        """Save the index to a file.
+
+        Species are saved as strings, as species ids are specific
+        to the process.
+
+        Args:
+            path: The file to write.
+
+        """
+        spec_ids = list(self.bits)
+        directory = os.path.dirname(os.path.abspath(path))
+        # Write to a temporary file and move it into place, so that
+        # other processes never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    rowids=self.rowids,
+                    species=np.array(
+                        [spec_str_from_id(idx) for idx in spec_ids], dtype=str
+                    ),
+                    bits=np.array(
+                        [self.bits[idx] for idx in spec_ids], dtype=np.uint8
+                    ).reshape(len(spec_ids), (len(self.rowids) + 7) // 8),
+                    fingerprint=np.array(self.fingerprint or "", dtype=str),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "SpeciesIndex":
+        """Load an index saved with :meth:`save`.
+
+        Args:
+            path: The file to read.
+
+        Returns:
+            The index.
+
+        """
+        with np.load(path) as data:
+            fingerprint = (
+                str(data["fingerprint"]) if "fingerprint" in data else ""
+            )
+            return cls(
+                data["rowids"],
+                {
+                    species_id(str(spec)): bits
+                    for spec, bits in zip(data["species"], data["bits"])
+                },
+                fingerprint or None,
+            )
 
 
 class StructureDB:
@@ -29,12 +208,37 @@ class StructureDB:
     and wraps several useful SQLite commands within
     methods.
 
+    Each table of structures has a companion ``{table}_species`` table,
+    with a row of (struct_id, element, charge) for each species of each
+    structure, where struct_id is the rowid of the structure. This is
+    indexed to find the structures containing given species. Tables
+    created before this existed can be migrated with
+    :meth:`add_species_table`; until then they are searched by scanning
+    the compositions.
+
+    For many searches of the same table, :meth:`species_index` loads
+    a :class:`SpeciesIndex` of the table into memory, which
+    :meth:`get_with_species` then uses in place of SQL searches.
+
+    By default a new connection is opened for each operation. With
+    ``persistent=True``, each thread instead keeps a connection open
+    between operations, which saves the cost of connecting and reading
+    the schema for every query. Persistent connections map the database
+    into memory, and use write-ahead logging unless the database is
+    opened read-only, so that readers in several threads or processes
+    do not block each other. They stay open until :meth:`close` is
+    called.
+
     Attributes:
         db: The database name.
+        persistent: Whether connections are kept open between
+            operations.
+        read_only: Whether the database is opened read-only.
         conn: The database connection. Only open when
-            used as a context manager.
+            used as a context manager. Not set when persistent.
         cur: The database connection cursor. Only usable
-            when class implemented as context manager.
+            when class implemented as context manager. Not set when
+            persistent.
 
     Examples:
         Connecting to a database in memory:
@@ -49,17 +253,68 @@ class StructureDB:
             ...
         sqlite3.ProgrammingError: Cannot operate on a closed database.
 
+        Keeping the connection open between operations:
+
+        >>> DB = StructureDB(':memory:', persistent=True)
+        >>> with DB as c:
+        ...     _ = c.execute("CREATE TABLE test (id, val)")
+        >>> with DB as c:
+        ...     c.execute("SELECT * FROM test").fetchall()
+        []
+        >>> DB.close()
+
     """
 
-    def __init__(self, db: str):
+    def __init__(
+        self,
+        db: str,
+        persistent: bool = False,
+        read_only: bool = False,
+        mmap_size: int = 2**28,
+    ):
         """Set database name.
 
         Args:
             db (str): The name of the database. Can also be ':memory:'
                 to connect to a database in RAM.
+            persistent (bool): Whether to keep a connection open in each
+                thread between operations. Note that each thread then
+                has its own database if db is ':memory:'.
+            read_only (bool): Whether to open the database read-only.
+            mmap_size (int): The maximum number of bytes of the database
+                to map into memory, for persistent connections.
 
         """
         self.db = db
+        self.persistent = persistent
+        self.read_only = read_only
+        self.mmap_size = mmap_size
+        self._species_indexes: Dict[str, SpeciesIndex] = {}
+
+        # Persistent connections, one per thread
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection to the database."""
+        if self.read_only:
+            # Escape characters such as "?", "#" and "%" in the path
+            conn = sqlite3.connect(
+                f"{pathlib.Path(self.db).resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=not self.persistent,
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db, check_same_thread=not self.persistent
+            )
+
+        if self.persistent:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            if not self.read_only:
+                conn.execute("PRAGMA journal_mode = WAL")
+        return conn
 
     def __enter__(self) -> sqlite3.Cursor:
         """Initialize database connection.
@@ -68,10 +323,18 @@ class StructureDB:
             An SQLite cursor for interfacing with the database.
 
         """
-        self.conn = sqlite3.connect(self.db)
-        self.cur = self.conn.cursor()
+        if not self.persistent:
+            self.conn = self._connect()
+            self.cur = self.conn.cursor()
+
+            return self.cur
 
-        return self.cur
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn.cursor()
 
     def __exit__(self, exc_type, *args):
         """Close database connection.
@@ -80,13 +343,29 @@ class StructureDB:
         Alternatively, rolls back any changes if an exception
         was raised, causing the context to be exited.
 
+        Persistent connections are left open.
+
         """
+        conn = self._local.conn if self.persistent else self.conn
         if exc_type is not None:
-            self.conn.rollback()
+            conn.rollback()
         else:
-            self.conn.commit()
+            conn.commit()
+
+        if not self.persistent:
+            conn.close()
 
-        self.conn.close()
+    def close(self):
+        """Close the persistent connections of all threads.
+
+        Any later operations open new connections.
+
+        """
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._local = threading.local()
 
     def add_mp_icsd(
         self,
@@ -110,6 +389,10 @@ class StructureDB:
             mp_api_key (str): A Materials Project API key. Only needed if `mp_data`
                 is None.
 
+        If the table already exists, for example from an earlier run that
+        was interrupted, the structures already in it are skipped, so
+        that the run carries on where it stopped.
+
         Returns:
             The number of structs added.
 
@@ -129,7 +412,10 @@ class StructureDB:
         else:
             data = mp_data
 
-        self.add_table(table)
+        with self as c:
+            table_exists = self._has_table(c, table)
+        if not table_exists:
+            self.add_table(table)
 
         if pathos_available:
             pool = ParallelPool()
@@ -137,7 +423,13 @@ class StructureDB:
         else:  # pragma: no cover
             parse_iter = map(parse_mprest, data)
 
-        return self.add_structs(parse_iter, table, commit_after_each=True)
+        return self.add_structs(
+            parse_iter,
+            table,
+            commit_after_each=True,
+            bulk=True,
+            skip_existing=True,
+        )
 
     def add_table(self, table: str):
         """Add a table to the database.
@@ -151,6 +443,165 @@ class StructureDB:
                 f"""CREATE TABLE {table}
                 (composition TEXT NOT NULL, structure TEXT NOT NULL)""",
             )
+            self._create_species_table(c, table)
+
+    @staticmethod
+    def _create_species_table(c: sqlite3.Cursor, table: str):
+        """Create the species table and index for a table of structures."""
+        c.execute(
+            f"""CREATE TABLE {table}_species
+            (struct_id INTEGER NOT NULL, element TEXT NOT NULL,
+            charge INTEGER NOT NULL)""",
+        )
+        StructureDB._create_species_index(c, table)
+
+    @staticmethod
+    def _create_species_index(c: sqlite3.Cursor, table: str):
+        """Create the index of a species table, if it does not exist."""
+        c.execute(
+            f"""CREATE INDEX IF NOT EXISTS {table}_species_index
+            ON {table}_species (element, charge, struct_id)""",
+        )
+
+    @staticmethod
+    def _has_table(c: sqlite3.Cursor, table: str) -> bool:
+        """Determine whether a table exists."""
+        c.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,),
+        )
+        return c.fetchone() is not None
+
+    @staticmethod
+    def _has_species_table(c: sqlite3.Cursor, table: str) -> bool:
+        """Determine whether a table of structures has a species table."""
+        return StructureDB._has_table(c, f"{table}_species")
+
+    @staticmethod
+    def _insert_struct(
+        c: sqlite3.Cursor,
+        struct: SmactStructure,
+        table: str,
+        species_table: bool,
+    ):
+        """Insert a structure, and its species if there is a species table."""
+        entry = (struct.composition(), struct.as_poscar())
+        c.execute(f"INSERT into {table} VALUES (?, ?)", entry)
+        if species_table:
+            struct_id = c.lastrowid
+            c.executemany(
+                f"INSERT into {table}_species VALUES (?, ?, ?)",
+                [
+                    (struct_id, ele, charge)
+                    for ele, charge, _ in struct.species
+                ],
+            )
+
+    def species_index(
+        self, table: str, path: Optional[str] = None
+    ) -> SpeciesIndex:
+        """Get an in-memory index of the species in a table.
+
+        The index is built on first use and kept until structures are
+        added to the table through this object. Once loaded, it is used
+        by :meth:`get_with_species`.
+
+        Args:
+            table: The name of the table of structures.
+            path: A file in which to persist the index. If it holds an
+                index of the current contents of the table, the index is
+                loaded from it, otherwise the index is built and saved
+                to it. The saved index is checked against a hash of the
+                rowids and compositions of the table, so that it is not
+                used after any change to the structures, even one that
+                leaves the same rowids.
+
+        Returns:
+            The index of the table.
+
+        """
+        index = self._species_indexes.get(table)
+        if index is not None:
+            return index
+
+        with self as c:
+            c.execute(f"SELECT rowid, composition FROM {table} ORDER BY rowid")
+            rows = c.fetchall()
+            rowids = np.array(
+                [rowid for rowid, _ in rows], dtype=np.int64
+            ).reshape(-1)
+            fingerprint = hashlib.sha256(
+                "\n".join(
+                    f"{rowid} {composition}" for rowid, composition in rows
+                ).encode()
+            ).hexdigest()
+
+            if path is not None and os.path.exists(path):
+                index = SpeciesIndex.load(path)
+                if index.fingerprint != fingerprint:
+                    index = None
+
+            if index is None:
+                species = {}
+                if self._has_species_table(c, table):
+                    c.execute(
+                        f"SELECT DISTINCT element, charge FROM {table}_species"
+                    )
+                    for spec in c.fetchall():
+                        c.execute(
+                            f"""SELECT struct_id FROM {table}_species
+                            WHERE element = ? AND charge = ?""",
+                            spec,
+                        )
+                        species[spec] = np.array(
+                            c.fetchall(), dtype=np.int64
+                        ).reshape(-1)
+                else:
+                    for struct_id, composition in rows:
+                        for spec in parse_composition(composition):
+                            species.setdefault(spec, []).append(struct_id)
+                index = SpeciesIndex.from_species(rowids, species, fingerprint)
+                if path is not None:
+                    index.save(path)
+
+        self._species_indexes[table] = index
+        return index
+
+    def add_species_table(self, table: str) -> int:
+        """Add a species table to a table of structures that lacks one.
+
+        This migrates tables created by earlier versions, so that
+        :meth:`get_with_species` can use the index rather than scanning
+        every composition. If the table already has a species table,
+        this recreates its index if it is missing, as it can be after an
+        interrupted bulk load.
+
+        Args:
+            table: The name of the table of structures.
+
+        Returns:
+            The number of structures whose species were added, or 0 if
+            the table already has a species table.
+
+        """
+        with self as c:
+            if self._has_species_table(c, table):
+                self._create_species_index(c, table)
+                return 0
+
+            self._create_species_table(c, table)
+            c.execute(f"SELECT rowid, composition FROM {table}")
+            num = 0
+            for struct_id, composition in c.fetchall():
+                c.executemany(
+                    f"INSERT into {table}_species VALUES (?, ?, ?)",
+                    [
+                        (struct_id, ele, charge)
+                        for ele, charge in parse_composition(composition)
+                    ],
+                )
+                num += 1
+        return num
 
     def add_struct(self, struct: SmactStructure, table: str):
         """Add a SmactStructure to a table.
@@ -160,50 +611,184 @@ class StructureDB:
             table: The name of the table to add the structure to.
 
         """
-        entry = (struct.composition(), struct.as_poscar())
-
+        self._species_indexes.pop(table, None)
         with self as c:
-            c.execute(f"INSERT into {table} VALUES (?, ?)", entry)
+            self._insert_struct(
+                c, struct, table, self._has_species_table(c, table)
+            )
 
     def add_structs(
         self,
         structs: Sequence[SmactStructure],
         table: str,
         commit_after_each: Optional[bool] = False,
+        batch_size: int = 1000,
+        bulk: bool = False,
+        skip_existing: bool = False,
     ) -> int:
         """Add several SmactStructures to a table.
 
+        Structures are inserted in batches.
+
         Args:
             structs: Iterable of :class:`~.SmactStructure` s to add to table.
             table: The name of the table to add the structs to.
             commit_after_each (bool, optional): Whether to commit the addition
-                after each structure is added.
+                after each batch of structures is added.
                 This is useful when adding a large number of structures over
                 a long timeframe, as it ensures some structures are added,
                 even if the program terminates before completion.
+                Each batch is added completely or not at all.
                 Defaults to False.
+            batch_size (int): The number of structures in each batch.
+            bulk (bool): Whether to tune the database for adding a large
+                number of structures. The index of the species table is
+                dropped while the structures are added and then rebuilt.
+                If the database uses write-ahead logging, fewer writes are
+                also synced to disk. If the program terminates during a
+                bulk load, :meth:`add_species_table` rebuilds the index.
+            skip_existing (bool): Whether to skip structures that are
+                already in the table, so that adding the same structures
+                again, for example after the program terminated part of
+                the way through, does not duplicate them. The structures
+                in the table are read once, and a short hash of each is
+                kept in memory to compare the new structures against.
 
         Returns:
             The number of structures added.
 
         """
+        self._species_indexes.pop(table, None)
+        # Skip poorly decorated structures
+        structs = (struct for struct in structs if struct is not None)
         with self as c:
+            species_table = self._has_species_table(c, table)
+            if skip_existing:
+                c.execute(f"SELECT composition, structure FROM {table}")
+                existing = {self._struct_digest(*row) for row in c}
+            else:
+                existing = None
+            if bulk:
+                pragmas = self._bulk_pragmas(c)
+                if species_table:
+                    c.execute(f"DROP INDEX IF EXISTS {table}_species_index")
+
             num = 0
-            for struct in structs:
-                if struct is None:
-                    # Handling for poorly decorated structures
-                    continue
-                entry = (struct.composition(), struct.as_poscar())
-                c.execute(f"INSERT into {table} VALUES (?, ?)", entry)
-                num += 1
+            try:
+                while True:
+                    batch = list(itertools.islice(structs, batch_size))
+                    if not batch:
+                        break
+                    num += self._insert_batch(
+                        c, batch, table, species_table, existing
+                    )
 
-                if commit_after_each:
-                    self.conn.commit()
+                    if commit_after_each:
+                        c.connection.commit()
+                c.connection.commit()
+            except BaseException:
+                c.connection.rollback()
+                raise
+            finally:
+                # Outside of a transaction, as pragmas such as synchronous
+                # can't be changed within one
+                if bulk:
+                    if species_table:
+                        self._create_species_index(c, table)
+                    for pragma, value in pragmas.items():
+                        c.execute(f"PRAGMA {pragma} = {value}")
 
         return num
 
+    @staticmethod
+    def _bulk_pragmas(c: sqlite3.Cursor) -> Dict[str, int]:
+        """Tune a connection for bulk loading.
+
+        Returns:
+            The previous values of the pragmas that were changed.
+
+        """
+        bulk_pragmas = {
+            "cache_size": -65536,  # 64 MiB
+            "temp_store": 2,  # MEMORY
+        }
+        # Without write-ahead logging, the database can be corrupted by a
+        # power failure unless every write is synced
+        c.execute("PRAGMA journal_mode")
+        if c.fetchone()[0] == "wal":
+            bulk_pragmas["synchronous"] = 1  # NORMAL
+
+        pragmas = {}
+        for pragma, value in bulk_pragmas.items():
+            c.execute(f"PRAGMA {pragma}")
+            pragmas[pragma] = c.fetchone()[0]
+            c.execute(f"PRAGMA {pragma} = {value}")
+        return pragmas
+
+    @staticmethod
+    def _struct_digest(composition: str, poscar: str) -> bytes:
+        """Get a short hash of a structure, to find duplicates."""
+        return hashlib.blake2b(
+            f"{composition}\0{poscar}".encode(), digest_size=16
+        ).digest()
+
+    @staticmethod
+    def _insert_batch(
+        c: sqlite3.Cursor,
+        structs: List[SmactStructure],
+        table: str,
+        species_table: bool,
+        existing: Optional[Set[bytes]] = None,
+    ) -> int:
+        """Insert structures, and their species if there is a species table.
+
+        Args:
+            existing: Hashes, from :meth:`_struct_digest`, of structures
+                to skip. The hashes of the inserted structures are added.
+
+        Returns:
+            The number of structures inserted.
+
+        """
+        rows = [
+            (struct, struct.composition(), struct.as_poscar())
+            for struct in structs
+        ]
+        if existing is not None:
+            new_rows = []
+            for row in rows:
+                digest = StructureDB._struct_digest(*row[1:])
+                if digest not in existing:
+                    existing.add(digest)
+                    new_rows.append(row)
+            rows = new_rows
+
+        # Assign rowids explicitly, so the species can refer to them
+        c.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}")
+        first_rowid = c.fetchone()[0] + 1
+        c.executemany(
+            f"INSERT into {table} (rowid, composition, structure) "
+            "VALUES (?, ?, ?)",
+            [
+                (rowid, composition, poscar)
+                for rowid, (_, composition, poscar) in enumerate(
+                    rows, first_rowid
+                )
+            ],
+        )
+        if species_table:
+            c.executemany(
+                f"INSERT into {table}_species VALUES (?, ?, ?)",
+                [
+                    (rowid, ele, charge)
+                    for rowid, (struct, _, _) in enumerate(rows, first_rowid)
+                    for ele, charge, _ in struct.species
+                ],
+            )
+        return len(rows)
+
     def get_structs(
-        self, composition: str, table: str
+        self, composition: str, table: str, lazy: bool = False
     ) -> List[SmactStructure]:
         """Get SmactStructures for a given composition.
 
@@ -211,6 +796,8 @@ class StructureDB:
             composition: The composition to search for.
                 See :meth:`SmactStructure.composition`.
             table: The name of the table in which to search.
+            lazy: Whether to return :class:`~.LazySmactStructure` s,
+                which only parse their POSCAR when it is needed.
 
         Returns:
             A list of :class:`~.SmactStructure` s.
@@ -218,33 +805,99 @@ class StructureDB:
         """
         with self as c:
             c.execute(
-                f"SELECT structure FROM {table} WHERE composition = ?",
+                f"""SELECT composition, structure FROM {table}
+                WHERE composition = ?""",
                 (composition,),
             )
             structs = c.fetchall()
-        return [SmactStructure.from_poscar(pos[0]) for pos in structs]
+        return self._to_structs(structs, lazy)
 
     def get_with_species(
         self,
         species: List[Tuple[str, int]],
         table: str,
+        lazy: bool = False,
     ) -> List[SmactStructure]:
         """Get SmactStructures containing given species.
 
         Args:
             species: A list of species as tuples, in (element, charge) format.
             table: The name of the table from which to get the species.
+            lazy: Whether to return :class:`~.LazySmactStructure` s,
+                which only parse their POSCAR when it is needed.
 
         Returns:
             A list of :class:`SmactStructure` s in the table that contain the species.
 
         """
-        glob = "*".join("{}_*_{}{}" for _ in range(len(species)))
-        glob = f"*{glob}*"
-
         species.sort(key=itemgetter(1), reverse=True)
         species.sort(key=itemgetter(0))
 
+        index = self._species_indexes.get(table)
+        if index is not None:
+            return self._get_rowids(index.lookup(species), table, lazy)
+
+        with self as c:
+            if not species:
+                c.execute(
+                    f"SELECT composition, structure FROM {table} ORDER BY rowid"
+                )
+            elif self._has_species_table(c, table):
+                # Intersect the structures containing each species
+                contains = " INTERSECT ".join(
+                    f"""SELECT struct_id FROM {table}_species
+                    WHERE element = ? AND charge = ?"""
+                    for _ in species
+                )
+                c.execute(
+                    f"""SELECT composition, structure FROM {table}
+                    WHERE rowid IN ({contains}) ORDER BY rowid""",
+                    list(itertools.chain.from_iterable(species)),
+                )
+            else:
+                c.execute(
+                    f"""SELECT composition, structure FROM {table}
+                    WHERE composition GLOB ?""",
+                    (self._species_glob(species),),
+                )
+            structs = c.fetchall()
+
+        return self._to_structs(structs, lazy)
+
+    def _get_rowids(
+        self, rowids: Sequence[int], table: str, lazy: bool = False
+    ) -> List[SmactStructure]:
+        """Get the structures with the given sorted rowids."""
+        structs = []
+        with self as c:
+            # Keep within SQLite's limit on the number of parameters
+            for start in range(0, len(rowids), 500):
+                chunk = [int(rowid) for rowid in rowids[start : start + 500]]
+                c.execute(
+                    f"""SELECT composition, structure FROM {table}
+                    WHERE rowid IN ({", ".join("?" * len(chunk))})
+                    ORDER BY rowid""",
+                    chunk,
+                )
+                structs.extend(c.fetchall())
+
+        return self._to_structs(structs, lazy)
+
+    @staticmethod
+    def _to_structs(
+        rows: List[Tuple[str, str]], lazy: bool
+    ) -> List[SmactStructure]:
+        """Create structures from rows of (composition, structure)."""
+        if lazy:
+            return [LazySmactStructure(*row) for row in rows]
+        return [SmactStructure.from_poscar(row[1]) for row in rows]
+
+    @staticmethod
+    def _species_glob(species: List[Tuple[str, int]]) -> str:
+        """Get a GLOB pattern matching compositions with sorted species."""
+        glob = "*".join("{}_*_{}{}" for _ in range(len(species)))
+        glob = f"*{glob}*"
+
         # Generate a list of [element1, charge1, sign1, element2, ...]
         vals = list(
             itertools.chain.from_iterable(
@@ -252,16 +905,7 @@ class StructureDB:
             )
         )
 
-        glob_form = glob.format(*vals)
-
-        with self as c:
-            c.execute(
-                f"SELECT structure FROM {table} WHERE composition GLOB ?",
-                (glob_form,),
-            )
-            structs = c.fetchall()
-
-        return [SmactStructure.from_poscar(pos[0]) for pos in structs]
+        return glob.format(*vals)
 
 
 def parse_mprest(
@@ -1,19 +1,151 @@
 """Tools for handling ion mutation."""
 
+import glob
+import hashlib
 import itertools
 import json
 import os
 import re
+import tempfile
+import types
 from copy import deepcopy
 from operator import itemgetter
-from typing import Callable, Generator, Optional, Tuple
+from typing import Callable, Generator, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 import pymatgen.analysis.structure_prediction as pymatgen_sp
 
+from . import logger
 from .structure import SmactStructure
-from .utilities import parse_spec
+from .utilities import parse_spec, species_charge, species_id
+
+# Where CationMutator.from_json caches populated lambda tables. The cache
+# is only used by default if SMACT_CACHE_DIR is set.
+cache_directory = os.environ.get("SMACT_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "smact"
+)
+use_cache_by_default = bool(os.environ.get("SMACT_CACHE_DIR"))
+
+# The number of lambda tables to keep in the cache, least recently used
+# first out
+cache_size = 8
+
+# Increment when the cached tables or the way they are built change
+_CACHE_VERSION = 3
+
+
+def _code_key(code: types.CodeType) -> str:
+    """Describe the bytecode and constants of a code object.
+
+    Unlike marshalling the code object, this does not depend on the file
+    name or line numbers of the code.
+
+    """
+    consts = [
+        _code_key(const) if isinstance(const, types.CodeType) else repr(const)
+        for const in code.co_consts
+    ]
+    return repr((code.co_code.hex(), code.co_names, consts))
+
+
+# Types whose values are fully described by their repr. Subclasses, such
+# as numpy scalars, are not included.
+_PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+def _plain_key(value) -> Optional[str]:
+    """Describe a scalar or string, or a tuple of them.
+
+    Returns:
+        The description, or None if the value is not plain.
+
+    """
+    if type(value) in _PLAIN_TYPES:
+        return f"{type(value).__name__}:{value!r}"
+    if type(value) is tuple:
+        keys = [_plain_key(item) for item in value]
+        if None in keys:
+            return None
+        return repr(keys)
+    return None
+
+
+def _function_key(func: Optional[Callable], _seen=()) -> Optional[bytes]:
+    """Get bytes identifying what a function computes.
+
+    This is based on the function's bytecode and constants, and the
+    values of its defaults, closure and the globals it uses. These values
+    must be plain scalars or strings, numpy arrays (as globals), or
+    functions that can themselves be identified. Functions that use
+    anything else, including modules and other objects whose state could
+    change, can't be identified reliably.
+
+    Returns:
+        The key, or None if the function can't be identified reliably.
+
+    """
+    if func is None:
+        return b""
+
+    self_key = ""
+    if isinstance(func, types.MethodType):
+        self_key = _plain_key(func.__self__)
+        if self_key is None:
+            return None
+        func = func.__func__
+    if not isinstance(func, types.FunctionType):
+        return None
+    if func in _seen:
+        # Recursion
+        return b"<recursive>"
+    seen = (*_seen, func)
+
+    def value_key(value) -> Optional[str]:
+        if isinstance(value, types.FunctionType):
+            key = _function_key(value, seen)
+            return None if key is None else key.decode()
+        return _plain_key(value)
+
+    values = [self_key]
+    for value in [
+        *(func.__defaults__ or ()),
+        *sorted((func.__kwdefaults__ or {}).items()),
+    ]:
+        values.append(_plain_key(value))
+    for cell in func.__closure__ or ():
+        try:
+            values.append(value_key(cell.cell_contents))
+        except ValueError:
+            # Empty cell
+            return None
+
+    code = func.__code__
+    for name in code.co_names:
+        if name not in func.__globals__:
+            # Builtins, or attribute names
+            continue
+        value = func.__globals__[name]
+        if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+            values.append(
+                repr(
+                    (
+                        name,
+                        str(value.dtype),
+                        value.shape,
+                        hashlib.sha256(
+                            np.ascontiguousarray(value)
+                        ).hexdigest(),
+                    )
+                )
+            )
+        else:
+            key = value_key(value)
+            values.append(None if key is None else f"{name}={key}")
+
+    if None in values:
+        return None
+    return repr((_code_key(code), values)).encode()
 
 
 class CationMutator:
@@ -25,12 +157,34 @@ class CationMutator:
         Inorganic Chemistry, 50(2), 656-663.
         `doi:10.1021/ic102031h <https://pubs.acs.org/doi/10.1021/ic102031h>`_
 
+    The lambda table is held as a dense array, alongside its exponential,
+    the row sums of the exponential and the partition function Z, so that
+    the probabilities are array lookups. :attr:`lambda_tab` is a DataFrame
+    view of the same array, and should not be modified.
+
+    Attributes:
+        lambda_tab (pandas.DataFrame): The lambda table.
+        specs (set): The species in the lambda table.
+        spec_index (dict): The row of each species in the lambda table.
+        lambdas (numpy.ndarray): The lambda table as an array.
+        exp_lambdas (numpy.ndarray): The exponential of lambdas.
+        row_sums (numpy.ndarray): The sums of the rows of exp_lambdas,
+            which are also the column sums as the table is symmetric.
+        Z (float): The partition function, the sum of exp_lambdas.
+        spec_ids (numpy.ndarray): The interned ids of the species, or -1
+            for labels that are not species strings.
+        spec_charges (numpy.ndarray): The charges of the species, or NaN
+            for labels that are not species strings.
+
     """
 
     def __init__(
         self,
         lambda_df: pd.DataFrame,
         alpha: Optional[Callable[[str, str], float]] = (lambda s1, s2: -5.0),
+        vector_alpha: Optional[
+            Callable[[np.ndarray, np.ndarray], np.ndarray]
+        ] = None,
     ):
         """Assign attributes and get lambda table.
 
@@ -43,6 +197,12 @@ class CationMutator:
                 value.
                 Defaults to a function that unconditionally returns
                 -5.0.
+            vector_alpha: Optionally, a vectorised version of alpha,
+                used to fill in the lambda table with a single call.
+                The function must take two arrays of species strings
+                as arguments, and return an array of the lambda values
+                of each pair.
+                By default, alpha is called for each missing pair.
 
         """
         self.lambda_tab = lambda_df
@@ -54,19 +214,78 @@ class CationMutator:
         )
 
         self.alpha = alpha
+        self.vector_alpha = vector_alpha
 
         # Make sure table is fully populated
         self._populate_lambda()
 
-        self.Z = np.exp(self.lambda_tab.to_numpy()).sum()
+        self._set_arrays(
+            self.lambda_tab.to_numpy(dtype=np.float64, copy=False),
+            self.lambda_tab.index,
+            self.lambda_tab.columns,
+        )
+
+    def _set_arrays(
+        self,
+        lambdas: np.ndarray,
+        index: pd.Index,
+        columns: pd.Index,
+        exp_lambdas: Optional[np.ndarray] = None,
+        row_sums: Optional[np.ndarray] = None,
+        Z: Optional[float] = None,
+    ):
+        """Set the array attributes from a populated lambda table."""
+        self.lambdas = lambdas
+        self.lambda_tab = pd.DataFrame(
+            lambdas, index=index, columns=columns, copy=False
+        )
+        self.spec_index = {spec: i for i, spec in enumerate(index)}
+        self.exp_lambdas = (
+            np.exp(lambdas) if exp_lambdas is None else exp_lambdas
+        )
+        self.row_sums = (
+            self.exp_lambdas.sum(axis=1) if row_sums is None else row_sums
+        )
+        self.Z = self.exp_lambdas.sum() if Z is None else Z
+        # Sorted conditional probabilities for top_k, built on first use
+        self._top_k_tables = {}
+
+        # Interned ids and charges of the species, in table order. Labels
+        # that are not species strings, such as bare charges, can still be
+        # looked up by name, but have an id of -1 and a charge of NaN, so
+        # they are never picked as a substitution with a given charge.
+        self.spec_ids = np.array(
+            [
+                species_id(spec) if re.match(r"[A-Za-z]", spec) else -1
+                for spec in self.lambda_tab.index
+            ]
+        )
+        self.spec_charges = np.array(
+            [
+                species_charge(idx) if idx >= 0 else np.nan
+                for idx in self.spec_ids
+            ]
+        )
 
     @staticmethod
     def from_json(
         lambda_json: Optional[str] = None,
         alpha: Optional[Callable[[str, str], float]] = (lambda s1, s2: -5.0),
+        vector_alpha: Optional[
+            Callable[[np.ndarray, np.ndarray], np.ndarray]
+        ] = None,
+        use_cache: Optional[bool] = None,
+        cache_key: Optional[str] = None,
     ):
         """Create a CationMutator instance from a DataFrame.
 
+        Optionally, the populated lambda table is cached in
+        :data:`cache_directory` (``$SMACT_CACHE_DIR``, or
+        ``~/.cache/smact`` by default), keyed on the contents of the JSON
+        file and either cache_key or the code of the alpha functions, and
+        is memory-mapped when it is loaded again. The :data:`cache_size`
+        most recently used tables are kept.
+
         Args:
             lambda_json (str, optional): JSON-style representation of the
                 lambda table. This is a list of entries, containing pairs
@@ -75,21 +294,65 @@ class CationMutator:
                 If not supplied, defaults to the lambda table
                 included with pymatgen.
             alpha: See :meth:`__init__`.
+            vector_alpha: See :meth:`__init__`.
+            use_cache (bool): Whether to use the cache. By default, the
+                cache is used if ``$SMACT_CACHE_DIR`` is set.
+            cache_key (str, optional): A name for the alpha functions
+                in the cache, which must change whenever what they compute
+                does. If not given, the functions are identified by their
+                code, and tables are only cached for functions that use
+                nothing but plain scalars and strings, numpy arrays and
+                other such functions. Functions that use modules, such
+                as numpy, or other objects need a cache_key to be cached.
 
         Returns:
             A :class:`CationMutator` instance.
 
         """
-        if lambda_json is not None:
-            with open(lambda_json) as f:
-                lambda_dat = json.load(f)
-        else:
+        if lambda_json is None:
             # Get pymatgen lambda table
             py_sp_dir = os.path.dirname(pymatgen_sp.__file__)
-            pymatgen_lambda = os.path.join(py_sp_dir, "data", "lambda.json")
-            with open(pymatgen_lambda) as f:
-                lambda_dat = json.load(f)
+            lambda_json = os.path.join(py_sp_dir, "data", "lambda.json")
+            pymatgen_table = True
+        else:
+            pymatgen_table = False
 
+        with open(lambda_json, "rb") as f:
+            lambda_bytes = f.read()
+
+        if use_cache is None:
+            use_cache = use_cache_by_default
+        if not use_cache:
+            alpha_key = vector_alpha_key = None
+        elif cache_key is not None:
+            alpha_key, vector_alpha_key = b"key", cache_key.encode()
+        else:
+            alpha_key = _function_key(alpha)
+            vector_alpha_key = _function_key(vector_alpha)
+        if (
+            use_cache
+            and alpha_key is not None
+            and vector_alpha_key is not None
+        ):
+            key = hashlib.sha256(
+                b"\0".join(
+                    [
+                        str(_CACHE_VERSION).encode(),
+                        str(pymatgen_table).encode(),
+                        lambda_bytes,
+                        alpha_key,
+                        vector_alpha_key,
+                    ]
+                )
+            ).hexdigest()
+            cached = CationMutator._load_cached(key, alpha, vector_alpha)
+            if cached is not None:
+                return cached
+        else:
+            key = None
+
+        lambda_dat = json.loads(lambda_bytes)
+        if pymatgen_table:
             # Get rid of 'D1+' values to reflect pymatgen
             # implementation
             lambda_dat = [x for x in lambda_dat if "D1+" not in x]
@@ -100,7 +363,126 @@ class CationMutator:
 
         lambda_df = lambda_df.pivot(index=0, columns=1, values=2)
 
-        return CationMutator(lambda_df, alpha)
+        cm = CationMutator(lambda_df, alpha, vector_alpha)
+        if key is not None:
+            cm._save_cached(key)
+        return cm
+
+    @staticmethod
+    def _cache_filenames(key: str) -> Tuple[str, str, str]:
+        """Get the files caching a lambda table: metadata and arrays."""
+        prefix = os.path.join(cache_directory, f"cation_mutator_{key}")
+        return (
+            f"{prefix}.json",
+            f"{prefix}_lambdas.npy",
+            f"{prefix}_exp_lambdas.npy",
+        )
+
+    @staticmethod
+    def _load_cached(
+        key: str,
+        alpha: Optional[Callable[[str, str], float]],
+        vector_alpha: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]],
+    ) -> Optional["CationMutator"]:
+        """Load a populated lambda table from the cache.
+
+        Returns:
+            A :class:`CationMutator`, or None if the table is not cached.
+
+        """
+        (
+            meta_file,
+            lambdas_file,
+            exp_lambdas_file,
+        ) = CationMutator._cache_filenames(key)
+        try:
+            with open(meta_file) as f:
+                meta = json.load(f)
+            lambdas = np.load(lambdas_file, mmap_mode="r")
+            exp_lambdas = np.load(exp_lambdas_file, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+        try:
+            # Mark the table as recently used
+            os.utime(meta_file)
+        except OSError:
+            pass
+
+        cm = CationMutator.__new__(CationMutator)
+        cm.alpha = alpha
+        cm.vector_alpha = vector_alpha
+        cm.specs = set(meta["labels"])
+        cm._set_arrays(
+            lambdas,
+            pd.Index(meta["labels"], name=meta["index_name"]),
+            pd.Index(meta["labels"], name=meta["columns_name"]),
+            exp_lambdas=exp_lambdas,
+            row_sums=np.array(meta["row_sums"]),
+            Z=np.float64(meta["Z"]),
+        )
+        return cm
+
+    def _save_cached(self, key: str):
+        """Save the populated lambda table to the cache.
+
+        Failures are logged rather than raised, as the cache is only an
+        optimisation.
+
+        """
+        meta_file, lambdas_file, exp_lambdas_file = self._cache_filenames(key)
+        meta = {
+            "labels": self.lambda_tab.index.tolist(),
+            "index_name": self.lambda_tab.index.name,
+            "columns_name": self.lambda_tab.columns.name,
+            "row_sums": self.row_sums.tolist(),
+            "Z": float(self.Z),
+        }
+        try:
+            os.makedirs(cache_directory, exist_ok=True)
+            # Write to temporary files and move them into place, so that
+            # other processes never see partial files. The metadata file
+            # goes last as it marks the cache entry as complete.
+            for filename, array in [
+                (lambdas_file, self.lambdas),
+                (exp_lambdas_file, self.exp_lambdas),
+                (meta_file, None),
+            ]:
+                fd, tmp_filename = tempfile.mkstemp(dir=cache_directory)
+                with os.fdopen(fd, "wb") as f:
+                    if array is None:
+                        f.write(json.dumps(meta).encode())
+                    else:
+                        np.save(f, array)
+                os.replace(tmp_filename, filename)
+            CationMutator._evict_cached()
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not cache lambda table: {e}")
+
+    @staticmethod
+    def _evict_cached():
+        """Remove all but the cache_size most recently used tables."""
+
+        def last_used(meta_file):
+            try:
+                return os.path.getmtime(meta_file)
+            except OSError:
+                return 0.0
+
+        meta_files = sorted(
+            glob.glob(os.path.join(cache_directory, "cation_mutator_*.json")),
+            key=last_used,
+            reverse=True,
+        )
+        for meta_file in meta_files[cache_size:]:
+            key = os.path.basename(meta_file)[len("cation_mutator_") : -5]
+            # The metadata file goes first, so the entry is never loaded
+            # without its arrays
+            for filename in CationMutator._cache_filenames(key):
+                try:
+                    os.remove(filename)
+                except OSError:
+                    pass
 
     def _populate_lambda(self):
         """Populate lambda table.
@@ -111,42 +493,47 @@ class CationMutator:
         Also ensures lambda table symmetry.
 
         """
-        pairs = itertools.combinations_with_replacement(self.specs, 2)
+        index, columns = self.lambda_tab.index, self.lambda_tab.columns
+        labels = index.append(columns.difference(index, sort=False))
+        lambdas = self.lambda_tab.reindex(
+            index=labels, columns=labels
+        ).to_numpy(dtype=np.float64, copy=True)
+
+        # Fill in missing values from their mirror image, and make the
+        # table symmetric, taking the upper triangle where both exist
+        lambdas = np.where(np.isnan(lambdas), lambdas.T, lambdas)
+        lambdas = np.triu(lambdas) + np.triu(lambdas, 1).T
+
+        # Use alpha for the remaining pairs
+        rows, cols = np.nonzero(np.triu(np.isnan(lambdas)))
+        if len(rows):
+            s1, s2 = labels.to_numpy()[rows], labels.to_numpy()[cols]
+            if self.vector_alpha is not None:
+                alphas = self.vector_alpha(s1, s2)
+            else:
+                alphas = np.fromiter(
+                    map(self.alpha, s1, s2), dtype=np.float64, count=len(s1)
+                )
+            lambdas[rows, cols] = alphas
+            lambdas[cols, rows] = alphas
 
-        def add_alpha(s1, s2):
-            """Add an alpha value to the lambda table at both coordinates."""
-            a = self.alpha(s1, s2)
-            self.lambda_tab.at[s1, s2] = a
-            self.lambda_tab.at[s2, s1] = a
+        self.lambda_tab = pd.DataFrame(
+            lambdas,
+            index=pd.Index(labels, name=index.name),
+            columns=pd.Index(labels, name=columns.name),
+        )
 
-        def mirror_lambda(s1, s2):
-            """Mirror the lambda value at (s2, s1) into (s1, s2)."""
-            self.lambda_tab.at[s1, s2] = self.lambda_tab.at[s2, s1]
+    def _spec_idx(self, species: str) -> int:
+        """Get the row of a species in the lambda table.
 
-        for s1, s2 in pairs:
-            try:
-                if np.isnan(self.lambda_tab.at[s1, s2]):
-                    try:
-                        if not np.isnan(self.lambda_tab.at[s2, s1]):
-                            mirror_lambda(s1, s2)
-                        else:
-                            add_alpha(s1, s2)
-                    except KeyError:
-                        add_alpha(s1, s2)
-                else:
-                    mirror_lambda(s2, s1)
-            except KeyError:
-                try:
-                    if np.isnan(self.lambda_tab.at[s2, s1]):
-                        add_alpha(s1, s2)
-                    else:
-                        mirror_lambda(s1, s2)
-                except KeyError:
-                    add_alpha(s1, s2)
+        Raises:
+            ValueError: If the species is not in the lambda table.
 
-        # Ensure symmetry
-        idx = self.lambda_tab.index
-        self.lambda_tab = self.lambda_tab[idx]
+        """
+        try:
+            return self.spec_index[species]
+        except KeyError:
+            raise ValueError(f"{species} not in lambda table.")
 
     def get_lambda(self, s1: str, s2: str) -> float:
         """Get lambda values corresponding to a pair of species.
@@ -161,10 +548,12 @@ class CationMutator:
                 for the two species.
 
         """
-        if {s1, s2} <= self.specs:
-            return self.lambda_tab.at[s1, s2]
+        i = self.spec_index.get(s1)
+        j = self.spec_index.get(s2)
+        if i is None or j is None:
+            return self.alpha(s1, s2)
 
-        return self.alpha(s1, s2)
+        return self.lambdas[i, j]
 
     def get_lambdas(self, species: str) -> pd.Series:
         """Get all the lambda values associated with a species.
@@ -177,10 +566,19 @@ class CationMutator:
             A pandas Series, with index-labelled lambda entries.
 
         """
-        if not {species} <= self.specs:
-            raise ValueError(f"{species} not in lambda table.")
-
-        return self.lambda_tab.loc[species]
+        return self._row_series(self.lambdas[self._spec_idx(species)], species)
+
+    def _row_series(self, row: np.ndarray, name: str) -> pd.Series:
+        """Label a row of values with the species of the lambda table."""
+        return pd.Series(row, index=self.lambda_tab.columns, name=name)
+
+    def _table_frame(self, table: np.ndarray) -> pd.DataFrame:
+        """Label an array with the species of the lambda table."""
+        return pd.DataFrame(
+            table,
+            index=self.lambda_tab.index,
+            columns=self.lambda_tab.columns,
+        )
 
     @staticmethod
     def _mutate_structure(
@@ -307,7 +705,12 @@ class CationMutator:
 
     def sub_prob(self, s1: str, s2: str) -> float:
         """Calculate the probability of substitution of two species."""
-        return np.exp(self.get_lambda(s1, s2)) / self.Z
+        i = self.spec_index.get(s1)
+        j = self.spec_index.get(s2)
+        if i is None or j is None:
+            return np.exp(self.alpha(s1, s2)) / self.Z
+
+        return self.exp_lambdas[i, j] / self.Z
 
     def sub_probs(self, s1: str) -> pd.Series:
         """Determine the substitution probabilities of a species with others.
@@ -316,66 +719,57 @@ class CationMutator:
         species in the lambda table.
 
         """
-        probs = self.get_lambdas(s1)
-        probs = np.exp(probs)
-        probs /= self.Z
-        return probs
+        return self._row_series(
+            self.exp_lambdas[self._spec_idx(s1)] / self.Z, s1
+        )
 
     def complete_sub_probs(self) -> pd.DataFrame:
         """Generate a DataFrame with all the substitution probabilities."""
-        return np.exp(self.lambda_tab) / self.Z
+        return self._table_frame(self.exp_lambdas / self.Z)
 
     def complete_cond_probs(self) -> pd.DataFrame:
         """Generate a DataFrame with all the conditional substitution probabilities."""
-        lambda_exp = np.exp(self.lambda_tab)
-        return lambda_exp / lambda_exp.sum(axis=1)
+        return self._table_frame(self.exp_lambdas / self.row_sums)
 
     def complete_pair_corrs(self) -> pd.DataFrame:
         """Generate a DataFrame with all the pair correlations."""
-        corr = self.complete_sub_probs()
+        # Sum of the substitution probabilities of each species
+        sums = self.row_sums / self.Z
+        corr = self.exp_lambdas / self.Z
+        # Divide each element by (row_sum * col_sum)
+        corr /= sums[:, None] * sums
 
-        # Sum each row (symmetry means this is the same as column sums)
-        sums = corr.sum(axis=0)
-        # Stack into matrix
-        mat_sums = np.vstack([sums] * len(sums))
-        # Make each element the product of (row_sum * col_sum)
-        mat_sums *= sums.to_numpy()[:, None]
-
-        corr /= mat_sums
-
-        return corr
+        return self._table_frame(corr)
 
     def same_spec_probs(self) -> pd.Series:
         """Calculate the same species substiution probabilities."""
-        return (
-            np.exp(
-                pd.Series(
-                    np.diag(self.lambda_tab),
-                    index=[self.lambda_tab.index, self.lambda_tab.columns],
-                )
-            )
-            / self.Z
+        return pd.Series(
+            self.exp_lambdas.diagonal() / self.Z,
+            index=[self.lambda_tab.index, self.lambda_tab.columns],
         )
 
     def same_spec_cond_probs(self) -> pd.Series:
         """Calculate the same species conditional substiution probabilities."""
-        return np.exp(self.lambda_tab.to_numpy().diagonal()) / np.exp(
-            self.lambda_tab
-        ).sum(axis=0)
+        return pd.Series(
+            self.exp_lambdas.diagonal() / self.row_sums,
+            index=self.lambda_tab.columns,
+        )
 
     def pair_corr(self, s1: str, s2: str) -> float:
         """Determine the pair correlation of two ionic species."""
         corr = self.sub_prob(s1, s2)
-        corr /= self.sub_probs(s1).sum()
-        corr /= self.sub_probs(s2).sum()
+        corr /= self.row_sums[self._spec_idx(s1)] / self.Z
+        corr /= self.row_sums[self._spec_idx(s2)] / self.Z
         return corr
 
     def cond_sub_prob(self, s1: str, s2: str) -> float:
         """Calculate the probability of substitution of one species with another."""
-        return (
-            np.exp(self.get_lambda(s1, s2))
-            / np.exp(self.get_lambdas(s2)).sum()
-        )
+        j = self._spec_idx(s2)
+        i = self.spec_index.get(s1)
+        if i is None:
+            return np.exp(self.alpha(s1, s2)) / self.row_sums[j]
+
+        return self.exp_lambdas[i, j] / self.row_sums[j]
 
     def cond_sub_probs(self, s1: str) -> pd.Series:
         """Calculate the probabilities of substitution of a given species.
@@ -384,10 +778,201 @@ class CationMutator:
         others in the lambda table.
 
         """
-        probs = self.get_lambdas(s1)
-        probs = np.exp(probs)
-        probs /= np.exp(self.lambda_tab).sum()
-        return probs
+        return self._row_series(
+            self.exp_lambdas[self._spec_idx(s1)] / self.row_sums, s1
+        )
+
+    def _pair_indices(
+        self, pairs: Sequence[Tuple[str, str]]
+    ) -> Tuple[Tuple[str, ...], Tuple[str, ...], np.ndarray, np.ndarray]:
+        """Get the rows of pairs of species in the lambda table.
+
+        Returns:
+            The first and second species of each pair, and their rows,
+            with -1 for species not in the table.
+
+        """
+        s1, s2 = tuple(zip(*pairs)) or ((), ())
+        get = self.spec_index.get
+        i = np.fromiter((get(s, -1) for s in s1), dtype=np.intp, count=len(s1))
+        j = np.fromiter((get(s, -1) for s in s2), dtype=np.intp, count=len(s2))
+        return s1, s2, i, j
+
+    def _check_indices(self, species: Tuple[str, ...], idx: np.ndarray):
+        """Raise a ValueError if any species is not in the lambda table."""
+        missing = np.flatnonzero(idx < 0)
+        if len(missing):
+            raise ValueError(f"{species[missing[0]]} not in lambda table.")
+
+    def _exp_lambdas_many(
+        self,
+        s1: Tuple[str, ...],
+        s2: Tuple[str, ...],
+        i: np.ndarray,
+        j: np.ndarray,
+    ) -> np.ndarray:
+        """Get exp(lambda) for pairs of species, using alpha where needed."""
+        exp_lambdas = self.exp_lambdas[i, j]
+        for n in np.flatnonzero((i < 0) | (j < 0)):
+            exp_lambdas[n] = np.exp(self.alpha(s1[n], s2[n]))
+        return exp_lambdas
+
+    def sub_prob_many(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """Calculate the probabilities of substitution of pairs of species.
+
+        The array version of :meth:`sub_prob`.
+
+        Args:
+            pairs: A sequence of (s1, s2) species pairs.
+
+        Returns:
+            An array of the probability of each pair.
+
+        """
+        exp_lambdas = self._exp_lambdas_many(*self._pair_indices(pairs))
+        return exp_lambdas / self.Z
+
+    def cond_sub_prob_many(
+        self, pairs: Sequence[Tuple[str, str]]
+    ) -> np.ndarray:
+        """Calculate conditional substitution probabilities of pairs of species.
+
+        The array version of :meth:`cond_sub_prob`.
+
+        Args:
+            pairs: A sequence of (s1, s2) species pairs.
+
+        Returns:
+            An array of the probability of substitution of s1 with s2 for
+            each pair.
+
+        """
+        s1, s2, i, j = self._pair_indices(pairs)
+        self._check_indices(s2, j)
+        return self._exp_lambdas_many(s1, s2, i, j) / self.row_sums[j]
+
+    def pair_corr_many(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """Determine the pair correlations of pairs of ionic species.
+
+        The array version of :meth:`pair_corr`.
+
+        Args:
+            pairs: A sequence of (s1, s2) species pairs.
+
+        Returns:
+            An array of the pair correlation of each pair.
+
+        """
+        s1, s2, i, j = self._pair_indices(pairs)
+        self._check_indices(s1, i)
+        self._check_indices(s2, j)
+        corr = self._exp_lambdas_many(s1, s2, i, j) / self.Z
+        corr /= self.row_sums[i] / self.Z
+        corr /= self.row_sums[j] / self.Z
+        return corr
+
+    def _top_k_table(
+        self, charge: Optional[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the conditional probabilities, with each row sorted.
+
+        Args:
+            charge (int): Only include species with this charge, or
+                include all species if None.
+
+        Returns:
+            The column indices of each row in order of decreasing
+            probability, and the probabilities in that order.
+
+        """
+        try:
+            return self._top_k_tables[charge]
+        except KeyError:
+            pass
+
+        cond_probs = self.exp_lambdas / self.row_sums
+        if charge is None:
+            cols = np.arange(len(self.spec_charges))
+        else:
+            cols = np.flatnonzero(self.spec_charges == charge)
+            cond_probs = cond_probs[:, cols]
+        order = np.argsort(-cond_probs, axis=1, kind="stable")
+        table = (
+            cols[order],
+            np.take_along_axis(cond_probs, order, axis=1),
+        )
+        self._top_k_tables[charge] = table
+        return table
+
+    def top_k(
+        self,
+        species: str,
+        k: int,
+        charge: Optional[int] = None,
+        min_prob: Optional[float] = None,
+    ) -> List[Tuple[str, float]]:
+        """Find the most likely substitutions of a species.
+
+        Substitutions are ranked by the conditional substitution
+        probability, as in :meth:`cond_sub_probs`. The rows of the table
+        are sorted once, for each charge that is asked for, so queries
+        take O(k) time.
+
+        Args:
+            species (str): The species to substitute.
+            k (int): The maximum number of substitutions to return.
+            charge (int, optional): Only return species with this charge.
+            min_prob (float, optional): Only return substitutions with at
+                least this probability.
+
+        Returns:
+            A list of up to k (species, probability) tuples, in order of
+            decreasing probability. The species itself is not included.
+
+        Examples:
+            >>> cm = CationMutator.from_json()
+            >>> [spec for spec, _ in cm.top_k("Fe2+", 3, charge=2)]
+            ['Cd2+', 'V2+', 'Ti2+']
+
+        """
+        return self.top_k_many([species], k, charge, min_prob)[0]
+
+    def top_k_many(
+        self,
+        species: Sequence[str],
+        k: int,
+        charge: Optional[int] = None,
+        min_prob: Optional[float] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """Find the most likely substitutions of several species.
+
+        See :meth:`top_k`.
+
+        Returns:
+            A list of results, as returned by :meth:`top_k`, for each
+            species.
+
+        """
+        rows = np.array([self._spec_idx(spec) for spec in species], dtype=int)
+        order, probs = self._top_k_table(charge)
+        # Take one extra, as the species itself may be among the top k
+        order, probs = order[rows, : k + 1], probs[rows, : k + 1]
+        labels = self.lambda_tab.columns
+
+        results = []
+        for row, row_order, row_probs in zip(rows, order, probs):
+            keep = row_order != row
+            if min_prob is not None:
+                keep &= row_probs >= min_prob
+            results.append(
+                list(
+                    zip(
+                        labels[row_order[keep][:k]],
+                        row_probs[keep][:k].tolist(),
+                    )
+                )
+            )
+        return results
 
     def unary_substitute(
         self,
@@ -406,18 +991,18 @@ class CationMutator:
 
         """
         for specie in structure.get_spec_strs():
-            cond_probs = self.cond_sub_probs(specie)
-            likely_probs = cond_probs.loc[cond_probs > thresh]
+            i = self._spec_idx(specie)
+            cond_probs = self.exp_lambdas[i] / self.row_sums
+            # Only substitute species with the same charge
+            likely = (cond_probs > thresh) & (
+                self.spec_charges == self.spec_charges[i]
+            )
+            likely[i] = False
 
-            for new_spec, prob in likely_probs.items():
-                if any(
-                    [
-                        new_spec == specie,
-                        parse_spec(specie)[1] != parse_spec(new_spec)[1],
-                    ]
-                ):
-                    continue
+            for j in np.flatnonzero(likely):
                 yield (
-                    self._mutate_structure(structure, specie, new_spec),
-                    prob,
+                    self._mutate_structure(
+                        structure, specie, self.lambda_tab.index[j]
+                    ),
+                    cond_probs[j],
                 )
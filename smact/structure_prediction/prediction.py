@@ -15,8 +15,8 @@ import numpy as np
 
 from .database import StructureDB
 from .mutation import CationMutator
-from .structure import SmactStructure
-from .utilities import parse_spec, unparse_spec
+from .structure import LazySmactStructure, SmactStructure
+from .utilities import unparse_spec
 
 
 class StructurePredictor:
@@ -76,16 +76,23 @@ class StructurePredictor:
         # This means we need only consider structures with a difference of 0 or 1 species.
 
         if include_same:
-            for identical in self.db.get_with_species(species, self.table):
+            for identical in self.db.get_with_species(
+                species, self.table, lazy=True
+            ):
+                identical.materialise()
                 yield (identical, 1.0, identical)
 
         sub_spec = itertools.combinations(species, len(species) - 1)
         sub_spec = list(map(list, sub_spec))
 
-        potential_unary_parents: List[List[SmactStructure]] = list(
-            self.db.get_with_species(specs, self.table) for specs in sub_spec
+        # Parents are only parsed once they pass the species checks
+        potential_unary_parents: List[List[LazySmactStructure]] = list(
+            self.db.get_with_species(specs, self.table, lazy=True)
+            for specs in sub_spec
         )
 
+        target_specs = set(species)
+
         for spec_idx, parents in enumerate(potential_unary_parents):
             # Get missing ion
             # Ensure a different ion is obtained
@@ -110,24 +117,19 @@ class StructurePredictor:
                 # Determine probability
                 # Get species to be substituted
                 # Ensure only 1 species is obtained
-                if (
-                    len(
-                        set(parent.get_spec_strs())
-                        - set(map(unparse_spec, species))
-                        - {diff_spec_str}
-                    )
-                    > 1
-                ):
-                    continue
-                (alt_spec,) = (
-                    set(parent.get_spec_strs())
-                    - set(map(unparse_spec, species))
-                    - {diff_spec_str}
+                alt_specs = (
+                    {spec[:2] for spec in parent.species}
+                    - target_specs
+                    - {diff_spec}
                 )
+                if len(alt_specs) > 1:
+                    continue
+                (alt_spec_tup,) = alt_specs
 
-                if parse_spec(alt_spec)[1] != diff_spec[1]:
+                if alt_spec_tup[1] != diff_spec[1]:
                     # Different charge
                     continue
+                alt_spec = unparse_spec(alt_spec_tup)
 
                 try:
                     p = diff_sub_probs.loc[alt_spec]
@@ -136,6 +138,7 @@ class StructurePredictor:
                     continue
 
                 if p > thresh:
+                    parent.materialise()
                     try:
                         mutated = self.cm._mutate_structure(
                             parent, alt_spec, diff_spec_str
@@ -173,7 +176,10 @@ class StructurePredictor:
         """
 
         if include_same:
-            for identical in self.db.get_with_species(species, self.table):
+            for identical in self.db.get_with_species(
+                species, self.table, lazy=True
+            ):
+                identical.materialise()
                 yield (identical, 1.0, identical)
 
         # Ensure that we can obtain a subset of species of the target compound
@@ -182,8 +188,8 @@ class StructurePredictor:
         sub_species = itertools.combinations(species, len(species) - n_ary)
         sub_species = list(map(list, sub_species))
 
-        potential_nary_parents: List[List[SmactStructure]] = list(
-            self.db.get_with_species(specs, self.table)
+        potential_nary_parents: List[List[LazySmactStructure]] = list(
+            self.db.get_with_species(specs, self.table, lazy=True)
             for specs in sub_species
         )
 
@@ -256,6 +262,7 @@ class StructurePredictor:
             p = np.prod(p)
 
             if p > thresh:
+                parent.materialise()
                 try:
                     mutated = self.cm._nary_mutate_structure(
                         parent, alt_spec, diff_spec_str
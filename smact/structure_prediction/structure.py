@@ -21,6 +21,9 @@ import smact
 from . import logger
 from .utilities import convert_next_gen_mprest_data, get_sign
 
+# A species in a composition key, see SmactStructure.composition
+COMPOSITION_SPECIES = re.compile(r"([A-Za-z]+)_([^_]+)_(\d+)([+-])")
+
 
 class SmactStructure:
     """SMACT implementation inspired by pymatgen Structure class.
@@ -620,3 +623,88 @@ class SmactStructure:
                 poscar += f" {spec}\n"
 
         return poscar
+
+
+class LazySmactStructure(SmactStructure):
+    """A SmactStructure whose sites and lattice are parsed on first use.
+
+    The species are read from the composition key, and the POSCAR is only
+    parsed when :attr:`lattice_mat`, :attr:`lattice_param` or :attr:`sites`
+    are first accessed, or :meth:`materialise` is called. The species are
+    then replaced by those of the POSCAR, so that a materialised structure
+    is identical to one created by :meth:`~.SmactStructure.from_poscar`.
+    Database queries can return these, so that structures which are
+    discarded based on their species alone are never parsed.
+
+    Examples:
+        >>> s = SmactStructure.from_file('tests/files/CaTiO3.txt')
+        >>> lazy = LazySmactStructure(s.composition(), s.as_poscar())
+        >>> lazy.species
+        [('Ca', 2, 1), ('O', -2, 3), ('Ti', 4, 1)]
+        >>> lazy.is_materialised
+        False
+        >>> lazy == s
+        True
+        >>> lazy.is_materialised
+        True
+
+    """
+
+    _lazy_attributes = ("lattice_mat", "lattice_param", "sites")
+
+    def __init__(self, composition: str, poscar: str):
+        """Initialize structure from a composition key and POSCAR.
+
+        Args:
+            composition: A key describing the species of the structure, see
+                :meth:`~.SmactStructure.composition`.
+            poscar: A SMACT-formatted POSCAR string of the structure.
+                See :meth:`~.SmactStructure.as_poscar` for format
+                specification.
+
+        """
+        species = [
+            (ele, -int(charge) if sign == "-" else int(charge), int(stoic))
+            for ele, stoic, charge, sign in COMPOSITION_SPECIES.findall(
+                composition
+            )
+        ]
+
+        # Stoichiometries are reduced as in from_poscar
+        if species:
+            hcf = reduce(gcd, map(itemgetter(2), species))
+            species = [
+                (ele, charge, stoic // hcf) for ele, charge, stoic in species
+            ]
+
+        self.species = self._sanitise_species(species)
+        self._poscar = poscar
+
+    def __getattr__(self, name):
+        """Parse the POSCAR on first access to the sites or lattice."""
+        if name not in LazySmactStructure._lazy_attributes:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        self.materialise()
+        return self.__dict__[name]
+
+    @property
+    def is_materialised(self) -> bool:
+        """Whether the POSCAR has been parsed."""
+        return "sites" in self.__dict__
+
+    def materialise(self) -> "LazySmactStructure":
+        """Parse the POSCAR, if it has not been parsed already.
+
+        Returns:
+            The structure itself.
+
+        """
+        if not self.is_materialised:
+            struct = SmactStructure.from_poscar(self._poscar)
+            self.species = struct.species
+            self.lattice_mat = struct.lattice_mat
+            self.lattice_param = struct.lattice_param
+            self.sites = struct.sites
+        return self
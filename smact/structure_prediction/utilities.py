@@ -1,16 +1,25 @@
 """Miscellaneous tools for data parsing."""
 
 import re
-from typing import Dict, Optional, Tuple, Union
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import pymatgen
 
 from . import logger
 
+# Number of species strings and tuples kept by the parse_spec and
+# unparse_spec caches: enough for every species in the oxidation state data
+SPEC_CACHE_SIZE = 4096
 
+
+@lru_cache(maxsize=SPEC_CACHE_SIZE)
 def parse_spec(species: str) -> Tuple[str, int]:
     """Parse a species string into its element and charge.
 
+    Results are cached, as the same species are parsed many times.
+
     Args:
         species (str): String representation of a species in
             the format {element}{absolute_charge}{sign}.
@@ -39,7 +48,7 @@ def parse_spec(species: str) -> Tuple[str, int]:
 def unparse_spec(species: Tuple[str, int]) -> str:
     """Unparse a species into a string representation.
 
-    The analogue of :func:`parse_spec`.
+    The analogue of :func:`parse_spec`. Results are cached.
 
     Args:
         A tuple of (element, signed_charge).
@@ -54,7 +63,99 @@ def unparse_spec(species: Tuple[str, int]) -> str:
         'O2-'
 
     """
-    return f"{species[0]}{abs(species[1])}{get_sign(species[1])}"
+    return _format_spec(species[0], species[1])
+
+
+@lru_cache(maxsize=SPEC_CACHE_SIZE, typed=True)
+def _format_spec(element: str, charge: int) -> str:
+    return f"{element}{abs(charge)}{get_sign(charge)}"
+
+
+# Interned species, indexed by id, and the id of each species, keyed by
+# both (element, charge) tuples and species strings
+_interned_species: List[Tuple[str, int]] = []
+_interned_spec_strs: List[str] = []
+_species_ids: Dict[Union[str, Tuple[str, int]], int] = {}
+_species_ids_lock = threading.Lock()
+
+
+def species_id(species: Union[str, Tuple[str, int]]) -> int:
+    """Get the integer id of a species.
+
+    Species are interned the first time they are seen, so that each
+    (element, charge) pair has a single id, and ids are dense, starting
+    from 0. The ids are specific to the process: they depend on the order
+    in which species are first used.
+
+    Args:
+        species: A species string, as parsed by :func:`parse_spec`,
+            or a tuple of (element, signed_charge).
+
+    Returns:
+        The id of the species.
+
+    Examples:
+        >>> species_from_id(species_id("Fe2+"))
+        ('Fe', 2)
+        >>> species_id("Fe2+") == species_id(("Fe", 2))
+        True
+
+    """
+    if not isinstance(species, str):
+        species = (species[0], species[1])
+    try:
+        return _species_ids[species]
+    except KeyError:
+        pass
+
+    spec = (
+        parse_spec(species)
+        if isinstance(species, str)
+        else (species[0], int(species[1]))
+    )
+    with _species_ids_lock:
+        idx = _species_ids.get(spec)
+        if idx is None:
+            idx = len(_interned_species)
+            _interned_species.append(spec)
+            _interned_spec_strs.append(unparse_spec(spec))
+            _species_ids[spec] = idx
+            _species_ids[_interned_spec_strs[idx]] = idx
+        _species_ids[species] = idx
+    return idx
+
+
+def species_ids(species: Iterable[Union[str, Tuple[str, int]]]) -> List[int]:
+    """Get the integer ids of several species.
+
+    See :func:`species_id`.
+
+    """
+    return [species_id(spec) for spec in species]
+
+
+def species_from_id(idx: int) -> Tuple[str, int]:
+    """Get the (element, signed_charge) of an interned species.
+
+    The inverse of :func:`species_id`.
+
+    """
+    return _interned_species[idx]
+
+
+def spec_str_from_id(idx: int) -> str:
+    """Get the string representation of an interned species.
+
+    The inverse of :func:`species_id`, formatted as by
+    :func:`unparse_spec`.
+
+    """
+    return _interned_spec_strs[idx]
+
+
+def species_charge(idx: int) -> int:
+    """Get the signed charge of an interned species."""
+    return _interned_species[idx][1]
 
 
 def get_sign(charge: int) -> str:
@@ -1,8 +1,14 @@
 #!/usr/bin/env python
 
+import itertools
+import math
+import multiprocessing
 import os
+import pickle
+import tempfile
 import unittest
 
+import numpy as np
 from pymatgen.core.periodic_table import Specie
 
 import smact
@@ -13,9 +19,21 @@ import smact.oxidation_states
 import smact.screening
 from smact import Species
 from smact.builder import wurtzite
+from smact.element_table import ElementTable
 from smact.properties import band_gap_Harrison, compound_electroneg
 
 
+def _shared_table_values(table):
+    return table.values(["Na", "Cl"], "pauling_eneg").tolist()
+
+
+def _screening_worker_elements(symbols):
+    smact.screening._screen_system(symbols)
+    return [
+        tuple(smact.screening._worker_elements[symbol]) for symbol in symbols
+    ]
+
+
 class TestSequenceFunctions(unittest.TestCase):
     # ---------------- TOP-LEVEL ----------------
 
@@ -26,6 +44,128 @@ class TestSequenceFunctions(unittest.TestCase):
         self.assertEqual(Pt.number, 78)
         self.assertEqual(Pt.dipol, 44.00)
 
+    def test_Element_registry(self):
+        Fe = smact.Element("Fe")
+        self.assertIs(smact.Element("Fe"), Fe)
+        self.assertIs(pickle.loads(pickle.dumps(Fe)), Fe)
+        self.assertEqual(Fe.HHI_p, 2400.0)
+        self.assertEqual(Fe.oxidation_states_sp, [2, 3, 4, 5, 6])
+        with self.assertRaises(AttributeError):
+            Fe.name = "Iron"
+        self.assertFalse(hasattr(Fe, "oxidation"))
+
+        Fe3 = Species("Fe", 3, 6)
+        self.assertIs(Species("Fe", 3, 6), Fe3)
+        self.assertIsNot(Species("Fe", 3, 4), Fe3)
+        self.assertIs(pickle.loads(pickle.dumps(Fe3)), Fe3)
+        self.assertEqual(Fe3.oxidation, 3)
+        self.assertEqual(Fe3.name, "Iron")
+
+        with self.assertRaises(NameError):
+            smact.Element("Xx")
+
+        # Changing the lists of a shared Element does not change it
+        for attribute in (
+            "oxidation_states",
+            "oxidation_states_icsd",
+            "oxidation_states_sp",
+            "oxidation_states_wiki",
+            "coord_envs",
+        ):
+            with self.subTest(attribute=attribute):
+                expected = getattr(Fe, attribute)
+                getattr(Fe, attribute).append(99)
+                getattr(Fe3, attribute).append(99)
+                self.assertEqual(
+                    getattr(smact.Element("Fe"), attribute), expected
+                )
+                self.assertEqual(getattr(Fe3, attribute), expected)
+                self.assertNotIn(99, expected)
+
+    def test_Species_average_radii(self):
+        Fe3 = Species("Fe", 3)
+        rows = [
+            row
+            for row in smact.data_loader.lookup_element_shannon_radius_data(
+                "Fe"
+            )
+            if row["charge"] == 3
+        ]
+        self.assertAlmostEqual(
+            Fe3.average_shannon_radius,
+            sum(row["crystal_radius"] for row in rows) / len(rows),
+        )
+        self.assertAlmostEqual(
+            Fe3.average_ionic_radius,
+            sum(row["ionic_radius"] for row in rows) / len(rows),
+        )
+        self.assertTrue(math.isnan(Species("Fe", 7).average_shannon_radius))
+        self.assertIsNone(
+            smact.data_loader.lookup_element_shannon_radius_averages("Og", 0)
+        )
+
+    def test_data_cache(self):
+        data_loader = smact.data_loader
+        default_directory = data_loader.data_cache_directory
+        default_use_cache = data_loader.use_data_cache
+        hhis = data_loader.lookup_element_hhis("Fe")
+        try:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                data_loader.data_cache_directory = cache_dir
+                data_loader.use_data_cache = True
+                data_loader.clear_cache()
+                self.assertEqual(data_loader.lookup_element_hhis("Fe"), hhis)
+                cache_file = os.path.join(cache_dir, "HHIs.txt.pickle")
+                self.assertTrue(os.path.exists(cache_file))
+
+                # The table is read from the cache while it is current
+                with open(cache_file, "wb") as file:
+                    pickle.dump(data_loader._data_file_stamp("HHIs.txt"), file)
+                    pickle.dump({"Fe": (1.0, 2.0)}, file)
+                data_loader.clear_cache()
+                self.assertEqual(
+                    data_loader.lookup_element_hhis("Fe"), (1.0, 2.0)
+                )
+
+                # But not once the data file, or smact, has changed
+                with open(cache_file, "wb") as file:
+                    stamp = data_loader._data_file_stamp("HHIs.txt")
+                    pickle.dump(stamp[:-1] + (stamp[-1] + 1,), file)
+                    pickle.dump({"Fe": (1.0, 2.0)}, file)
+                data_loader.clear_cache()
+                self.assertEqual(data_loader.lookup_element_hhis("Fe"), hhis)
+        finally:
+            data_loader.data_cache_directory = default_directory
+            data_loader.use_data_cache = default_use_cache
+            data_loader.clear_cache()
+
+    def test_ElementTable(self):
+        table = ElementTable.from_elements()
+        fe = smact.Element("Fe")
+        self.assertEqual(table.column("number")[26], 26)
+        self.assertEqual(
+            table.values(["Fe"], ["mass", "HHI_p", "SSEPauling"]).tolist(),
+            [[fe.mass, fe.HHI_p, fe.SSEPauling]],
+        )
+        # Missing data is stored as NaN
+        self.assertIsNone(smact.Element("He").pauling_eneg)
+        self.assertTrue(math.isnan(table.values(["He"], "pauling_eneg")[0]))
+        with self.assertRaises(NameError):
+            table.values(["Xx"])
+
+        with table:
+            name = table.publish()
+            shared = ElementTable.attach(name)
+            self.assertEqual(shared.data.tobytes(), table.data.tobytes())
+            self.assertFalse(shared.data.flags.writeable)
+            shared.close()
+
+            with multiprocessing.get_context().Pool(1) as pool:
+                self.assertEqual(
+                    pool.apply(_shared_table_values, (table,)),
+                    [smact.Element("Na").pauling_eneg, 3.16],
+                )
+
     def test_ordered_elements(self):
         self.assertEqual(
             smact.ordered_elements(65, 68), ["Tb", "Dy", "Ho", "Er"]
@@ -65,6 +205,58 @@ class TestSequenceFunctions(unittest.TestCase):
         self.assertEqual(len(neutral_combos), 9)
         self.assertTrue((3, 2, 1) in neutral_combos)
 
+    def test_neutral_ratios_iter(self):
+        for ox, kwargs in [
+            ([1, -2, 1], {}),
+            ([2, 3, -2, -1], {"threshold": 8}),
+            ([4, -1, -2, 3, -3], {"threshold": 6}),
+            ([3, -2], {"stoichs": [[4, 2, 1], [3, 6, 1]]}),
+        ]:
+            with self.subTest(ox=ox, **kwargs):
+                self.assertEqual(
+                    list(smact.neutral_ratios_iter(ox, **kwargs)),
+                    list(smact.neutral_ratios_iter_old(ox, **kwargs)),
+                )
+
+    def test_neutral_ratios_lookup(self):
+        smact.clear_neutral_ratios_lookup()
+        for ox in itertools.permutations([1, -2, 3]):
+            self.assertEqual(
+                smact.neutral_ratios(ox, threshold=6)[1],
+                list(smact.neutral_ratios_iter(ox, threshold=6)),
+            )
+        stoichs = [[2, 1], [1, 3], [4, 1, 2]]
+        self.assertEqual(
+            smact.neutral_ratios([2, -1, 1], stoichs=stoichs)[1],
+            list(smact.neutral_ratios_iter([2, -1, 1], stoichs=stoichs)),
+        )
+        self.assertEqual(len(smact._neutral_ratios_lookup), 2)
+
+        lookup = dict(smact._neutral_ratios_lookup)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "lookup.json")
+            smact.save_neutral_ratios_lookup(filename)
+            smact.clear_neutral_ratios_lookup()
+            smact.load_neutral_ratios_lookup(filename)
+        self.assertEqual(smact._neutral_ratios_lookup, lookup)
+
+        # numpy inputs are stored as plain ints, so the table can be saved
+        smact.clear_neutral_ratios_lookup()
+        smact.neutral_ratios(np.array([2, -1]), threshold=np.int64(3))
+        smact.neutral_ratios(
+            np.array([2, -1, 1]), stoichs=[np.array(x) for x in stoichs]
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "lookup.json")
+            smact.save_neutral_ratios_lookup(filename)
+            smact.clear_neutral_ratios_lookup()
+            smact.load_neutral_ratios_lookup(filename)
+        self.assertEqual(
+            smact.neutral_ratios([2, -1], threshold=3)[1], [(1, 2)]
+        )
+        self.assertEqual(len(smact._neutral_ratios_lookup), 2)
+        smact.clear_neutral_ratios_lookup()
+
     # ---------------- Properties ----------------
 
     def test_compound_eneg_brass(self):
@@ -185,6 +377,47 @@ class TestSequenceFunctions(unittest.TestCase):
             )
         )
 
+    def test_pauling_test_many(self):
+        Sn, S, Pm = (smact.Element(label) for label in ("Sn", "S", "Pm"))
+        symbols = ("S", "Sn", "Sn")
+        enegs = (S.pauling_eneg, Sn.pauling_eneg, Sn.pauling_eneg)
+        ox_combos = list(itertools.product([-2, 0, 2], [-2, 2, 4], [2, 4]))
+        for kwargs in [
+            {},
+            {"repeat_cations": False},
+            {"repeat_anions": False},
+            {"repeat_anions": False, "repeat_cations": False},
+            {"threshold": 0.5},
+        ]:
+            with self.subTest(**kwargs):
+                self.assertEqual(
+                    smact.screening.pauling_test_many(
+                        ox_combos, enegs, symbols=symbols, **kwargs
+                    ).tolist(),
+                    [
+                        smact.screening.pauling_test(
+                            ox, enegs, symbols=symbols, **kwargs
+                        )
+                        for ox in ox_combos
+                    ],
+                )
+
+        # Missing electronegativities are handled as in pauling_test
+        enegs = (S.pauling_eneg, Pm.pauling_eneg)
+        self.assertEqual(
+            smact.screening.pauling_test_many(
+                [(-2, 0), (0, 3)], enegs
+            ).tolist(),
+            [False, False],
+        )
+        self.assertTrue(
+            smact.screening.pauling_test_many([(-2, 0)], enegs, threshold=0.5)[
+                0
+            ]
+        )
+        with self.assertRaises(TypeError):
+            smact.screening.pauling_test_many([(-2, 3)], enegs)
+
     def test_eneg_states_test(self):
         Na, Fe, Cl = (smact.Element(label) for label in ("Na", "Fe", "Cl"))
         self.assertTrue(
@@ -387,6 +620,185 @@ class TestSequenceFunctions(unittest.TestCase):
             45,
         )
 
+    def test_smact_filter_vectorise(self):
+        for symbols in [("Na", "Fe", "Cl"), ("Ba", "Ti", "Mn", "O")]:
+            els = [smact.Element(symbol) for symbol in symbols]
+            for kwargs in [
+                {"threshold": 8},
+                {"stoichs": [[1, 2, 3]] * len(els)},
+                {"threshold": 4, "comp_tuple": True},
+            ]:
+                with self.subTest(symbols=symbols, **kwargs):
+                    self.assertEqual(
+                        smact.screening.smact_filter(
+                            els, vectorise=True, **kwargs
+                        ),
+                        smact.screening.smact_filter(els, **kwargs),
+                    )
+        Na, Fe, Cl = (smact.Element(label) for label in ("Na", "Fe", "Cl"))
+        self.assertEqual(
+            set(
+                smact.screening.smact_filter(
+                    [Na, Fe, Cl], species_unique=False, vectorise=True
+                )
+            ),
+            set(
+                smact.screening.smact_filter(
+                    [Na, Fe, Cl], species_unique=False
+                )
+            ),
+        )
+
+    def test_iter_smact_filter(self):
+        els = [smact.Element(symbol) for symbol in ("Ba", "Ti", "Mn", "O")]
+        comps = smact.screening.iter_smact_filter(els, threshold=4)
+        self.assertNotIsInstance(comps, list)
+        self.assertEqual(
+            list(comps), smact.screening.smact_filter(els, threshold=4)
+        )
+
+        unique = smact.screening.smact_filter(els, threshold=4)
+        for vectorise in (False, True):
+            with self.subTest(vectorise=vectorise):
+                nonunique = list(
+                    smact.screening.iter_smact_filter(
+                        els,
+                        threshold=4,
+                        species_unique=False,
+                        vectorise=vectorise,
+                    )
+                )
+                self.assertEqual(len(nonunique), len(set(nonunique)))
+                self.assertEqual(
+                    set(nonunique), {(comp[0], comp[2]) for comp in unique}
+                )
+
+        nonunique = smact.screening.iter_smact_filter(
+            els[:3] + [smact.Element("Cl")],
+            stoichs=[[1, 2], [1, 4], [1], [5, 6]],
+            species_unique=False,
+            comp_tuple=True,
+        )
+        self.assertEqual(
+            next(nonunique).stoichiometries,
+            (2, 4, 1, 5),
+        )
+
+    def test_smact_filter_columnar(self):
+        els = [smact.Element(symbol) for symbol in ("Ba", "Ti", "Mn", "O")]
+        for species_unique in (True, False):
+            with self.subTest(species_unique=species_unique):
+                comps = smact.screening.smact_filter(
+                    els, species_unique=species_unique, columnar=True
+                )
+                expected = smact.screening.smact_filter(
+                    els, species_unique=species_unique, comp_tuple=True
+                )
+                self.assertIsInstance(comps, smact.screening.CompositionArray)
+                self.assertEqual(len(comps), len(expected))
+                self.assertEqual(list(comps), expected)
+                self.assertEqual(comps[-1], expected[-1])
+                self.assertEqual(list(comps[10:20]), expected[10:20])
+
+                df = comps.to_pandas()
+                self.assertEqual(len(df), len(expected))
+                self.assertEqual(df["element_3"].iloc[0], "O")
+
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    filename = os.path.join(tmp_dir, "comps.npy")
+                    comps.save(filename)
+                    loaded = smact.screening.CompositionArray.load(filename)
+                self.assertEqual(list(loaded), expected)
+
+        empty = smact.screening.smact_filter(
+            [smact.Element("He"), smact.Element("Ne")], columnar=True
+        )
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.numbers.shape, (0, 2))
+
+        with self.assertRaises(ValueError):
+            smact.screening.smact_filter(
+                [smact.Element(symbol) for symbol in ("Na", "Cl", "O")],
+                stoichs=[[301], [1], [150]],
+                columnar=True,
+            )
+
+    def test_screen_systems(self):
+        systems = list(itertools.combinations(["Li", "Fe", "O", "S"], 3))
+        expected = [
+            (
+                symbols,
+                smact.screening.smact_filter(
+                    [smact.Element(symbol) for symbol in symbols],
+                    threshold=4,
+                    comp_tuple=True,
+                ),
+            )
+            for symbols in systems
+        ]
+        progress = []
+        for processes in (1, 2):
+            with self.subTest(processes=processes):
+                results = smact.screening.screen_systems(
+                    iter(systems),
+                    processes=processes,
+                    progress=lambda done, total: progress.append(done),
+                    threshold=4,
+                    comp_tuple=True,
+                )
+                self.assertEqual(list(results), expected)
+        self.assertEqual(progress, [1, 2, 3, 4] * 2)
+
+    def test_screen_systems_worker_elements(self):
+        symbols = ("Fe", "O", "He")
+        attributes = ("symbol", "pauling_eneg") + (
+            smact.screening._OXIDATION_STATE_ATTRIBUTES
+        )
+        expected = [
+            tuple(
+                getattr(smact.Element(symbol), attribute)
+                for attribute in attributes
+            )
+            for symbol in symbols
+        ]
+        oxidation_states = {
+            symbol: element[2:] for symbol, element in zip(symbols, expected)
+        }
+        # Workers read the element data from the shared table
+        with ElementTable.from_elements() as table:
+            table.publish()
+            with multiprocessing.get_context().Pool(
+                1,
+                initializer=smact.screening._init_screening_worker,
+                initargs=({}, {}, table, oxidation_states),
+            ) as pool:
+                self.assertEqual(
+                    pool.apply(_screening_worker_elements, (symbols,)),
+                    expected,
+                )
+
+    def test_screen_systems_interleaved(self):
+        systems = [("Mn", "O"), ("Fe", "O"), ("Li", "S")]
+        expected = {
+            threshold: [
+                smact.screening.smact_filter(
+                    [smact.Element(symbol) for symbol in symbols],
+                    threshold=threshold,
+                )
+                for symbols in systems
+            ]
+            for threshold in (2, 8)
+        }
+        low = smact.screening.screen_systems(systems, processes=1, threshold=2)
+        high = smact.screening.screen_systems(
+            systems, processes=1, threshold=8
+        )
+        results = {2: [], 8: []}
+        for (_, comps_low), (_, comps_high) in zip(low, high):
+            results[2].append(comps_low)
+            results[8].append(comps_high)
+        self.assertEqual(results, expected)
+
     # ---------------- Lattice ----------------
     def test_Lattice_class(self):
         site_A = smact.lattice.Site([0, 0, 0], -1)
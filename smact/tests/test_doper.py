@@ -1,5 +1,10 @@
+import json
+import os
+import tempfile
 import unittest
 
+import pandas as pd
+
 import smact
 from smact.dopant_prediction import doper
 from smact.structure_prediction import mutation, utilities
@@ -38,6 +43,84 @@ class dopant_prediction_test(unittest.TestCase):
             self.assertGreater(utilities.parse_spec(n_atom[0])[1], an_charge)
             self.assertLess(utilities.parse_spec(p_atom[0])[1], an_charge)
 
+    def test_dopant_prediction_many(self):
+        hosts = [("Cu+", "Ga3+", "S2-"), ("Ti4+", "O2-"), ("Zn2+", "S2-")]
+        results = doper.Doper.get_dopants_many(hosts, num_dopants=3)
+
+        self.assertEqual(len(results), len(hosts))
+        for host, result in zip(hosts, results):
+            self.assertEqual(result, doper.Doper(host).get_dopants(3))
+            for subs in result.values():
+                self.assertLessEqual(len(subs), 3)
+                probs = [prob for _, _, prob in subs]
+                self.assertEqual(probs, sorted(probs, reverse=True))
+
+    def test_lambda_table_changes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "lambda.json")
+
+            def write_table(lambda_value, mtime):
+                with open(filename, "w") as f:
+                    json.dump([["Ti4+", "Nb5+", lambda_value]], f)
+                os.utime(filename, (mtime, mtime))
+
+            write_table(1.0, 1000)
+            cm = doper._get_mutator(filename)
+            self.assertIs(doper._get_mutator(filename), cm)
+            probs = doper._get_sub_probs("Ti4+", filename)
+            self.assertFalse(probs.flags.writeable)
+
+            # Changes to the file are picked up
+            write_table(2.0, 2000)
+            self.assertIsNot(doper._get_mutator(filename), cm)
+            self.assertEqual(
+                doper._get_mutator(filename).get_lambda("Ti4+", "Nb5+"), 2.0
+            )
+            self.assertFalse(
+                (doper._get_sub_probs("Ti4+", filename) == probs).all()
+            )
+
+        self.assertEqual(
+            doper._load_sub_probs.cache_info().maxsize,
+            doper.SUB_PROBS_CACHE_SIZE,
+        )
+
+    def test_iter_dopants(self):
+        hosts = [("Ti4+", "O2-"), ("Zn2+", "S2-"), ("Ga3+", "N3-")] * 3
+        expected = doper.Doper.get_dopants_many(hosts, num_dopants=2)
+
+        for processes in [1, 2]:
+            with self.subTest(processes=processes):
+                results = list(
+                    doper.iter_dopants(
+                        hosts, num_dopants=2, processes=processes
+                    )
+                )
+                self.assertCountEqual(results, list(zip(hosts, expected)))
+
+    def test_iter_dopants_output(self):
+        try:
+            import pyarrow
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        hosts = [("Ti4+", "O2-"), ("Zn2+", "S2-")]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "dopants.parquet")
+            results = dict(
+                doper.iter_dopants(
+                    hosts, num_dopants=2, processes=1, output=filename
+                )
+            )
+            df = pd.read_parquet(filename)
+
+        self.assertEqual(len(df), 16)
+        row = df.iloc[0]
+        self.assertEqual(
+            results[hosts[0]][row["dopant_type"]][row["rank"]],
+            (row["dopant"], row["host_species"], row["probability"]),
+        )
+
 
 if __name__ == "__main__":
     TestLoader = unittest.TestLoader()
@@ -5,8 +5,12 @@ import json
 import logging
 import os
 import pickle
+import sqlite3
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from copy import deepcopy
 from operator import itemgetter
 from random import sample
 
@@ -20,7 +24,8 @@ from pymatgen.analysis.structure_prediction.substitution_probability import (
 
 import smact
 from smact import Species
-from smact.structure_prediction.database import StructureDB
+from smact.structure_prediction import mutation, structure, utilities
+from smact.structure_prediction.database import StructureDB, parse_composition
 from smact.structure_prediction.mutation import CationMutator
 from smact.structure_prediction.prediction import StructurePredictor
 from smact.structure_prediction.structure import SmactStructure
@@ -162,6 +167,32 @@ class StructureTest(unittest.TestCase):
         self.assertFalse(s1.has_species(("Ba", 3)))
         self.assertFalse(s1.has_species(("Ca", 2)))
 
+    def test_parse_spec(self):
+        """Test parsing species strings, with caching."""
+        for _ in range(2):
+            self.assertEqual(utilities.parse_spec("Fe2+"), ("Fe", 2))
+            self.assertEqual(utilities.parse_spec("O2-"), ("O", -2))
+            self.assertEqual(utilities.unparse_spec(("Fe", 2)), "Fe2+")
+            self.assertEqual(utilities.unparse_spec(["O", -2]), "O2-")
+        # Equal but differently typed charges are not confused
+        self.assertEqual(utilities.unparse_spec(("Fe", 2.0)), "Fe2.0+")
+        self.assertGreater(utilities.parse_spec.cache_info().hits, 0)
+
+    def test_species_id(self):
+        """Test interning species as integer ids."""
+        fe2 = utilities.species_id("Fe2+")
+        self.assertEqual(utilities.species_id(("Fe", 2)), fe2)
+        self.assertEqual(utilities.species_id(["Fe", 2]), fe2)
+        self.assertNotEqual(utilities.species_id("Fe3+"), fe2)
+        self.assertEqual(utilities.species_from_id(fe2), ("Fe", 2))
+        self.assertEqual(utilities.spec_str_from_id(fe2), "Fe2+")
+        self.assertEqual(utilities.species_charge(fe2), 2)
+
+        ids = utilities.species_ids(["O2-", ("O", -2), "Fe2+"])
+        self.assertEqual(ids[0], ids[1])
+        self.assertEqual(ids[2], fe2)
+        self.assertEqual(utilities.spec_str_from_id(ids[0]), "O2-")
+
     def test_smactStruc_comp_key(self):
         """Test generation of a composition key for `SmactStructure`s."""
         s1 = SmactStructure(
@@ -267,6 +298,14 @@ class StructureDBTest(unittest.TestCase):
     TEST_TABLE = "Structures"
     TEST_MP_TABLE = "Structures1"
 
+    @classmethod
+    def setUpClass(cls):
+        """Load the test structures."""
+        cls.structs = {
+            x: SmactStructure.from_file(os.path.join(files_dir, f"{x}.txt"))
+            for x in ["CaTiO3", "NaCl", "Fe", "BaTiO3"]
+        }
+
     @classmethod
     def tearDownClass(cls):
         """Remove database files."""
@@ -354,6 +393,309 @@ class StructureDBTest(unittest.TestCase):
             added: int = self.db.add_mp_icsd(self.TEST_MP_TABLE, mp_data)
             self.assertEqual(added, 3)
 
+        with self.subTest(msg="Resuming adding downloaded MP structures."):
+            with self.db as c:
+                c.execute(f"DELETE FROM {self.TEST_MP_TABLE} WHERE rowid = 3")
+            added = self.db.add_mp_icsd(self.TEST_MP_TABLE, mp_data)
+            self.assertEqual(added, 1)
+            self.assertEqual(
+                len(self.db.get_with_species([], self.TEST_MP_TABLE)), 3
+            )
+
+    def test_species_table(self):
+        """Test migrating a table to and searching the species table."""
+        db = StructureDB(self.TEST_DB)
+        table = "Legacy"
+        with db as c:
+            c.execute(
+                f"""CREATE TABLE {table}
+                (composition TEXT NOT NULL, structure TEXT NOT NULL)""",
+            )
+
+        structs = [self.structs[x] for x in ["CaTiO3", "NaCl", "Fe"]]
+        db.add_structs(structs, table)
+
+        self.assertEqual(
+            parse_composition(structs[0].composition()),
+            [("Ca", 2), ("O", -2), ("Ti", 4)],
+        )
+
+        species_args = [
+            [],
+            [("Na", 1)],
+            [("Cl", -1), ("Na", 1)],
+            [("O", -2), ("Ti", 4)],
+            [("Fe", 0)],
+            [("Na", 1), ("O", -2)],
+        ]
+        globbed = [db.get_with_species(spec, table) for spec in species_args]
+        self.assertEqual(globbed[0], structs)
+        self.assertEqual(globbed[1], [structs[1]])
+        self.assertEqual(
+            StructureDB(self.TEST_DB)
+            .species_index(table)
+            .lookup([("Na", 1)])
+            .tolist(),
+            [2],
+        )
+
+        self.assertEqual(db.add_species_table(table), len(structs))
+        self.assertEqual(db.add_species_table(table), 0)
+        with db as c:
+            c.execute(f"SELECT COUNT(*) FROM {table}_species")
+            self.assertEqual(c.fetchone()[0], 6)
+
+        for spec, expected in zip(species_args, globbed):
+            with self.subTest(species=spec):
+                self.assertEqual(db.get_with_species(spec, table), expected)
+
+        # New structures are added to the species table
+        db.add_struct(structs[1], table)
+        self.assertEqual(
+            db.get_with_species([("Na", 1)], table), [structs[1]] * 2
+        )
+
+    def test_species_index(self):
+        """Test searching with an in-memory species index."""
+        db = StructureDB(self.TEST_DB)
+        table = "Indexed"
+        db.add_table(table)
+        structs = [self.structs[x] for x in ["CaTiO3", "NaCl", "Fe", "BaTiO3"]]
+        db.add_structs(structs, table)
+
+        species_args = [
+            [],
+            [("Ti", 4)],
+            [("O", -2), ("Ti", 4)],
+            [("Ba", 2), ("O", -2)],
+            [("Cl", -1), ("Na", 1)],
+            [("Fe", 0)],
+            [("Na", 1), ("O", -2)],
+            [("Xx", 9)],
+        ]
+        expected = [
+            db.get_with_species(list(spec), table) for spec in species_args
+        ]
+
+        index = db.species_index(table)
+        self.assertIs(db.species_index(table), index)
+        self.assertEqual(index.lookup([("Ti", 4)]).tolist(), [1, 4])
+        for spec, exp in zip(species_args, expected):
+            with self.subTest(species=spec):
+                self.assertEqual(db.get_with_species(list(spec), table), exp)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.npz")
+            saved = StructureDB(self.TEST_DB).species_index(table, path)
+            self.assertTrue(os.path.exists(path))
+            loaded = StructureDB(self.TEST_DB).species_index(table, path)
+            self.assertEqual(set(loaded.bits), set(saved.bits))
+            for spec in species_args:
+                np.testing.assert_array_equal(
+                    loaded.lookup(spec), saved.lookup(spec)
+                )
+
+            # Adding structures invalidates the index
+            db.add_struct(structs[0], table)
+            self.assertEqual(len(db.get_with_species([("Ti", 4)], table)), 3)
+            stale = StructureDB(self.TEST_DB).species_index(table, path)
+            self.assertEqual(stale.lookup([("Ti", 4)]).tolist(), [1, 4, 5])
+            reloaded = StructureDB(self.TEST_DB).species_index(table, path)
+            self.assertEqual(reloaded.lookup([("Ti", 4)]).tolist(), [1, 4, 5])
+
+            # So does replacing a structure, even with the same rowids
+            with db as c:
+                c.execute(f"DELETE FROM {table} WHERE rowid = 5")
+                c.execute(f"DELETE FROM {table}_species WHERE struct_id = 5")
+            db.add_struct(structs[2], table)
+            replaced = StructureDB(self.TEST_DB).species_index(table, path)
+            np.testing.assert_array_equal(replaced.rowids, reloaded.rowids)
+            self.assertEqual(replaced.lookup([("Na", 1)]).tolist(), [2])
+            self.assertEqual(replaced.lookup([("Fe", 0)]).tolist(), [3, 5])
+
+    def test_lazy_structs(self):
+        """Test getting structures that are parsed on first use."""
+        db = StructureDB(self.TEST_DB)
+        table = "Lazy"
+        db.add_table(table)
+        structs = [self.structs[x] for x in ["CaTiO3", "NaCl", "BaTiO3"]]
+        db.add_structs(structs, table)
+
+        lazy = db.get_with_species([("Ti", 4)], table, lazy=True)
+        self.assertEqual(len(lazy), 2)
+        for struct, expected in zip(lazy, [structs[0], structs[2]]):
+            self.assertIsInstance(struct, structure.LazySmactStructure)
+            self.assertEqual(struct.species, expected.species)
+            self.assertEqual(struct.composition(), expected.composition())
+            self.assertTrue(struct.has_species(("O", -2)))
+            self.assertFalse(struct.is_materialised)
+
+        # Copies are independent and parse the POSCAR separately
+        copied = deepcopy(lazy[0])
+        self.assertFalse(copied.is_materialised)
+        self.assertEqual(copied.sites, structs[0].sites)
+        self.assertTrue(copied.is_materialised)
+        self.assertFalse(lazy[0].is_materialised)
+        self.assertEqual(pickle.loads(pickle.dumps(lazy[0])), structs[0])
+
+        self.assertEqual(lazy, [structs[0], structs[2]])
+        self.assertTrue(all(struct.is_materialised for struct in lazy))
+        self.assertEqual(
+            db.get_structs(structs[1].composition(), table, lazy=True),
+            [structs[1]],
+        )
+        with self.assertRaises(AttributeError):
+            lazy[0].lattice
+
+    def test_persistent_connections(self):
+        """Test keeping connections open between operations."""
+        table = "Persistent"
+        structs = [self.structs[x] for x in ["CaTiO3", "NaCl", "BaTiO3"]]
+
+        db = StructureDB(self.TEST_DB, persistent=True)
+        db.add_table(table)
+        db.add_structs(structs, table)
+        self.assertEqual(len(db._connections), 1)
+        with db as c:
+            c.execute("PRAGMA journal_mode")
+            self.assertEqual(c.fetchone()[0], "wal")
+        db.close()
+        self.assertEqual(db._connections, [])
+
+        reader = StructureDB(self.TEST_DB, persistent=True, read_only=True)
+        queries = [[("Ti", 4)], [("Na", 1)], [("O", -2), ("Ba", 2)]] * 10
+        expected = [
+            StructureDB(self.TEST_DB).get_with_species(list(query), table)
+            for query in queries
+        ]
+        with ThreadPoolExecutor(4) as pool:
+            results = list(
+                pool.map(
+                    lambda query: reader.get_with_species(query, table),
+                    map(list, queries),
+                )
+            )
+        self.assertEqual(results, expected)
+        self.assertLessEqual(len(reader._connections), 4)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            reader.add_struct(structs[0], table)
+        reader.close()
+        self.assertEqual(
+            reader.get_structs(structs[1].composition(), table), [structs[1]]
+        )
+        reader.close()
+
+        # Paths are escaped in the URI of read-only connections
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a?b#c%20d.db")
+            StructureDB(path).add_table(table)
+            StructureDB(path).add_structs(structs, table)
+            self.assertFalse(os.path.exists(os.path.join(tmp, "a")))
+            reader = StructureDB(path, read_only=True)
+            self.assertEqual(
+                reader.get_structs(structs[1].composition(), table),
+                [structs[1]],
+            )
+
+    def test_bulk_add_structs(self):
+        """Test adding structures in batches."""
+        db = StructureDB(self.TEST_DB, persistent=True)
+        table = "Bulk"
+        db.add_table(table)
+        structs = [self.structs[x] for x in ["CaTiO3", "NaCl", "Fe"]]
+
+        with db as c:
+            c.execute("PRAGMA synchronous")
+            synchronous = c.fetchone()[0]
+
+        added = db.add_structs(
+            structs + [None] + structs, table, batch_size=2, bulk=True
+        )
+        self.assertEqual(added, 6)
+        self.assertEqual(
+            db.get_with_species([("Ti", 4)], table), [structs[0]] * 2
+        )
+        with db as c:
+            c.execute("SELECT rowid FROM Bulk")
+            self.assertEqual(
+                [row[0] for row in c.fetchall()], [1, 2, 3, 4, 5, 6]
+            )
+            c.execute("SELECT COUNT(*) FROM Bulk_species")
+            self.assertEqual(c.fetchone()[0], 12)
+            c.execute("PRAGMA synchronous")
+            self.assertEqual(c.fetchone()[0], synchronous)
+            c.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'Bulk_species_index'"
+            )
+            self.assertIsNotNone(c.fetchone())
+
+        def interrupted():
+            yield from structs * 2
+            raise KeyboardInterrupt
+
+        # Only complete batches are kept
+        with self.assertRaises(KeyboardInterrupt):
+            db.add_structs(
+                interrupted(),
+                table,
+                commit_after_each=True,
+                batch_size=4,
+                bulk=True,
+            )
+        self.assertEqual(len(db.get_with_species([], table)), 10)
+        self.assertEqual(
+            db.get_with_species([("Cl", -1)], table), [structs[1]] * 3
+        )
+
+        # Structures already in the table are skipped
+        table = "NoDuplicates"
+        db.add_table(table)
+        self.assertEqual(db.add_structs(structs[:2], table), 2)
+        added = db.add_structs(
+            structs + structs, table, batch_size=2, skip_existing=True
+        )
+        self.assertEqual(added, 1)
+        self.assertEqual(db.get_with_species([], table), structs)
+        with db as c:
+            c.execute("SELECT COUNT(*) FROM NoDuplicates_species")
+            self.assertEqual(c.fetchone()[0], 6)
+            # No index is kept on the structures themselves
+            c.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'index' AND tbl_name = 'NoDuplicates'"
+            )
+            self.assertEqual(c.fetchall(), [])
+        # Including in tables that already have duplicates
+        self.assertEqual(
+            db.add_structs(structs, "Bulk", skip_existing=True, bulk=True), 0
+        )
+        db.close()
+
+    def test_bulk_synchronous(self):
+        """Test that writes are only synced less often with WAL."""
+        db = StructureDB(self.TEST_DB, persistent=True)
+        struct = self.structs["CaTiO3"]
+        for journal_mode, expected in [("wal", 1), ("delete", 2)]:
+            with db as c:
+                c.execute(f"PRAGMA journal_mode = {journal_mode}")
+                c.execute("PRAGMA synchronous = FULL")
+            table = f"Sync_{journal_mode}"
+            db.add_table(table)
+
+            synchronous = []
+
+            def structs():
+                conn = db._local.conn
+                synchronous.append(
+                    conn.execute("PRAGMA synchronous").fetchone()[0]
+                )
+                yield struct
+
+            db.add_structs(structs(), table, bulk=True)
+            self.assertEqual(synchronous, [expected])
+        db.close()
+
 
 class CationMutatorTest(unittest.TestCase):
     """Test the CationMutator class."""
@@ -400,6 +742,23 @@ class CationMutatorTest(unittest.TestCase):
         # 2e^0.5 + 2e^0.3 + 5e^{-5} \approx 6.0308499
         self.assertAlmostEqual(self.test_mutator.Z, 6.0308499)
 
+    def test_lambda_arrays(self):
+        """Test the array representation of the lambda table."""
+        cm = self.test_mutator
+        i, j = cm.spec_index["A"], cm.spec_index["B"]
+        self.assertEqual(cm.lambdas[i, j], 0.5)
+        self.assertAlmostEqual(cm.exp_lambdas[i, j], np.exp(0.5))
+        np.testing.assert_allclose(
+            cm.row_sums, np.exp(cm.lambda_tab).sum(axis=1)
+        )
+        np.testing.assert_allclose(cm.lambda_tab.to_numpy(), cm.lambdas)
+
+        # Species outside the table fall back to alpha
+        self.assertEqual(cm.get_lambda("A", "D"), -5.0)
+        self.assertAlmostEqual(cm.sub_prob("A", "D"), np.exp(-5.0) / cm.Z)
+        with self.assertRaises(ValueError):
+            cm.cond_sub_probs("D")
+
     def test_pymatgen_lambda_import(self):
         """Test importing pymatgen lambda table."""
         self.assertIsInstance(
@@ -492,6 +851,224 @@ class CationMutatorTest(unittest.TestCase):
                     self.test_pymatgen_mutator.pair_corr(s1, s2),
                 )
 
+    def test_vector_alpha(self):
+        """Test filling in the lambda table with a vectorised alpha."""
+        lambda_df = pd.DataFrame(
+            [[np.nan, 0.5], [np.nan, 1.0]],
+            index=["A", "B"],
+            columns=["B", "C"],
+        )
+
+        def vector_alpha(s1, s2):
+            self.assertIsInstance(s1, np.ndarray)
+            return np.array([-float(ord(a) + ord(b)) for a, b in zip(s1, s2)])
+
+        cm = CationMutator(lambda_df.copy(), vector_alpha=vector_alpha)
+        exp_lambda = pd.DataFrame(
+            [
+                [-130.0, -131.0, 0.5],
+                [-131.0, -132.0, 1.0],
+                [0.5, 1.0, -134.0],
+            ],
+            index=["A", "B", "C"],
+            columns=["A", "B", "C"],
+        )
+        assert_frame_equal(cm.lambda_tab, exp_lambda)
+
+        # The scalar alpha gives the same table
+        cm = CationMutator(
+            lambda_df.copy(), alpha=lambda a, b: -float(ord(a) + ord(b))
+        )
+        assert_frame_equal(cm.lambda_tab, exp_lambda)
+
+    def test_from_json_cache(self):
+        """Test caching populated lambda tables."""
+        default_directory = mutation.cache_directory
+        default_use_cache = mutation.use_cache_by_default
+        try:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                mutation.cache_directory = cache_dir
+
+                # The cache is opt-in
+                mutation.use_cache_by_default = False
+                CationMutator.from_json(TEST_LAMBDA_JSON)
+                self.assertEqual(os.listdir(cache_dir), [])
+
+                mutation.use_cache_by_default = True
+                cm = CationMutator.from_json(TEST_LAMBDA_JSON)
+                self.assertEqual(len(os.listdir(cache_dir)), 3)
+
+                cached = CationMutator.from_json(TEST_LAMBDA_JSON)
+                self.assertIsInstance(cached.lambdas, np.memmap)
+                assert_frame_equal(cached.lambda_tab, cm.lambda_tab)
+                self.assertEqual(cached.Z, cm.Z)
+                self.assertEqual(cached.specs, cm.specs)
+                np.testing.assert_array_equal(cached.row_sums, cm.row_sums)
+                self.assertEqual(
+                    cached.cond_sub_prob("A", "B"), cm.cond_sub_prob("A", "B")
+                )
+
+                # A different alpha is cached separately
+                cm = CationMutator.from_json(
+                    TEST_LAMBDA_JSON, alpha=lambda s1, s2: -4.0
+                )
+                self.assertEqual(cm.get_lambda("A", "C"), -4.0)
+                self.assertEqual(len(os.listdir(cache_dir)), 6)
+
+                # Functions that can't be identified need a cache key
+                CationMutator.from_json(
+                    TEST_LAMBDA_JSON, alpha=lambda s1, s2: np.float64(-4.0)
+                )
+                self.assertEqual(len(os.listdir(cache_dir)), 6)
+                for _ in range(2):
+                    cm = CationMutator.from_json(
+                        TEST_LAMBDA_JSON,
+                        alpha=lambda s1, s2: np.float64(-4.0),
+                        cache_key="numpy -4",
+                    )
+                    self.assertEqual(cm.get_lambda("A", "C"), -4.0)
+                self.assertIsInstance(cm.lambdas, np.memmap)
+                self.assertEqual(len(os.listdir(cache_dir)), 9)
+
+                # Unless the cache is not used
+                CationMutator.from_json(
+                    TEST_LAMBDA_JSON,
+                    alpha=lambda s1, s2: -3.0,
+                    use_cache=False,
+                )
+                self.assertEqual(len(os.listdir(cache_dir)), 9)
+
+                # Only the least recently used tables are evicted
+                default_size = mutation.cache_size
+                mutation.cache_size = 2
+                try:
+                    CationMutator.from_json(TEST_LAMBDA_JSON)
+                    CationMutator.from_json(
+                        TEST_LAMBDA_JSON, alpha=lambda s1, s2: -2.0
+                    )
+                finally:
+                    mutation.cache_size = default_size
+                self.assertEqual(len(os.listdir(cache_dir)), 6)
+                cached = CationMutator.from_json(TEST_LAMBDA_JSON)
+                self.assertIsInstance(cached.lambdas, np.memmap)
+                cm = CationMutator.from_json(
+                    TEST_LAMBDA_JSON, alpha=lambda s1, s2: -4.0
+                )
+                self.assertNotIsInstance(cm.lambdas, np.memmap)
+        finally:
+            mutation.cache_directory = default_directory
+            mutation.use_cache_by_default = default_use_cache
+
+    def test_function_key(self):
+        """Test identifying alpha functions for the lambda table cache."""
+        source = "def alpha(s1, s2):\n    return offset\n"
+
+        def define(prefix="", filename="a.py", offset=-4.0):
+            namespace = {"offset": offset}
+            exec(compile(prefix + source, filename, "exec"), namespace)
+            return namespace["alpha"]
+
+        key = mutation._function_key(define())
+        self.assertIsNotNone(key)
+        # Moving the function doesn't change it
+        self.assertEqual(mutation._function_key(define("\n\n", "b.py")), key)
+        # Changing the globals it uses does
+        self.assertNotEqual(mutation._function_key(define(offset=-3.0)), key)
+        self.assertNotEqual(mutation._function_key(lambda s1, s2: -4.0), key)
+        # Neither can anything else whose state can't be identified
+        self.assertIsNone(mutation._function_key(define(offset=object())))
+        self.assertIsNone(mutation._function_key(np.exp))
+        self.assertIsNone(mutation._function_key(define(offset=np.float64(1))))
+
+        def closure(values):
+            return lambda s1, s2: values[0]
+
+        # Arrays whose repr is truncated, in closures and defaults
+        self.assertIsNone(mutation._function_key(closure(np.zeros(2000))))
+        self.assertIsNotNone(mutation._function_key(closure((-4.0, -5.0))))
+        self.assertNotEqual(
+            mutation._function_key(closure((-4.0,))),
+            mutation._function_key(closure((-5.0,))),
+        )
+        self.assertIsNone(
+            mutation._function_key(lambda s1, s2, df=pd.DataFrame(): -5.0)
+        )
+        # Modules, whose attributes may be read
+        self.assertIsNone(mutation._function_key(lambda s1, s2: np.pi))
+
+        class Alpha:
+            offset = -5.0
+
+            def alpha(self, s1, s2):
+                return self.offset
+
+        # Bound methods, whose instances may change
+        self.assertIsNone(mutation._function_key(Alpha().alpha))
+
+    def test_top_k(self):
+        """Test finding the most likely substitutions."""
+        cm = self.test_pymatgen_mutator
+        for spec in self.test_species:
+            cond_probs = cm.cond_sub_probs(spec).drop(spec)
+            cond_probs = cond_probs.sort_values(ascending=False, kind="stable")
+            charge = utilities.parse_spec(spec)[1]
+            same_charge = cond_probs[
+                [
+                    utilities.parse_spec(s)[1] == charge
+                    for s in cond_probs.index
+                ]
+            ]
+            with self.subTest(species=spec):
+                self.assertEqual(
+                    cm.top_k(spec, 5), list(cond_probs.iloc[:5].items())
+                )
+                self.assertEqual(
+                    cm.top_k(spec, 5, charge=charge),
+                    list(same_charge.iloc[:5].items()),
+                )
+                min_prob = cond_probs.iloc[3]
+                self.assertEqual(
+                    cm.top_k(spec, 10, min_prob=min_prob),
+                    list(cond_probs[cond_probs >= min_prob].iloc[:10].items()),
+                )
+
+        self.assertEqual(
+            cm.top_k_many(self.test_species, 3, charge=1),
+            [cm.top_k(spec, 3, charge=1) for spec in self.test_species],
+        )
+        self.assertEqual(cm.top_k(self.test_species[0], 3, charge=99), [])
+        with self.assertRaises(ValueError):
+            cm.top_k("D", 1)
+
+    def test_prob_many(self):
+        """Test the array versions of the probability methods."""
+        cm = self.test_pymatgen_mutator
+        # Include species outside the table, which use alpha
+        pairs = (
+            self.test_pairs
+            + [(s2, s1) for s1, s2 in self.test_pairs]
+            + [(self.test_species[0], "D"), ("D", self.test_species[1])]
+        )
+        table_pairs = pairs[:-2]
+
+        np.testing.assert_array_equal(
+            cm.sub_prob_many(pairs), [cm.sub_prob(*pair) for pair in pairs]
+        )
+        np.testing.assert_array_equal(
+            cm.cond_sub_prob_many(table_pairs + pairs[-1:]),
+            [cm.cond_sub_prob(*pair) for pair in table_pairs + pairs[-1:]],
+        )
+        np.testing.assert_array_equal(
+            cm.pair_corr_many(table_pairs),
+            [cm.pair_corr(*pair) for pair in table_pairs],
+        )
+        self.assertEqual(cm.sub_prob_many([]).shape, (0,))
+
+        with self.assertRaises(ValueError):
+            cm.cond_sub_prob_many(pairs)
+        with self.assertRaises(ValueError):
+            cm.pair_corr_many(pairs)
+
     def test_from_df(self):
         """Test creating a CationMutator from an existing DataFrame."""
         lambda_df = pd.read_csv(TEST_LAMBDA_CSV, index_col=0)
@@ -503,6 +1080,24 @@ class CationMutatorTest(unittest.TestCase):
             check_names=False,
         )
 
+    def test_non_species_labels(self):
+        """Test a lambda table with labels that are not species."""
+        labels = ["1+", "Na1+", "K1+"]
+        lambda_df = pd.DataFrame(
+            [[0.0, 1.0, 2.0], [1.0, 0.0, 3.0], [2.0, 3.0, 0.0]],
+            index=labels,
+            columns=labels,
+        )
+        cm = CationMutator(lambda_df=lambda_df)
+        self.assertEqual(cm.spec_ids[0], -1)
+        self.assertTrue(np.isnan(cm.spec_charges[0]))
+        self.assertEqual(cm.spec_charges[1:].tolist(), [1, 1])
+        self.assertAlmostEqual(cm.sub_prob("1+", "K1+"), np.exp(2.0) / cm.Z)
+        # The label has no charge, so it is never a substitution
+        self.assertEqual(
+            [spec for spec, _ in cm.top_k("Na1+", 2, charge=1)], ["K1+"]
+        )
+
     def test_complete_cond_probs(self):
         """Test getting all conditional probabilities."""
         pairs = itertools.product(["A", "B", "C"], repeat=2)